@@ -1,10 +1,13 @@
 import streamlit as st
-import pandas as pd
+import functools
 import os
 import random
-import sqlite3
 from datetime import datetime, timedelta, date, time
-import matplotlib.pyplot as plt
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from waterbuddy import AssetCache, Metrics, from_ts, open_store, today_str
+from waterbuddy.assets import MASCOT_WIDTH
+from waterbuddy.charts import render_png, history_chart_altair
 
 # ---------- CONFIG ----------
 st.set_page_config(page_title="WaterBuddy — SipSmart", page_icon="💧", layout="centered")
@@ -87,80 +90,55 @@ input, textarea, select {
 st.markdown(page_bg, unsafe_allow_html=True)
 
 # ---------- DATABASE (SQLite) ----------
-DB_FILE = "waterbuddy.db"
-
-def get_conn():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-conn = get_conn()
-
-def init_db():
-    cur = conn.cursor()
-    # users
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        age INTEGER,
-        weight REAL,
-        daily_goal_ml INTEGER DEFAULT 2000,
-        created_at TEXT DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-    # water logs
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS water_logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        amount_ml INTEGER NOT NULL,
-        timestamp TEXT NOT NULL,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    );
-    """)
-    # badges
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS badges (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        earned_at TEXT DEFAULT CURRENT_TIMESTAMP,
-        UNIQUE(user_id, name),
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    );
-    """)
-    # challenges
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS challenges (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        name TEXT,
-        days INTEGER,
-        goal REAL,
-        start TEXT,
-        done INTEGER DEFAULT 0,
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    );
-    """)
-    # settings
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS settings (
-        user_id INTEGER PRIMARY KEY,
-        reminder_enabled INTEGER DEFAULT 0,
-        reminder_minutes INTEGER DEFAULT 120,
-        reminder_start_time TEXT DEFAULT '09:00',
-        FOREIGN KEY(user_id) REFERENCES users(id)
-    );
-    """)
-    conn.commit()
-
-init_db()
-
-# ---------- UTILITY ----------
-def today_str():
-    return date.today().isoformat()
+DB_FILE = os.environ.get("WATERBUDDY_DB", "waterbuddy.db")
+# when set, log_water goes through the group-commit writer; the value is how long (ms) a burst
+# may linger for more inserts, 0 = commit whatever has queued as soon as the writer is free
+GROUP_COMMIT_MS = os.environ.get("WATERBUDDY_GROUP_COMMIT_MS")
+# "1" shows developer diagnostics (cache counters, query / page timings, slow queries) on the Settings page
+DEBUG_PANEL = os.environ.get("WATERBUDDY_DEBUG") == "1"
+# when set, query / page metrics are also written to this file (Prometheus text format) every 10 s
+METRICS_FILE = os.environ.get("WATERBUDDY_METRICS_FILE")
+# statements at least this slow go to the slow-query log with their EXPLAIN QUERY PLAN
+SLOW_QUERY_MS = float(os.environ.get("WATERBUDDY_SLOW_QUERY_MS", "50"))
+# history chart backend: "matplotlib" (cached PNG) or "altair" (ships data, drawn in the browser)
+CHART_BACKEND = os.environ.get("WATERBUDDY_CHART_BACKEND", "matplotlib")
+# N > 1 spreads users over N database files (WATERBUDDY_DB keeps the user directory) so their log
+# writes don't queue behind one another; fixed when the database is created
+SHARDS = os.environ.get("WATERBUDDY_SHARDS")
+# storage engine: "sqlite" (default) or "memory", which keeps everything in this process and forgets it on exit
+BACKEND = os.environ.get("WATERBUDDY_BACKEND", "sqlite")
+# days of raw logs kept in the main database before the hourly job archives them; "off" disables archiving
+ARCHIVE_DAYS = os.environ.get("WATERBUDDY_ARCHIVE_DAYS", "365")
+
+
+@st.cache_resource
+def get_store():
+    # one Store (connection pool, read cache, badge cache) per process, shared by every session;
+    # schema setup runs here once, not on every script rerun
+    group_commit_ms = int(GROUP_COMMIT_MS) if GROUP_COMMIT_MS is not None else None
+    # instrumentation is opt-in: without the debug panel or a metrics file, queries run untimed
+    metrics = Metrics(SLOW_QUERY_MS, dump_path=METRICS_FILE) if DEBUG_PANEL or METRICS_FILE else None
+    store = open_store(DB_FILE, SHARDS, BACKEND, group_commit_ms=group_commit_ms, metrics=metrics)
+    store.init_db()
+    # reminders fire from a background thread into the store's inbox; reminder_popup picks them up
+    store.start_reminders()
+    # archive old logs and return free pages from a background thread, once at start and then hourly
+    store.start_compaction(horizon_days=None if ARCHIVE_DAYS == "off" else int(ARCHIVE_DAYS))
+    # settles every running challenge after each midnight; logging settles the logger's own at once
+    store.start_challenge_sweep()
+    return store
+
+store = get_store()
+
+@st.cache_resource
+def get_assets():
+    # mascot bytes held in memory for the process, pre-sized to the width they are shown at (or read
+    # from `python -m waterbuddy build-assets` output), so a rerun neither reads nor re-encodes files
+    assets = AssetCache(MASCOT_WIDTH)
+    assets.preload("image")
+    return assets
+
+assets = get_assets()
 
 # ---------- INIT SESSION STATE ----------
 if "page" not in st.session_state:
@@ -176,6 +154,33 @@ if "last_reminder_time" not in st.session_state:
 if "reminder_dismissed" not in st.session_state:
     st.session_state.reminder_dismissed = False
 
+# ---------- INSTRUMENTATION ----------
+# with metrics on, this script run is timed under the page it renders; rerun() closes the run
+# before st.rerun() cuts the script short
+page_run = store.metrics.page_run(st.session_state.page) if store.metrics else None
+
+def rerun():
+    if page_run:
+        page_run.finish()
+    st.rerun()
+
+def fragment(label, **kwargs):
+    # st.fragment whose fragment-only reruns are timed as page "<page> / <label>"; when the fragment
+    # renders inside a full run, that run's page timing already covers it
+    def wrap(fn):
+        @functools.wraps(fn)
+        def run(*args, **kw):
+            ctx = get_script_run_ctx()
+            if not store.metrics or not (ctx and ctx.fragment_ids_this_run):
+                return fn(*args, **kw)
+            fragment_run = store.metrics.page_run(f"{st.session_state.page} / {label}")
+            try:
+                return fn(*args, **kw)
+            finally:
+                fragment_run.finish()
+        return st.fragment(run, **kwargs)
+    return wrap
+
 # ---------- AGE-BASED GOAL CALCULATOR ----------
 def calculate_daily_goal(age, weight=None, activity_level="moderate"):
     if age < 4:
@@ -249,244 +254,40 @@ FUN = [
     "🙂 Drinking water reduces stress and anxiety levels!"
 ]
 
-# ---------- DATABASE HELPERS ----------
-def create_user(username, password, age=None, weight=None, daily_goal_ml=2000):
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO users (username, password, age, weight, daily_goal_ml) VALUES (?, ?, ?, ?, ?)",
-            (username, password, age, weight, daily_goal_ml)
-        )
-        conn.commit()
-        user_id = cur.lastrowid
-        # ensure default settings row
-        cur.execute("INSERT OR IGNORE INTO settings (user_id) VALUES (?)", (user_id,))
-        conn.commit()
-        return user_id
-    except sqlite3.IntegrityError:
-        return None
-
-def get_user_by_username(username):
-    cur = conn.execute("SELECT * FROM users WHERE username = ?", (username,))
-    row = cur.fetchone()
-    return row
-
-def update_user_profile(user_id, age=None, weight=None, daily_goal_ml=None):
-    cur = conn.cursor()
-    if age is not None:
-        cur.execute("UPDATE users SET age = ? WHERE id = ?", (age, user_id))
-    if weight is not None:
-        cur.execute("UPDATE users SET weight = ? WHERE id = ?", (weight, user_id))
-    if daily_goal_ml is not None:
-        cur.execute("UPDATE users SET daily_goal_ml = ? WHERE id = ?", (daily_goal_ml, user_id))
-    conn.commit()
-
-def check_login(username, password):
-    cur = conn.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
-    return cur.fetchone()
-
-def log_water(user_id, amount_ml, timestamp=None):
-    if timestamp is None:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    conn.execute(
-        "INSERT INTO water_logs (user_id, amount_ml, timestamp) VALUES (?, ?, ?)",
-        (user_id, int(amount_ml), timestamp)
-    )
-    conn.commit()
-    # after logging, try awarding badges if needed
-    award_badges_for_user(user_id)
-
-def get_logs_for_date(user_id, date_iso):
-    start = f"{date_iso} 00:00:00"
-    end = f"{date_iso} 23:59:59"
-    cur = conn.execute(
-        "SELECT amount_ml, timestamp FROM water_logs WHERE user_id = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp DESC",
-        (user_id, start, end)
-    )
-    rows = cur.fetchall()
-    return rows
-
-def get_today_total(user_id):
-    today = today_str()
-    cur = conn.execute(
-        "SELECT SUM(amount_ml) as total FROM water_logs WHERE user_id = ? AND timestamp LIKE ?",
-        (user_id, f"{today}%")
-    )
-    r = cur.fetchone()
-    return r["total"] or 0
-
-def get_7day_history(user_id):
-    history = {}
-    for d in range(6, -1, -1):
-        dd = date.today() - timedelta(days=d)
-        iso = dd.isoformat()
-        cur = conn.execute(
-            "SELECT SUM(amount_ml) as total FROM water_logs WHERE user_id = ? AND timestamp LIKE ?",
-            (user_id, f"{iso}%")
-        )
-        r = cur.fetchone()
-        history[iso] = {"total_ml": int(r["total"] or 0), "entries": [dict(row) for row in get_logs_for_date(user_id, iso)]}
-    return history
-
-def clear_today_logs(user_id):
-    ds = today_str()
-    conn.execute("DELETE FROM water_logs WHERE user_id = ? AND timestamp LIKE ?", (user_id, f"{ds}%"))
-    conn.commit()
-
-# badges and awarding
-def get_badges(user_id):
-    cur = conn.execute("SELECT name, earned_at FROM badges WHERE user_id = ?", (user_id,))
-    return [dict(r) for r in cur.fetchall()]
-
-def award_badge(user_id, badge_name):
-    try:
-        conn.execute("INSERT INTO badges (user_id, name) VALUES (?, ?)", (user_id, badge_name))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        return False
-
-def award_badges_for_user(user_id):
-    # Simple badge logic similar to your JSON version
-    # First Sip
-    total_drinks = conn.execute("SELECT COUNT(*) as c FROM water_logs WHERE user_id = ?", (user_id,)).fetchone()["c"]
-    if total_drinks >= 1:
-        award_badge(user_id, "💧 First Sip!")
-    # compute streaks for badges
-    streaks = compute_streaks(user_id)
-    current_streak = streaks["current_streak"]
-    longest_streak = streaks["longest_streak"]
-    if current_streak >= 3:
-        award_badge(user_id, "🌱 3-Day Streak")
-    if current_streak >= 7:
-        award_badge(user_id, "🌈 Hydration Hero (1 Week)")
-    if current_streak >= 30:
-        award_badge(user_id, "🏆 Aqua Master (1 Month)")
-    if longest_streak >= 7:
-        award_badge(user_id, "👑 Consistency King")
-
-# challenges
-def add_challenge(user_id, name, days, goal, start_iso):
-    conn.execute(
-        "INSERT INTO challenges (user_id, name, days, goal, start) VALUES (?, ?, ?, ?, ?)",
-        (user_id, name, days, goal, start_iso)
-    )
-    conn.commit()
-
-def get_challenges(user_id):
-    cur = conn.execute("SELECT * FROM challenges WHERE user_id = ?", (user_id,))
-    return [dict(r) for r in cur.fetchall()]
-
-def mark_challenge_done(challenge_id):
-    conn.execute("UPDATE challenges SET done = 1 WHERE id = ?", (challenge_id,))
-    conn.commit()
-
-# settings
-def get_settings(user_id):
-    cur = conn.execute("SELECT reminder_enabled, reminder_minutes, reminder_start_time FROM settings WHERE user_id = ?", (user_id,))
-    r = cur.fetchone()
-    if not r:
-        # initialize
-        conn.execute("INSERT OR IGNORE INTO settings (user_id) VALUES (?)", (user_id,))
-        conn.commit()
-        return {"reminder_enabled": False, "reminder_minutes": 120, "reminder_start_time": "09:00"}
-    return {"reminder_enabled": bool(r["reminder_enabled"]), "reminder_minutes": r["reminder_minutes"], "reminder_start_time": r["reminder_start_time"]}
-
-def update_settings(user_id, reminder_enabled, reminder_minutes, reminder_start_time):
-    conn.execute("INSERT OR REPLACE INTO settings (user_id, reminder_enabled, reminder_minutes, reminder_start_time) VALUES (?, ?, ?, ?)",
-                 (user_id, int(reminder_enabled), int(reminder_minutes), reminder_start_time))
-    conn.commit()
-
-# deletion
-def delete_all_user_data(user_id):
-    conn.execute("DELETE FROM water_logs WHERE user_id = ?", (user_id,))
-    conn.execute("DELETE FROM badges WHERE user_id = ?", (user_id,))
-    conn.execute("DELETE FROM challenges WHERE user_id = ?", (user_id,))
-    conn.execute("DELETE FROM settings WHERE user_id = ?", (user_id,))
-    conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
-    conn.commit()
-
-# streaks computation
-def compute_streaks(user_id):
-    # gather all dates with logs
-    cur = conn.execute("SELECT DISTINCT DATE(timestamp) as dt FROM water_logs WHERE user_id = ? ORDER BY dt ASC", (user_id,))
-    rows = [r["dt"] for r in cur.fetchall()]
-    date_objs = [datetime.strptime(d, "%Y-%m-%d").date() for d in rows] if rows else []
-    today_date = datetime.now().date()
-    if not date_objs:
-        return {"current_streak": 0, "longest_streak": 0}
-    # longest streak
-    longest = 1
-    streak = 1
-    prev = date_objs[0]
-    for d in date_objs[1:]:
-        if (d - prev).days == 1:
-            streak += 1
-        else:
-            streak = 1
-        prev = d
-        if streak > longest:
-            longest = streak
-    longest_streak = longest
-    # current streak
-    last = date_objs[-1]
-    if (today_date - last).days == 0:
-        current = 1
-        prev = last
-        for d in reversed(date_objs[:-1]):
-            if (prev - d).days == 1:
-                current += 1
-                prev = d
-            else:
-                break
-        current_streak = current
-    elif (today_date - last).days == 1:
-        current = 1
-        prev = last
-        for d in reversed(date_objs[:-1]):
-            if (prev - d).days == 1:
-                current += 1
-                prev = d
-            else:
-                break
-        current_streak = current
+# ---------- PLOTTING ----------
+@st.cache_data(max_entries=512, show_spinner=False)
+def render_history_png(history, daily_goal_ml, title, granularity="day"):
+    # cached on (history totals, goal, title, granularity): reruns that don't change the data
+    # skip figure construction and rasterization entirely
+    return render_png(history, daily_goal_ml, title, granularity)
+
+def show_history_chart(history, daily_goal_ml, title, granularity="day"):
+    if CHART_BACKEND == "altair":
+        st.altair_chart(history_chart_altair(history, daily_goal_ml, title, granularity), use_container_width=True)
     else:
-        current_streak = 0
-    return {"current_streak": current_streak, "longest_streak": longest_streak}
+        st.image(render_history_png(history, daily_goal_ml, title, granularity), width="stretch")
+
+# ---------- REMINDERS ----------
+@fragment("reminders", run_every="30s")
+def reminder_popup():
+    # polls the reminder inbox every 30 s, rerunning only this fragment, not the page
+    due = store.reminders.sink.take(st.session_state.user_id)
+    if due is not None:
+        st.session_state.last_reminder_time = due
+        st.session_state.reminder_message = random.choice(reminder_messages)
+        st.session_state.reminder_dismissed = False
+    if st.session_state.last_reminder_time and not st.session_state.reminder_dismissed:
+        st.markdown(f"""
+        <div class='reminder-popup'>
+        <h3 style='margin:0 0 10px 0; color: white;'>🔔 Hydration Reminder — {st.session_state.last_reminder_time.strftime('%I:%M %p')}</h3>
+        <p style='margin:0; font-size: 16px;'>{st.session_state.reminder_message}</p>
+        </div>
+        """, unsafe_allow_html=True)
+        # the callback runs before the fragment reruns, so the popup is gone on that run
+        st.button("👍 Got it", key="dismiss_reminder", on_click=dismiss_reminder)
 
-# ---------- PLOTTING ----------
-def plot_7day_intake_from_history_dict(history, daily_goal_ml):
-    # history: dict keyed by iso date with total_ml
-    dates = []
-    actual_intake = []
-    target_intake = []
-    date_labels = []
-    for d_iso, v in history.items():
-        dd = datetime.strptime(d_iso, "%Y-%m-%d").date()
-        dates.append(dd)
-        actual_ml = v.get("total_ml", 0)
-        actual_intake.append(actual_ml / 1000)
-        target_intake.append(daily_goal_ml / 1000)
-        date_labels.append(dd.strftime("%m/%d"))
-    fig, ax = plt.subplots(figsize=(10, 4))
-    x = range(len(dates))
-    width = 0.35
-    bars1 = ax.bar([i - width/2 for i in x], actual_intake, width, label='Actual Intake')
-    bars2 = ax.bar([i + width/2 for i in x], target_intake, width, label='Daily Target', alpha=0.6)
-    ax.set_xlabel('Date', fontsize=10)
-    ax.set_ylabel('Litres', fontsize=10)
-    ax.set_title('Your Intake vs Daily Target (Past 7 Days)', fontsize=12)
-    ax.set_xticks(x)
-    ax.set_xticklabels(date_labels, fontsize=9)
-    ax.legend()
-    ax.grid(True, alpha=0.2)
-    for bars in (bars1, bars2):
-        for bar in bars:
-            height = bar.get_height()
-            if height > 0:
-                ax.text(bar.get_x() + bar.get_width()/2., height, f'{height:.1f}L', ha='center', va='bottom', fontsize=8)
-    plt.tight_layout()
-    return fig
+def dismiss_reminder():
+    st.session_state.reminder_dismissed = True
 
 # ---------- NAVBAR ----------
 def navbar():
@@ -497,8 +298,144 @@ def navbar():
             cols[i].markdown(f"**➡️ {p}**")
         elif cols[i].button(p, key=f"nav_{p}"):
             st.session_state.page = p
-            st.rerun()
+            rerun()
+    if st.session_state.user_id:
+        reminder_popup()
+    st.markdown("---")
+
+# ---------- DASHBOARD PANELS ----------
+# switching the history range or opening analytics reruns only that panel, not the bottle, the tip
+# of the day or the rest of the page
+@fragment("history")
+def history_panel(uid, daily_goal):
+    st.markdown("### 📈 Your Hydration History")
+    history_views = {
+        "7 days": (7, "day"),
+        "30 days": (30, "day"),
+        "90 days": (90, "week"),
+        "365 days": (365, "month"),
+    }
+    view = st.radio("Show:", list(history_views), horizontal=True, key="history_view")
+    span_days, granularity = history_views[view]
+    if span_days == 7:
+        history = store.get_7day_history(uid)
+    else:
+        history = store.get_history(uid, date.today() - timedelta(days=span_days - 1), date.today(), granularity)
+    show_history_chart(history, daily_goal, f"Your Intake vs Target (Past {span_days} Days)", granularity)
+
+@fragment("analytics")
+def analytics_panel(uid, daily_goal):
+    st.markdown("### 🔬 Progress & Analytics")
+    if st.toggle("Show long-term analytics", key="show_analytics"):
+        stats = store.get_analytics(uid, daily_goal)
+        if not stats["tracked_days"]:
+            st.info("💡 Log some water to unlock your long-term analytics!")
+        else:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Total Consumed", f"{stats['total_ml']/1000:.1f} L")
+            col2.metric("Daily Average", f"{stats['avg_daily_ml']/1000:.2f} L")
+            col3.metric("Goal-Hit Rate", f"{stats['goal_hit_rate']:.0%}")
+            col4.metric("Longest Streak", f"{store.compute_streaks(uid)['longest_streak']} days")
+            for note in stats["insights"]:
+                st.markdown(f"- {note}")
+            recent = slice(-90, None)
+            st.markdown("**Daily intake and 7-day average (L, last 90 days)**")
+            st.line_chart({
+                "day": stats["days"][recent].astype(str),
+                "Daily": stats["daily_ml"][recent] / 1000,
+                "7-day average": stats["rolling_avg_ml"][recent] / 1000,
+            }, x="day")
+            st.markdown("**Monthly totals (L)**")
+            st.bar_chart({
+                "month": [m["month"] for m in stats["monthly"]],
+                "litres": [m["total_ml"] / 1000 for m in stats["monthly"]],
+            }, x="month", y="litres")
+            st.markdown("**When you drink (ml by hour of day)**")
+            st.bar_chart({"hour": [f"{h:02d}:00" for h in range(24)], "ml": stats["hourly_ml"]}, x="hour", y="ml")
+
+# ---------- LOG WATER PANEL ----------
+# a quick-add tap reruns only this panel: the insert, then the bottle, totals and today's list
+@fragment("log")
+def log_water_panel(uid, daily_goal):
+    st.markdown("### ⚡ Quick Log (Tap to Add)")
+    quick_amounts = [100, 200, 250, 330, 500]
+    col1, col2, col3, col4, col5 = st.columns(5)
+    amount = None
+    if col1.button(f"💧 {quick_amounts[0]} ml", key="q1"): amount = quick_amounts[0]
+    if col2.button(f"💧 {quick_amounts[1]} ml", key="q2"): amount = quick_amounts[1]
+    if col3.button(f"💧 {quick_amounts[2]} ml", key="q3"): amount = quick_amounts[2]
+    if col4.button(f"💧 {quick_amounts[3]} ml", key="q4"): amount = quick_amounts[3]
+    if col5.button(f"💧 {quick_amounts[4]} ml", key="q5"): amount = quick_amounts[4]
+
+    st.markdown("### 🎯 Custom Amount")
+    custom = st.number_input("Enter custom amount (ml):", min_value=50, max_value=2000, value=250, step=50, key="custom_input")
+    if st.button("➕ Add Custom Amount", key="add_custom"):
+        amount = custom
+
+    if amount:
+        now = datetime.now()
+        time_12hr = now.strftime("%I:%M %p")
+        store.log_water(uid, amount)
+        st.success(f"✅ Added {amount} ml at {time_12hr}!")
+        st.balloons()
+
+    # read after the insert, so this same fragment run already shows the new total
+    today_total = store.get_today_total(uid)
+    progress_percentage = (today_total / daily_goal) * 100 if daily_goal else 0
+
     st.markdown("---")
+    st.markdown("### 📊 Today's Progress")
+    mascot = assets.get(get_mascot_image(progress_percentage))
+    motivational_msg = get_motivational_message(progress_percentage)
+    col_mascot, col_progress = st.columns([1, 2])
+    with col_mascot:
+        if mascot:
+            st.image(mascot, width=MASCOT_WIDTH)
+        st.markdown(f"**{motivational_msg}**")
+    with col_progress:
+        bottle_fill = min(progress_percentage, 100)
+        st.markdown(f"""
+            <div style="text-align: center;">
+                <div style="
+                    width: 120px;
+                    height: 240px;
+                    border: 3px solid #ffffff;
+                    border-radius: 15px 15px 30px 30px;
+                    position: relative;
+                    margin: 10px auto;
+                    box-shadow: 0 6px 12px rgba(0,0,0,0.3);
+                    background: linear-gradient(to top, #00BFFF {bottle_fill}%, transparent {bottle_fill}%);
+                ">
+                    <div style="
+                        position: absolute;
+                        top: 50%;
+                        left: 50%;
+                        transform: translate(-50%, -50%);
+                        font-size: 20px;
+                        font-weight: bold;
+                        color: {'#ffffff' if bottle_fill > 50 else '#000000'};
+                    ">
+                        {progress_percentage:.0f}%
+                    </div>
+                </div>
+            </div>
+        """, unsafe_allow_html=True)
+        st.progress(min(progress_percentage / 100, 1.0))
+        st.markdown(f"<h3 style='text-align:center;'>{today_total} ml / {daily_goal} ml</h3>", unsafe_allow_html=True)
+
+    st.markdown("---")
+    st.markdown("### 📝 Today's Log History")
+    todays_entries = [dict(r) for r in store.get_logs_for_date(uid, today_str())]
+    if todays_entries:
+        for entry in todays_entries[:10]:
+            display_time = from_ts(entry["ts"]).strftime("%I:%M %p")
+            st.markdown(f"""
+                <div class='log-entry'>
+                    🕒 <strong>{display_time}</strong> — <strong>{entry.get('amount_ml', 0)} ml</strong>
+                </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.info("No water logged yet today. Start now!")
 
 # ---------- LOGIN / SIGN UP ----------
 if st.session_state.page == "Login":
@@ -517,7 +454,7 @@ if st.session_state.page == "Login":
         with col1:
             if st.button("➖", key="minus_age") and st.session_state.age > 1:
                 st.session_state.age -= 1
-                st.rerun()
+                rerun()
         with col2:
             typed_age = st.number_input(
                 "or type age:",
@@ -535,7 +472,7 @@ if st.session_state.page == "Login":
         with col3:
             if st.button("➕", key="plus_age") and st.session_state.age < 120:
                 st.session_state.age += 1
-                st.rerun()
+                rerun()
 
         recommended_goal = calculate_daily_goal(st.session_state.age)
         st.info(f"💡 **Recommended daily water intake for your age:** {recommended_goal:.1f} litres")
@@ -557,14 +494,14 @@ if st.session_state.page == "Login":
                 st.warning("⚠️ Please enter a password!")
             else:
                 username = name.strip()
-                created = create_user(username, password, st.session_state.age, None, int(custom_goal * 1000))
+                created = store.create_user(username, password, st.session_state.age, None, int(custom_goal * 1000))
                 if created:
                     st.session_state.user = username
                     st.session_state.user_id = created
                     st.success(f"🎉 Welcome {username}! Your account has been created!")
                     st.balloons()
                     st.session_state.page = "Dashboard"
-                    st.rerun()
+                    rerun()
                 else:
                     st.error("❌ Username already exists! Try logging in instead.")
     else:
@@ -576,13 +513,13 @@ if st.session_state.page == "Login":
                 st.warning("⚠️ Please enter your password!")
             else:
                 username = name.strip()
-                user = check_login(username, password)
+                user = store.check_login(username, password)
                 if user:
                     st.session_state.user = username
                     st.session_state.user_id = user["id"]
                     st.success(f"✅ Welcome back, {username}! 💧")
                     st.session_state.page = "Dashboard"
-                    st.rerun()
+                    rerun()
                 else:
                     st.error("❌ Invalid username or password")
 
@@ -596,16 +533,16 @@ elif st.session_state.page == "Dashboard":
         st.session_state.user = None
         st.session_state.user_id = None
         st.session_state.page = "Login"
-        st.rerun()
+        rerun()
 
-    user_row = get_user_by_username(uname)
+    user_row = store.get_user_by_username(uname)
     profile = {
         "name": user_row["username"],
         "age": user_row["age"],
         "weight": user_row["weight"]
     }
     daily_goal = user_row["daily_goal_ml"] or 2000
-    today_total = get_today_total(uid)
+    today_total = store.get_today_total(uid)
     progress_percentage = (today_total / daily_goal) * 100 if daily_goal else 0
 
     st.header(f"📊 Dashboard — {profile.get('name', uname)}")
@@ -640,18 +577,17 @@ elif st.session_state.page == "Dashboard":
         st.metric("Remaining", f"{max(0, daily_goal - today_total)/1000:.2f} L")
 
     st.markdown("---")
-    st.markdown("### 📈 Your 7-Day Hydration History")
-    history = get_7day_history(uid)
-    fig = plot_7day_intake_from_history_dict(history, daily_goal)
-    st.pyplot(fig)
-    plt.close()
+    history_panel(uid, daily_goal)
+
+    st.markdown("---")
+    analytics_panel(uid, daily_goal)
 
     st.markdown("---")
     st.subheader("🔄 Reset Today's Progress")
     if st.button("🗑️ Reset Today"):
-        clear_today_logs(uid)
+        store.clear_today_logs(uid)
         st.success("Today's data cleared.")
-        st.rerun()
+        rerun()
 
 # ---------- LOG WATER ----------
 elif st.session_state.page == "Log Water":
@@ -663,93 +599,12 @@ elif st.session_state.page == "Log Water":
         st.session_state.user = None
         st.session_state.user_id = None
         st.session_state.page = "Login"
-        st.rerun()
+        rerun()
 
     st.header("💧 Log Water Intake")
-    today_total = get_today_total(uid)
-    user_row = get_user_by_username(uname)
+    user_row = store.get_user_by_username(uname)
     daily_goal = user_row["daily_goal_ml"] or 2000
-    progress_percentage = (today_total / daily_goal) * 100 if daily_goal else 0
-
-    st.markdown("### ⚡ Quick Log (Tap to Add)")
-    quick_amounts = [100, 200, 250, 330, 500]
-    col1, col2, col3, col4, col5 = st.columns(5)
-    amount = None
-    if col1.button(f"💧 {quick_amounts[0]} ml", key="q1"): amount = quick_amounts[0]
-    if col2.button(f"💧 {quick_amounts[1]} ml", key="q2"): amount = quick_amounts[1]
-    if col3.button(f"💧 {quick_amounts[2]} ml", key="q3"): amount = quick_amounts[2]
-    if col4.button(f"💧 {quick_amounts[3]} ml", key="q4"): amount = quick_amounts[3]
-    if col5.button(f"💧 {quick_amounts[4]} ml", key="q5"): amount = quick_amounts[4]
-
-    st.markdown("### 🎯 Custom Amount")
-    custom = st.number_input("Enter custom amount (ml):", min_value=50, max_value=2000, value=250, step=50, key="custom_input")
-    if st.button("➕ Add Custom Amount", key="add_custom"):
-        amount = custom
-
-    if amount:
-        now = datetime.now()
-        time_24hr = now.strftime("%H:%M:%S")
-        time_12hr = now.strftime("%I:%M %p")
-        log_water(uid, amount)
-        st.success(f"✅ Added {amount} ml at {time_12hr}!")
-        st.balloons()
-        st.rerun()
-
-    st.markdown("---")
-    st.markdown("### 📊 Today's Progress")
-    mascot_path = get_mascot_image(progress_percentage)
-    motivational_msg = get_motivational_message(progress_percentage)
-    col_mascot, col_progress = st.columns([1, 2])
-    with col_mascot:
-        if os.path.exists(mascot_path):
-            st.image(mascot_path, width=200)
-        st.markdown(f"**{motivational_msg}**")
-    with col_progress:
-        bottle_fill = min(progress_percentage, 100)
-        st.markdown(f"""
-            <div style="text-align: center;">
-                <div style="
-                    width: 120px;
-                    height: 240px;
-                    border: 3px solid #ffffff;
-                    border-radius: 15px 15px 30px 30px;
-                    position: relative;
-                    margin: 10px auto;
-                    box-shadow: 0 6px 12px rgba(0,0,0,0.3);
-                    background: linear-gradient(to top, #00BFFF {bottle_fill}%, transparent {bottle_fill}%);
-                ">
-                    <div style="
-                        position: absolute;
-                        top: 50%;
-                        left: 50%;
-                        transform: translate(-50%, -50%);
-                        font-size: 20px;
-                        font-weight: bold;
-                        color: {'#ffffff' if bottle_fill > 50 else '#000000'};
-                    ">
-                        {progress_percentage:.0f}%
-                    </div>
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        st.progress(min(progress_percentage / 100, 1.0))
-        st.markdown(f"<h3 style='text-align:center;'>{today_total} ml / {daily_goal} ml</h3>", unsafe_allow_html=True)
-
-    st.markdown("---")
-    st.markdown("### 📝 Today's Log History")
-    todays_entries = [dict(r) for r in get_logs_for_date(uid, today_str())]
-    if todays_entries:
-        for entry in todays_entries[:10]:
-            ts = entry.get("timestamp")
-            dt = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
-            display_time = dt.strftime("%I:%M %p")
-            st.markdown(f"""
-                <div class='log-entry'>
-                    🕒 <strong>{display_time}</strong> — <strong>{entry.get('amount_ml', 0)} ml</strong>
-                </div>
-            """, unsafe_allow_html=True)
-    else:
-        st.info("No water logged yet today. Start now!")
+    log_water_panel(uid, daily_goal)
 
 # ---------- CHALLENGES ----------
 elif st.session_state.page == "Challenges":
@@ -760,7 +615,7 @@ elif st.session_state.page == "Challenges":
         st.session_state.user = None
         st.session_state.user_id = None
         st.session_state.page = "Login"
-        st.rerun()
+        rerun()
 
     st.header("🏁 Hydration Challenges")
     st.markdown("### 🎯 Create a New Challenge")
@@ -770,27 +625,28 @@ elif st.session_state.page == "Challenges":
     if st.button("🚀 Create Challenge", key="create_ch"):
         if not ch_name.strip():
             ch_name = f"{daily_goal}L for {days} days"
-        add_challenge(uid, ch_name, days, daily_goal, today_str())
+        store.add_challenge(uid, ch_name, days, daily_goal, today_str())
         st.success(f"✅ Challenge '{ch_name}' created!")
         st.balloons()
-        st.rerun()
+        rerun()
 
     st.markdown("---")
-    challenges = get_challenges(uid)
+    # settles finished challenges (completion badge included) and reports days at goal for running ones
+    evaluation = store.evaluate_challenges(uid)
+    for _, name in evaluation["completed"]:
+        st.success(f"🎉 Challenge '{name}' completed!")
+    challenges = store.get_challenges(uid)
     if challenges:
         st.subheader("🎮 Your Active Challenges")
         for ch in challenges:
-            status = "✅ Completed" if ch.get("done") else "🔥 In Progress"
+            status = {1: "✅ Completed", -1: "❌ Missed"}.get(ch.get("done"), "🔥 In Progress")
             with st.expander(f"{status} — {ch.get('name', 'Unnamed Challenge')}"):
                 st.write(f"**Duration:** {ch.get('days', '?')} days")
                 st.write(f"**Daily Goal:** {ch.get('goal', '?')} L")
                 st.write(f"**Started:** {ch.get('start', '?')}")
-                if not ch.get("done", False):
-                    if st.button(f"Mark as Complete", key=f"complete_{ch['id']}"):
-                        mark_challenge_done(ch['id'])
-                        award_badge(uid, f"✅ Completed: {ch['name']}")
-                        st.success("🎉 Challenge completed!")
-                        st.rerun()
+                if ch["id"] in evaluation["progress"]:
+                    met = evaluation["progress"][ch["id"]]
+                    st.progress(met / ch["days"], text=f"{met} / {ch['days']} days at goal")
     else:
         st.info("💡 No challenges yet. Create one to stay motivated!")
 
@@ -803,11 +659,11 @@ elif st.session_state.page == "Badges":
         st.session_state.user = None
         st.session_state.user_id = None
         st.session_state.page = "Login"
-        st.rerun()
+        rerun()
 
     st.markdown("<h2 style='color:#FFD166;'>🏅 Your Badges & Achievements</h2>", unsafe_allow_html=True)
 
-    streaks = compute_streaks(uid)
+    streaks = store.compute_streaks(uid)
     current_streak = streaks["current_streak"]
     longest_streak = streaks["longest_streak"]
 
@@ -823,7 +679,7 @@ elif st.session_state.page == "Badges":
         st.caption(f"{current_streak}/{next_goal} days toward your next milestone!")
 
     st.markdown("---")
-    badges = get_badges(uid)
+    badges = store.get_badges(uid)
     if not badges:
         st.info("🎯 No badges yet — keep hydrating to unlock achievements!")
     else:
@@ -836,6 +692,19 @@ elif st.session_state.page == "Badges":
 </div>
 """, unsafe_allow_html=True)
 
+    st.markdown("---")
+    st.markdown("### 🏆 Top Hydrators")
+    board_period = st.radio("Leaderboard:", ["This week", "This month"], horizontal=True, key="board_period")
+    period = "week" if board_period == "This week" else "month"
+    me = store.get_my_rank(uid, period)
+    if me["rank"] is None:
+        st.info("💧 Log some water to join this leaderboard!")
+    else:
+        st.metric("Your Rank", f"#{me['rank']} of {me['users']}", delta=f"ahead of {me['percentile']:.0f}% of hydrators", delta_color="off")
+    for row in store.get_top_hydrators(period, k=10):
+        highlight = " ⬅️ you" if row["user_id"] == uid else ""
+        st.markdown(f"**#{row['rank']}** {row['username']} — {row['total_ml']/1000:.1f} L{highlight}")
+
 # ---------- SETTINGS ----------
 elif st.session_state.page == "Settings":
     navbar()
@@ -845,10 +714,10 @@ elif st.session_state.page == "Settings":
         st.session_state.user = None
         st.session_state.user_id = None
         st.session_state.page = "Login"
-        st.rerun()
+        rerun()
 
     st.markdown("<h2 style='color:#FFD166;'>⚙️ Settings</h2>", unsafe_allow_html=True)
-    user_row = get_user_by_username(st.session_state.user)
+    user_row = store.get_user_by_username(st.session_state.user)
     profile = {"name": user_row["username"], "age": user_row["age"], "weight": user_row["weight"]}
 
     st.subheader("👤 User Information")
@@ -866,15 +735,15 @@ elif st.session_state.page == "Settings":
         step=0.1
     )
     if st.button("💾 Update Goal"):
-        update_user_profile(uid, daily_goal_ml=int(new_goal * 1000))
+        store.update_user_profile(uid, daily_goal_ml=int(new_goal * 1000))
         st.success(f"✅ Goal updated successfully to {new_goal:.1f} L!")
-        st.rerun()
+        rerun()
 
     st.markdown("---")
     st.subheader("🔔 Reminder Settings")
     st.info("💡 Enable reminders to get periodic notifications to drink water throughout the day!")
 
-    settings = get_settings(uid)
+    settings = store.get_settings(uid)
     rem_enabled = st.checkbox(
         "Enable in-app reminders",
         value=settings.get("reminder_enabled", False),
@@ -897,11 +766,11 @@ elif st.session_state.page == "Settings":
     st.info(f"⏰ You will receive reminders every {rem_minutes} minutes between {rem_start.strftime('%I:%M %p')} and 10:00 PM")
 
     if st.button("💾 Save Reminder Settings"):
-        update_settings(uid, rem_enabled, rem_minutes, rem_start.strftime("%H:%M"))
+        store.update_settings(uid, rem_enabled, rem_minutes, rem_start.strftime("%H:%M"))
         st.session_state.last_reminder_time = None
         st.session_state.reminder_dismissed = False
         st.success("✅ Reminder settings saved!")
-        st.rerun()
+        rerun()
 
     st.markdown("---")
     if settings.get("reminder_enabled", False):
@@ -924,7 +793,33 @@ elif st.session_state.page == "Settings":
         st.session_state.last_reminder_time = None
         st.session_state.reminder_dismissed = False
         st.success("✅ Logged out successfully!")
-        st.rerun()
+        rerun()
+
+    if DEBUG_PANEL:
+        st.markdown("---")
+        st.subheader("🔧 Diagnostics")
+        st.write("**Read cache:**", store.cache.stats())
+        metrics = store.metrics
+        pages = metrics.summaries("page")
+        per_run = metrics.summaries("queries_per_run")
+        st.write("**Page renders (ms):**")
+        st.dataframe(
+            [{"page": p, **summary, "queries/run": per_run.get(p, {}).get("mean", 0)} for p, summary in pages.items()],
+            hide_index=True
+        )
+        st.write("**Queries by total time (ms):**")
+        st.dataframe([{"query": q, **summary} for q, summary in list(metrics.summaries("query").items())[:25]], hide_index=True)
+        st.write(f"**Slow queries (≥ {metrics.slow_query_ms:g} ms):**")
+        for entry in reversed(metrics.slow_queries):
+            st.markdown(f"`{entry['at']}` — **{entry['ms']} ms**")
+            st.code(f"{entry['sql']}\n\n{entry['plan']}", language="sql")
+        if not metrics.slow_queries:
+            st.write("None yet.")
+        c1, c2 = st.columns(2)
+        c1.download_button("⬇️ Download metrics", metrics.to_text(), file_name="waterbuddy-metrics.txt")
+        if c2.button("♻️ Reset metrics"):
+            metrics.reset()
+            rerun()
 
     st.markdown("---")
     st.subheader("🗑️ Reset All Data")
@@ -932,14 +827,17 @@ elif st.session_state.page == "Settings":
     RC = st.checkbox("I confirm I want to delete all my data.", key="confirm_delete")
     if st.button("❌ Delete All Data"):
         if RC:
-            delete_all_user_data(uid)
+            store.delete_all_user_data(uid)
             st.session_state.user = None
             st.session_state.user_id = None
             st.session_state.page = "Login"
             st.session_state.last_reminder_time = None
             st.session_state.reminder_dismissed = False
             st.success("✅ All your data has been deleted.")
-            st.rerun()
+            rerun()
         else:
             st.warning("⚠️ Please confirm before deleting your data.")
 
+# ---------- INSTRUMENTATION (end of run) ----------
+if page_run:
+    page_run.finish()
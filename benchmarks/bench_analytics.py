@@ -0,0 +1,50 @@
+# Latency of Store.get_analytics on multi-year histories; fails (exit 1) over --budget-ms.
+#
+#   python benchmarks/bench_analytics.py --years 1 3 5 --logs-per-day 8 [--backend memory]
+#
+# Timed through __wrapped__, i.e. a cache miss: both queries plus the NumPy pass. The memory backend
+# runs the same NumPy pass over Python structures, so the gap between the two is the engine's.
+import argparse
+import os
+import statistics
+import sys
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from generate_data import generate, scratch_store, uncached  # noqa: E402
+from waterbuddy import BACKENDS  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="long-term analytics latency")
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--logs-per-day", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--budget-ms", type=float, default=50)
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    args = parser.parse_args()
+
+    store = scratch_store(args.backend)
+    get_analytics = uncached(store, "get_analytics")
+    get_analytics(0, 2000)  # pay the NumPy import outside the timings
+    failed = False
+    print(f"{'years':>6} {'logs':>8} {'p50 ms':>8} {'max ms':>8}")
+    for years in args.years:
+        days = 365 * years
+        uid = generate(store, users=1, logs_per_user=days * args.logs_per_day, span_days=days, seed=years)[0]
+        samples = []
+        for _ in range(args.repeat):
+            start = perf_counter()
+            get_analytics(uid, 2000)
+            samples.append((perf_counter() - start) * 1000)
+        p50 = statistics.median(samples)
+        failed |= p50 > args.budget_ms
+        print(f"{years:>6} {days * args.logs_per_day:>8} {p50:>8.2f} {max(samples):>8.2f}"
+              f"  {'OVER BUDGET' if p50 > args.budget_ms else 'ok'}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
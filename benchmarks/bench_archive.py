@@ -0,0 +1,90 @@
+# Hot database size and read latency before/after archiving old water logs into per-year files.
+#
+#   python benchmarks/bench_archive.py --users 200 --logs-per-user 3000 --span-days 1460
+#
+# A synthetic multi-year database is generated, then Store.archive_logs (timed) moves everything past
+# --horizon-days out of the hot file and Store.compact hands the freed pages back. Recent reads only
+# touch the hot file; "old day" reads attach the archive for their year.
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from generate_data import generate  # noqa: E402
+from waterbuddy import Store, day_range  # noqa: E402
+
+
+def hot_size(store):
+    with store.pool.maintenance() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        pages, free = (conn.execute(f"PRAGMA {p}").fetchone()[0] for p in ("page_count", "freelist_count"))
+    return os.path.getsize(store.path), pages, free
+
+
+def latencies(store, user_ids, repeat, seed, span_days):
+    rng = random.Random(seed)
+    today = date.today()
+    reads = {
+        "today": lambda uid: store.get_logs_between(uid, *day_range(today.isoformat())),
+        "sum_7_days": lambda uid: store.sum_logs_between(uid, *day_range((today - timedelta(days=6)).isoformat(), today.isoformat())),
+        "old_day": lambda uid: store.get_logs_between(uid, *day_range((today - timedelta(days=span_days - 30)).isoformat())),
+    }
+    results = {}
+    for name, read in reads.items():
+        samples = []
+        for _ in range(repeat):
+            uid = rng.choice(user_ids)
+            start = perf_counter()
+            read(uid)
+            samples.append((perf_counter() - start) * 1000)
+        results[name] = statistics.median(samples)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="hot database size / read latency before and after archiving")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--logs-per-user", type=int, default=3000)
+    parser.add_argument("--span-days", type=int, default=1460)
+    parser.add_argument("--horizon-days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    store = Store(os.path.join(workdir, "bench.db"))
+    store.init_db()
+    user_ids = generate(store, args.users, args.logs_per_user, args.span_days, seed=args.seed)
+    before = hot_size(store), latencies(store, user_ids, args.repeat, args.seed, args.span_days)
+
+    start = perf_counter()
+    stats = store.archive_logs(args.horizon_days)
+    archive_s = perf_counter() - start
+    start = perf_counter()
+    freed = store.compact()
+    compact_s = perf_counter() - start
+    after = hot_size(store), latencies(store, user_ids, args.repeat, args.seed, args.span_days)
+
+    archives = [f for f in os.listdir(workdir) if ".archive-" in f and f.endswith(".db")]
+    archive_kib = sum(os.path.getsize(os.path.join(workdir, f)) for f in archives) / 1024
+    print(f"{args.users} users x {args.logs_per_user} logs over {args.span_days} days; "
+          f"archived {stats['rows']} logs into {len(archives)} files ({archive_kib:.0f} KiB) in {archive_s:.2f} s, "
+          f"compact freed {freed} pages in {compact_s:.2f} s\n")
+    print(f"{'':>16} {'before':>10} {'after':>10} {'change':>8}")
+    for label, i in (("hot file (KiB)", 0), ("pages", 1)):
+        b, a = before[0][i] / (1024 if i == 0 else 1), after[0][i] / (1024 if i == 0 else 1)
+        print(f"{label:>16} {b:>10.0f} {a:>10.0f} {a / b - 1:>+8.0%}")
+    print(f"{'free pages':>16} {before[0][2]:>10} {after[0][2]:>10}")
+    for name in before[1]:
+        b, a = before[1][name], after[1][name]
+        print(f"{name + ' (ms)':>16} {b:>10.3f} {a:>10.3f} {a / b - 1:>+8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Per-rerun cost of showing a mascot on the Log Water page: st.image on the file path (the old code)
+# vs st.image on the in-memory, pre-sized bytes from waterbuddy.AssetCache.
+#
+#   python benchmarks/bench_assets.py --repeat 50
+#
+# Timed is st.image's per-call image work (image_utils.image_to_url: read, decode, resize/re-encode);
+# without a running server it skips only the media file manager. "disk" is what a rerun reads from
+# image/, "served" what Streamlit hands the media file manager (what each new session downloads).
+import argparse
+import os
+import statistics
+import sys
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from streamlit.elements.lib import image_utils  # noqa: E402
+from streamlit.elements.lib.layout_utils import LayoutConfig  # noqa: E402
+from waterbuddy import AssetCache  # noqa: E402
+from waterbuddy.assets import MASCOT_WIDTH  # noqa: E402
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        samples.append((perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def show(image):
+    return image_utils.image_to_url(image, LayoutConfig(width=MASCOT_WIDTH), False, "RGB", "auto", "mascot")
+
+
+def served(data):
+    # the bytes st.image stores for `data` (the same steps as image_utils.image_to_url)
+    fmt = image_utils._validate_image_format_string(data, "auto")
+    return image_utils._ensure_image_size_and_format(data, LayoutConfig(width=MASCOT_WIDTH), fmt)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mascot st.image cost per rerun: file path vs in-memory cache")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    start = perf_counter()
+    assets = AssetCache(MASCOT_WIDTH, build_dir=None)
+    assets.preload("image")
+    print(f"preload (sizing every mascot in memory): {(perf_counter() - start) * 1000:.1f} ms\n")
+    print(f"{'image':>28} {'path ms':>8} {'cache ms':>9} {'disk B':>8} {'served B':>9} {'cached B':>9}")
+    for name in sorted(os.listdir("image")):
+        path = os.path.join("image", name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+        cached = assets.get(path)
+        before = timed(lambda: show(path), args.repeat)
+        after = timed(lambda: show(cached), args.repeat)
+        print(f"{name:>28} {before:>8.2f} {after:>9.2f} {len(data):>8} {len(served(data)):>9} {len(served(cached)):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Throughput of the streaming importer and exporter against the per-row log_water path.
+#
+#   python benchmarks/bench_bulk_import.py --users 50 --logs-per-user 2000 [--backend memory]
+#
+# log_water   one transaction + badge evaluation per row (timed on --per-row-sample rows)
+# import      Store.import_logs over an NDJSON stream (executemany batches, deferred recompute)
+# export      Store.export_logs -> write_logs to NDJSON; peak is tracemalloc's peak allocation
+import argparse
+import io
+import os
+import random
+import sys
+import tracemalloc
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from generate_data import scratch_store  # noqa: E402
+from waterbuddy import BACKENDS  # noqa: E402
+from waterbuddy.transfer import read_logs, write_logs  # noqa: E402
+
+
+def make_ndjson(usernames, logs_per_user, span_days, seed):
+    rng = random.Random(seed)
+    today = date.today()
+    out = io.StringIO()
+    for name in usernames:
+        for _ in range(logs_per_user):
+            day = today - timedelta(days=rng.randrange(span_days))
+            ts = datetime.combine(day, datetime.min.time()) + timedelta(seconds=rng.randrange(7 * 3600, 23 * 3600))
+            out.write(f'{{"username": "{name}", "amount_ml": {rng.choice([100, 250, 500])}, "timestamp": "{ts.isoformat()}"}}\n')
+    out.seek(0)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bulk import/export throughput")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logs-per-user", type=int, default=2000)
+    parser.add_argument("--span-days", type=int, default=365)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--per-row-sample", type=int, default=2000, help="rows timed through log_water")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    args = parser.parse_args()
+
+    store = scratch_store(args.backend)
+    usernames = [f"import{i}" for i in range(args.users)]
+    for name in usernames:
+        store.create_user(name, "x")
+
+    sample = list(read_logs(make_ndjson(usernames[:1], args.per_row_sample, args.span_days, args.seed), "ndjson"))
+    uid = store.get_user_by_username(usernames[0])["id"]
+    start = perf_counter()
+    for row in sample:
+        store.log_water(uid, row["amount_ml"], row["timestamp"])
+    per_row = len(sample) / (perf_counter() - start)
+
+    data = make_ndjson(usernames, args.logs_per_user, args.span_days, args.seed)
+    stats = store.import_logs(read_logs(data, "ndjson"), args.batch_size)
+
+    tracemalloc.start()
+    start = perf_counter()
+    with open(os.devnull, "w") as sink:
+        count = write_logs(store.export_logs(), sink, "ndjson")
+    export_rate = count / (perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print(f"{'path':>10} {'rows':>10} {'rows/s':>10}")
+    print(f"{'log_water':>10} {len(sample):>10} {per_row:>10.0f}")
+    print(f"{'import':>10} {stats['rows']:>10} {stats['rows_per_sec']:>10}  ({stats['rows_per_sec'] / per_row:.0f}x)")
+    print(f"{'export':>10} {count:>10} {export_rate:>10.0f}  (peak {peak / 1024:.0f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# Render time of the dashboard history chart per backend.
+#
+#   python benchmarks/bench_chart_render.py --repeat 30
+#
+# matplotlib      figure build + PNG rasterization on every call (the old st.pyplot path)
+# matplotlib+cache app.render_history_png with a warm st.cache_data entry (a rerun with unchanged data)
+# altair          chart build + Vega-Lite spec serialization (what is sent to the browser)
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_history(days):
+    today = date.today()
+    return {
+        (today - timedelta(days=d)).isoformat(): {"total_ml": random.randint(0, 3500), "days": 1}
+        for d in range(days - 1, -1, -1)
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        samples.append((perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="history chart render time per backend")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30])
+    args = parser.parse_args()
+
+    os.environ["WATERBUDDY_DB"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+    sys.path.insert(0, ROOT)
+    import app
+    from waterbuddy import charts
+
+    print(f"{'days':>5} {'backend':>17} {'median ms':>10} {'bytes':>9}")
+    for days in args.days:
+        history = make_history(days)
+        title = f"Your Intake vs Target (Past {days} Days)"
+
+        def uncached():
+            return charts.render_png(history, 2000, title)
+
+        def cached():
+            return app.render_history_png(history, 2000, title)
+
+        def altair():
+            return json.dumps(charts.history_chart_altair(history, 2000, title).to_dict())
+
+        cached()
+        for name, fn in (("matplotlib", uncached), ("matplotlib+cache", cached), ("altair", altair)):
+            size = len(fn())
+            print(f"{days:>5} {name:>17} {timed(fn, args.repeat):>10.2f} {size:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# Latency and queries-per-call of every database helper at several data scales.
+#
+#   python benchmarks/bench_db_helpers.py                      # compare against the baseline
+#   python benchmarks/bench_db_helpers.py --save-baseline      # record this machine's baseline
+#   python benchmarks/bench_db_helpers.py --save-baseline --baseline benchmarks/baseline_db_helpers.json
+#   python benchmarks/bench_db_helpers.py --scales small large --iterations 200
+#   python benchmarks/bench_db_helpers.py --scales large xlarge --iterations 50   # 1M vs 10M logs
+#   python benchmarks/bench_db_helpers.py --backend memory    # the same helpers with no database engine
+#   python benchmarks/bench_db_helpers.py --check-metrics     # also fail on statements Metrics would miss
+#
+# Each scale runs in its own interpreter against a fresh synthetic database (generate_data.py).
+# Cached read helpers are timed through __wrapped__, i.e. the database cost of a cache miss.
+# Every per-user helper is an index seek or a read of that user's rollup rows, so its latency should
+# not move between large (1M logs) and xlarge (10M); one that grows with the scale is scanning a table.
+# Write helpers' p95 and p99 do grow somewhat at xlarge, from WAL checkpoints against a file far larger
+# than the page cache, while their p50 stays flat.
+# With --backend memory the data is the same and only the engine differs, so a helper's latency there
+# is its application logic and the rest of its sqlite latency is SQLite.
+# Baselines: benchmarks/baseline_db_helpers.json is the committed reference for the sqlite backend.
+# Queries per call do not depend on the machine, so a run without a local baseline checks them against
+# it (latency is shown but not enforced). --save-baseline writes this machine's baseline to
+# baseline_<name>.local.json (git-ignored, one per backend), which later runs prefer and which also
+# enforces latency. Update the reference, with --baseline as above, when a change means to alter
+# queries per call; the memory backend issues no queries and has only the local baseline.
+# A run fails (exit 1) when a helper issues more queries per call than its baseline, or its
+# p95 exceeds the baseline p95 by more than --tolerance (and --min-delta-ms). With --check-metrics the
+# store is built with a Metrics and a run also fails when any statement a helper runs bypasses its timing.
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+from datetime import date, timedelta
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# backend -> committed reference baseline
+REFERENCE_FILES = {"sqlite": os.path.join(HERE, "baseline_db_helpers.json")}
+# backend -> this machine's baseline, preferred over the reference when present
+BASELINE_FILES = {
+    "sqlite": os.path.join(HERE, "baseline_db_helpers.local.json"),
+    "memory": os.path.join(HERE, "baseline_db_helpers_memory.local.json"),
+}
+
+SCALES = {
+    "small": {"users": 20, "logs_per_user": 200, "span_days": 90},
+    "medium": {"users": 100, "logs_per_user": 1000, "span_days": 365},
+    "large": {"users": 500, "logs_per_user": 2000, "span_days": 730},
+    # 10M logs; several minutes to generate, so only run when asked for
+    "xlarge": {"users": 5000, "logs_per_user": 2000, "span_days": 730},
+}
+
+
+def helper_calls(store):
+    # (name, fn(user) -> None, destructive); user is a dict with id and username
+    from generate_data import uncached
+    today = date.today()
+    new_users = iter(range(1, 10 ** 9))
+    read = {name: uncached(store, name) for name in (
+        "get_user_by_username", "get_today_total", "get_logs_for_date", "get_history", "compute_streaks",
+        "get_badges", "get_challenges", "get_settings",
+    )}
+    return [
+        ("get_user_by_username", lambda u: read["get_user_by_username"](u["username"]), False),
+        ("check_login", lambda u: store.check_login(u["username"], "x"), False),
+        ("get_today_total", lambda u: read["get_today_total"](u["id"]), False),
+        ("get_logs_for_date", lambda u: read["get_logs_for_date"](u["id"], today.isoformat()), False),
+        ("get_7day_history", lambda u: read["get_history"](u["id"], today - timedelta(days=6), today), False),
+        ("get_history_365_month", lambda u: read["get_history"](u["id"], today - timedelta(days=364), today, "month"), False),
+        ("compute_streaks", lambda u: read["compute_streaks"](u["id"]), False),
+        ("get_badges", lambda u: read["get_badges"](u["id"]), False),
+        ("get_challenges", lambda u: read["get_challenges"](u["id"]), False),
+        ("get_settings", lambda u: read["get_settings"](u["id"]), False),
+        ("award_badges_for_user", lambda u: store.award_badges_for_user(u["id"]), False),
+        ("create_user", lambda u: store.create_user(f"new{next(new_users)}", "x", 30, 70.0), False),
+        ("update_user_profile", lambda u: store.update_user_profile(u["id"], 30, 70.0, 2000), False),
+        ("log_water", lambda u: store.log_water(u["id"], 250), False),
+        ("update_settings", lambda u: store.update_settings(u["id"], True, 120, "09:00"), False),
+        ("clear_today_logs", lambda u: store.clear_today_logs(u["id"]), False),
+        ("delete_all_user_data", lambda u: store.delete_all_user_data(u["id"]), True),
+    ]
+
+
+def percentile(samples, p):
+    return statistics.quantiles(samples, n=100, method="inclusive")[p - 1] if len(samples) > 1 else samples[0]
+
+
+def trace_queries(store, count):
+    # count statements on every pooled connection, including ones opened during the run
+    connect = store.pool._connect
+
+    def traced_connect(read_only=False):
+        conn = connect(read_only)
+        conn.set_trace_callback(count)
+        return conn
+
+    store.pool._connect = traced_connect
+    store.pool._writer.set_trace_callback(count)
+    for conn in list(store.pool._readers.queue):
+        conn.set_trace_callback(count)
+
+
+def traced_frames():
+    # code objects of the methods through which Metrics times a statement
+    from waterbuddy.db import TracedConnection, TracedCursor
+    return {fn.__code__ for cls in (TracedConnection, TracedCursor)
+            for fn in (cls.execute, cls.executemany, cls.executescript)}
+
+
+def run_scale(scale, iterations, seed, backend, check_metrics=False):
+    # child process: build the scratch database, then time every helper against it
+    sys.path.insert(0, HERE)
+    from generate_data import generate, scratch_store
+
+    if check_metrics:
+        from waterbuddy.metrics import Metrics
+        store = scratch_store(backend, metrics=Metrics(slow_query_ms=float("inf")))
+        traced = traced_frames()
+    else:
+        store = scratch_store(backend)
+    user_ids = generate(store, seed=seed, **SCALES[scale])
+
+    queries = [0]
+    untimed = {}
+    helper = [None]
+
+    def count(statement):
+        queries[0] += 1
+        if check_metrics:
+            # the trace callback runs inside the Python call that stepped the statement
+            frame = sys._getframe(1)
+            while frame is not None and frame.f_code not in traced:
+                frame = frame.f_back
+            if frame is None:
+                # bound values are inlined here, so keep one example per helper
+                untimed.setdefault(helper[0], " ".join(statement.split())[:80])
+
+    if hasattr(store, "pool"):
+        trace_queries(store, count)
+
+    rng = random.Random(seed)
+    users = [{"id": uid, "username": f"user{uid}"} for uid in user_ids]
+    doomed = users[-min(iterations, len(users) // 2):]
+    live = users[:len(users) - len(doomed)]
+    results = {}
+    for name, fn, destructive in helper_calls(store):
+        helper[0] = name
+        pool_users = doomed if destructive else live
+        samples, counts = [], []
+        for i in range(min(iterations, len(pool_users)) if destructive else iterations):
+            user = pool_users[i] if destructive else rng.choice(pool_users)
+            queries[0] = 0
+            start = perf_counter()
+            fn(user)
+            samples.append((perf_counter() - start) * 1000)
+            counts.append(queries[0])
+        results[name] = {
+            "p50_ms": round(percentile(samples, 50), 4),
+            "p95_ms": round(percentile(samples, 95), 4),
+            "p99_ms": round(percentile(samples, 99), 4),
+            "queries": round(statistics.mean(counts), 2),
+        }
+    if check_metrics:
+        results = {"helpers": results, "untimed": untimed}
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="database helper latency benchmark")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=list(BASELINE_FILES), default="sqlite")
+    parser.add_argument("--baseline", help="default: the backend's local file in benchmarks/, else its reference")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check-metrics", action="store_true", help="fail when a statement is not timed by Metrics")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed p95 growth over baseline (0.5 = +50%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=0.1, help="ignore p95 growth smaller than this")
+    parser.add_argument("--child", choices=list(SCALES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_scale(args.child, args.iterations, args.seed, args.backend, args.check_metrics)
+        return
+    if args.check_metrics and args.backend != "sqlite":
+        parser.error("--check-metrics needs the sqlite backend")
+    if not args.baseline:
+        local, reference = BASELINE_FILES[args.backend], REFERENCE_FILES.get(args.backend)
+        args.baseline = local if args.save_baseline or os.path.exists(local) or not reference else reference
+    # latency measured on another machine says nothing about this one
+    check_latency = os.path.abspath(args.baseline) not in map(os.path.abspath, REFERENCE_FILES.values())
+
+    baseline, same_sample = {}, True
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        baseline = saved["scales"]
+        print(f"baseline: {os.path.relpath(args.baseline)}" + ("" if check_latency else " (reference; comparing queries only)"))
+        # the users sampled (and so mean queries per call) depend on the iteration count and seed
+        same_sample = (saved["iterations"], saved.get("seed", 0)) == (args.iterations, args.seed)
+        if not same_sample:
+            print(f"baseline used --iterations {saved['iterations']} --seed {saved.get('seed', 0)}; " + ("comparing latency only" if check_latency else "nothing to compare"))
+
+    report, regressions = {}, []
+    for scale in args.scales:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", scale, "--iterations", str(args.iterations), "--seed", str(args.seed),
+             "--backend", args.backend] + (["--check-metrics"] if args.check_metrics else []),
+            capture_output=True, text=True, check=True
+        ).stdout
+        report[scale] = json.loads(out.strip().splitlines()[-1])
+        if args.check_metrics:
+            for name, sql in report[scale]["untimed"].items():
+                regressions.append(f"{scale}/{name}: not timed by Metrics, e.g. {sql}")
+            report[scale] = report[scale]["helpers"]
+        print(f"\n[{scale}] {SCALES[scale]} on {args.backend}")
+        print(f"{'helper':>24} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}  vs baseline")
+        for name, r in report[scale].items():
+            note = ""
+            base = baseline.get(scale, {}).get(name)
+            if base:
+                if same_sample and r["queries"] > base["queries"]:
+                    regressions.append(f"{scale}/{name}: queries {base['queries']} -> {r['queries']}")
+                    note = "MORE QUERIES"
+                elif not check_latency:
+                    note = "ok"
+                elif r["p95_ms"] > max(base["p95_ms"] * (1 + args.tolerance), base["p95_ms"] + args.min_delta_ms):
+                    regressions.append(f"{scale}/{name}: p95 {base['p95_ms']} -> {r['p95_ms']} ms")
+                    note = "SLOWER"
+                else:
+                    note = f"{r['p95_ms'] / base['p95_ms']:.2f}x p95" if base["p95_ms"] else "ok"
+            print(f"{name:>24} {r['p50_ms']:>9.3f} {r['p95_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['queries']:>8}  {note}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"iterations": args.iterations, "seed": args.seed, "scales": report}, f, indent=2, sort_keys=True)
+        print(f"\nbaseline saved to {args.baseline}")
+    if regressions:
+        print("\nregressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
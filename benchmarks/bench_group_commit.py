@@ -0,0 +1,60 @@
+# Compare log_water insert throughput: one commit per call vs the group-commit writer.
+#
+#   python benchmarks/bench_group_commit.py --threads 1 8 32 --logs 200
+#
+# Runs against a scratch database through waterbuddy.Store, without Streamlit.
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from waterbuddy import GroupCommitWriter, Store  # noqa: E402
+
+
+def run(threads, logs_per_thread, log_fn, user_ids):
+    def worker(uid):
+        for _ in range(logs_per_thread):
+            log_fn(uid)
+
+    workers = [threading.Thread(target=worker, args=(user_ids[i],)) for i in range(threads)]
+    start = perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return threads * logs_per_thread / (perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="log_water throughput: per-call commit vs group commit")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--logs", type=int, default=200, help="inserts per thread")
+    parser.add_argument("--interval-ms", type=int, default=0, help="group-commit linger window")
+    parser.add_argument("--synchronous", default="FULL", help="PRAGMA synchronous for the writer; the app pool uses NORMAL")
+    args = parser.parse_args()
+
+    store = Store(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    store.init_db()
+    store.pool._writer.execute(f"PRAGMA synchronous = {args.synchronous}")
+    user_ids = [store.create_user(f"bench{i}", "x") for i in range(max(args.threads))]
+    group = GroupCommitWriter(store.pool, args.interval_ms)
+
+    def per_call(uid):
+        store.write_log(uid, 250, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def grouped(uid):
+        group.submit(store.write_log, uid, 250, datetime.now().strftime("%Y-%m-%d %H:%M:%S")).result()
+
+    print(f"{'threads':>8} {'per-call/s':>12} {'group/s':>12} {'speedup':>8}")
+    for n in args.threads:
+        a = run(n, args.logs, per_call, user_ids)
+        b = run(n, args.logs, grouped, user_ids)
+        print(f"{n:>8} {a:>12.0f} {b:>12.0f} {b / a:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
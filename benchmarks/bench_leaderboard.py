@@ -0,0 +1,86 @@
+# Leaderboard query cost: precomputed boards vs aggregating water_logs on every page view.
+#
+#   python benchmarks/bench_leaderboard.py --users 20000 --logs-per-user 30 [--backend memory]
+#
+# live     GROUP BY over this week's water_logs (top-10, then a COUNT for "my rank"; sqlite only)
+# board    Store.get_top_hydrators / get_my_rank against the in-memory PeriodBoard
+# Also reports the one-pass rebuild, the board load, and the per-log incremental update.
+import argparse
+import os
+import random
+import statistics
+import sys
+from datetime import date, timedelta
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from generate_data import generate, scratch_store  # noqa: E402
+from waterbuddy import BACKENDS, day_range, to_ts  # noqa: E402
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = perf_counter()
+        fn()
+        samples.append((perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="leaderboard top-K / rank latency")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--logs-per-user", type=int, default=30)
+    parser.add_argument("--span-days", type=int, default=14)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    args = parser.parse_args()
+
+    store = scratch_store(args.backend)
+    user_ids = generate(store, args.users, args.logs_per_user, args.span_days, badges_per_user=0,
+                        challenges_per_user=0, seed=args.seed)
+    rng = random.Random(args.seed)
+    today = date.today()
+    week = day_range((today - timedelta(days=today.weekday())).isoformat(), today.isoformat())
+    bounds = (to_ts(week[0]), to_ts(week[1]))
+
+    start = perf_counter()
+    store.rebuild_leaderboards()
+    rebuild_ms = (perf_counter() - start) * 1000
+    start = perf_counter()
+    board = store.leaderboard("week")
+    load_ms = (perf_counter() - start) * 1000
+
+    def live_top():
+        with store.pool.reader() as conn:
+            conn.execute(
+                "SELECT user_id, SUM(amount_ml) as total FROM water_logs WHERE ts >= ? AND ts < ? "
+                "GROUP BY user_id ORDER BY total DESC LIMIT 10", bounds
+            ).fetchall()
+
+    def live_rank():
+        uid = rng.choice(user_ids)
+        with store.pool.reader() as conn:
+            conn.execute(
+                "SELECT COUNT(*) FROM (SELECT SUM(amount_ml) as total FROM water_logs WHERE ts >= ? AND ts < ? GROUP BY user_id) "
+                "WHERE total > (SELECT COALESCE(SUM(amount_ml), 0) FROM water_logs WHERE user_id = ? AND ts >= ? AND ts < ?)",
+                bounds + (uid,) + bounds
+            ).fetchone()
+
+    def board_update():
+        board.add(rng.choice(user_ids), 250)
+
+    print(f"{len(board)} ranked users this week; rebuild {rebuild_ms:.0f} ms, board load {load_ms:.1f} ms, "
+          f"incremental update {timed(board_update, args.repeat * 20) * 1000:.1f} us")
+    live = hasattr(store, "pool")
+    print(f"{'query':>10} {'live ms':>10} {'board ms':>10}")
+    print(f"{'top-10':>10} {f'{timed(live_top, args.repeat):.3f}' if live else '-':>10} "
+          f"{timed(lambda: store.get_top_hydrators('week', 10), args.repeat):>10.3f}")
+    print(f"{'my rank':>10} {f'{timed(live_rank, args.repeat):.3f}' if live else '-':>10} "
+          f"{timed(lambda: store.get_my_rank(rng.choice(user_ids), 'week'), args.repeat):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Cost of the reminder scheduler at scale vs scanning every user's settings on each tick.
+#
+#   python benchmarks/bench_reminders.py --users 100000 --hours 2
+#
+# heap   ReminderScheduler on a simulated clock: load once, then run_pending every minute
+# scan   the polling alternative: each minute, read all enabled settings and test each user
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, time, timedelta
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from waterbuddy.reminders import CUTOFF, ReminderScheduler, next_due  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="reminder scheduling: heap vs per-tick scan")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--hours", type=float, default=2, help="simulated time, ticking every minute from 09:00")
+    parser.add_argument("--updates", type=int, default=10000, help="settings changes timed through update()")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    rows = [(uid, rng.choice([15, 30, 60, 90, 120]), rng.choice(["07:00", "08:00", "09:00", "10:30"]))
+            for uid in range(1, args.users + 1)]
+    conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), "bench.db"))
+    conn.execute("CREATE TABLE settings (user_id INTEGER PRIMARY KEY, reminder_enabled INTEGER, "
+                 "reminder_minutes INTEGER, reminder_start_time TEXT)")
+    conn.executemany("INSERT INTO settings VALUES (?, 1, ?, ?)", rows)
+    conn.commit()
+
+    ticks = int(args.hours * 60)
+    clock = [datetime.combine(datetime.now().date(), time(9, 0))]
+    fired = [0]
+
+    def sink(user_id, due):
+        fired[0] += 1
+
+    scheduler = ReminderScheduler(sink, clock=lambda: clock[0])
+    start = perf_counter()
+    scheduler.load(conn.execute(
+        "SELECT user_id, reminder_minutes, reminder_start_time FROM settings WHERE reminder_enabled = 1"
+    ))
+    load_ms = (perf_counter() - start) * 1000
+    start = perf_counter()
+    for _ in range(ticks):
+        clock[0] += timedelta(minutes=1)
+        scheduler.run_pending()
+    heap_s = perf_counter() - start
+    heap_fired = fired[0]
+
+    start = perf_counter()
+    for _ in range(args.updates):
+        scheduler.update(rng.randint(1, args.users), True, rng.choice([30, 60]), "08:00")
+    update_us = (perf_counter() - start) / args.updates * 1e6
+
+    clock[0] = datetime.combine(datetime.now().date(), time(9, 0))
+    scan_fired = 0
+    start = perf_counter()
+    for _ in range(ticks):
+        now = clock[0] + timedelta(minutes=1)
+        for _uid, minutes, start_hhmm in conn.execute(
+            "SELECT user_id, reminder_minutes, reminder_start_time FROM settings WHERE reminder_enabled = 1"
+        ):
+            # due this tick if a slot lands in (previous tick, now]
+            if now.time() <= CUTOFF and next_due(clock[0], minutes, start_hhmm) <= now:
+                scan_fired += 1
+        clock[0] = now
+    scan_s = perf_counter() - start
+
+    print(f"{args.users} users, {ticks} one-minute ticks; heap loaded in {load_ms:.0f} ms, "
+          f"update() {update_us:.1f} us")
+    print(f"{'':>6} {'fired':>9} {'total s':>9} {'us/fire':>9} {'ms/tick':>9}")
+    for name, n, secs in (("heap", heap_fired, heap_s), ("scan", scan_fired, scan_s)):
+        print(f"{name:>6} {n:>9} {secs:>9.2f} {secs / max(n, 1) * 1e6:>9.1f} {secs / ticks * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# Concurrent-session load test: starts app.py under a local `streamlit run` server on a scratch database
+# and drives N simulated users against it over the browser's websocket protocol.
+#
+#   python benchmarks/bench_sessions.py --sessions 1 4 16 64 --rounds 5 --burst 4
+#
+# AppTest cannot do this: every AppTest.run() installs and then clears Streamlit's process-wide
+# Runtime instance, so two running at once break each other. A real server also exercises what
+# production does: one process, one cached Store, a script thread per session.
+#
+# Each user logs in, then every round opens Log Water and taps a burst of quick-add buttons, views
+# the Dashboard and views Badges. One action is one rerun request, timed until the server reports
+# the script finished (including any st.rerun() it triggered). Clicks on widgets inside an
+# st.fragment are sent as fragment reruns, as the browser does; --no-fragments sends them as full
+# reruns instead, which is what every tap cost before the pages were split into fragments. Per
+# concurrency level this prints actions/s, action and quick-add latency percentiles, server CPU per
+# action (Linux), "database is locked" errors and other script exceptions.
+# Users are created up front and reused across levels, so later levels see earlier levels' logs.
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import urllib.request
+from time import perf_counter, sleep
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from streamlit.proto.BackMsg_pb2 import BackMsg  # noqa: E402
+from streamlit.proto.ClientState_pb2 import ClientState  # noqa: E402
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg  # noqa: E402
+from streamlit.proto.WidgetStates_pb2 import WidgetState, WidgetStates  # noqa: E402
+from tornado.websocket import websocket_connect  # noqa: E402
+from waterbuddy import Store  # noqa: E402
+
+QUICK_ADD = ["q1", "q2", "q3", "q4", "q5"]
+# script_finished statuses that end a rerun request (the other is an early stop for st.rerun());
+# a fragment run that calls st.rerun() stops early and is followed by a full run
+FINISHED = (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_WITH_COMPILE_ERROR)
+FRAGMENT_FINISHED = FINISHED + (ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,)
+
+
+def start_server(db_path, port, log_path, extra_env):
+    env = dict(os.environ, WATERBUDDY_DB=db_path, WATERBUDDY_ARCHIVE_DAYS="off", PYTHONPATH=ROOT, **extra_env)
+    with open(log_path, "w") as log:
+        server = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"), "--server.headless", "true",
+             "--server.port", str(port), "--browser.gatherUsageStats", "false"],
+            env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1).read()
+            return server
+        except OSError:
+            sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"streamlit did not come up; see {log_path}")
+
+
+def server_cpu_seconds(pid):
+    # user + system CPU of the server process from /proc; None where that is not available
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Session:
+    # one browser tab: sends rerun requests carrying widget states and reads ForwardMsgs until the
+    # run finishes, remembering the widget ids it rendered (by key, or by label for unkeyed widgets)
+    # and the fragment each one lives in
+    def __init__(self, port, results, fragments=True):
+        self.port = port
+        self.results = results
+        self.fragments = fragments
+        self.ws = None
+        self.page_hash = ""
+        self.widgets = {}
+        self.widget_fragments = {}
+
+    async def connect(self):
+        self.ws = await websocket_connect(f"ws://127.0.0.1:{self.port}/_stcore/stream", subprotocols=["streamlit"])
+
+    async def rerun(self, states=(), fragment_id="", kind="view"):
+        msg = BackMsg(rerun_script=ClientState(
+            widget_states=WidgetStates(widgets=list(states)), page_script_hash=self.page_hash,
+            fragment_id=fragment_id,
+        ))
+        finished = FRAGMENT_FINISHED if fragment_id else FINISHED
+        start = perf_counter()
+        await self.ws.write_message(msg.SerializeToString(), binary=True)
+        errors = []
+        while True:
+            raw = await self.ws.read_message()
+            if raw is None:
+                raise ConnectionError("server closed the websocket")
+            fm = ForwardMsg()
+            fm.ParseFromString(raw)
+            msg_kind = fm.WhichOneof("type")
+            if msg_kind == "new_session":
+                # every script run (including one started by st.rerun()) begins with this; a
+                # fragment run re-sends only that fragment's widgets, so the rest are kept
+                self.page_hash = fm.new_session.page_script_hash
+                if not fm.new_session.fragment_ids_this_run:
+                    self.widgets = {}
+                    self.widget_fragments = {}
+                errors = []
+            elif msg_kind == "delta" and fm.delta.WhichOneof("type") == "new_element":
+                self.remember(fm.delta.new_element, fm.delta.fragment_id, errors)
+            elif msg_kind == "script_finished" and fm.script_finished in finished:
+                break
+        self.results.record(kind, perf_counter() - start, errors)
+
+    def remember(self, element, fragment_id, errors):
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            errors.append(element.exception.message)
+            return
+        widget_id = getattr(getattr(element, kind), "id", "")
+        if isinstance(widget_id, str) and widget_id.startswith("$$ID-"):
+            key = widget_id.rsplit("-", 1)[1]
+            key = key if key != "None" else getattr(element, kind).label
+            self.widgets[key] = widget_id
+            self.widget_fragments[key] = fragment_id
+
+    async def click(self, key, kind="view", **values):
+        # values: label -> string for unkeyed text inputs sent along with the click
+        states = [WidgetState(id=self.widgets[label], string_value=v) for label, v in values.items()]
+        states.append(WidgetState(id=self.widgets[key], trigger_value=True))
+        fragment_id = self.widget_fragments.get(key, "") if self.fragments else ""
+        await self.rerun(states, fragment_id, kind)
+
+    async def login(self, username):
+        await self.rerun()
+        await self.click("login_btn", **{"Username:": username, "Password:": "pw"})
+
+    async def round(self, rng, burst):
+        await self.click("nav_Log Water")
+        for _ in range(burst):
+            await self.click(rng.choice(QUICK_ADD), kind="tap")
+        await self.click("nav_Dashboard")
+        await self.click("nav_Badges")
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.tap_latencies = []
+        self.lock_errors = 0
+        self.other_errors = []
+
+    def record(self, kind, seconds, errors):
+        self.latencies.append(seconds * 1000)
+        if kind == "tap":
+            self.tap_latencies.append(seconds * 1000)
+        for error in errors:
+            if "locked" in error:
+                self.lock_errors += 1
+            else:
+                self.other_errors.append(error)
+
+
+async def run_level(port, usernames, rounds, burst, seed, fragments=True):
+    results = Results()
+    sessions = [Session(port, results, fragments) for _ in usernames]
+    await asyncio.gather(*(s.connect() for s in sessions))
+
+    async def user(i, session):
+        rng = random.Random(seed + i)
+        await session.login(usernames[i])
+        for _ in range(rounds):
+            await session.round(rng, burst)
+        session.ws.close()
+
+    start = perf_counter()
+    await asyncio.gather(*(user(i, s) for i, s in enumerate(sessions)))
+    return results, perf_counter() - start
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="concurrent browser sessions against a local streamlit server")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=5, help="Log Water / Dashboard / Badges rounds per user")
+    parser.add_argument("--burst", type=int, default=4, help="quick-add taps per round")
+    parser.add_argument("--group-commit-ms", type=int, help="run the server with WATERBUDDY_GROUP_COMMIT_MS set")
+    parser.add_argument("--metrics-file", help="run the server with WATERBUDDY_METRICS_FILE set (query / page histograms)")
+    parser.add_argument("--no-fragments", action="store_true",
+                        help="send clicks inside fragments as full-page reruns (the pre-fragment cost)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    db_path = os.path.join(workdir, "sessions.db")
+    store = Store(db_path)
+    store.init_db()
+    usernames = [f"load{i}" for i in range(max(args.sessions))]
+    for name in usernames:
+        store.create_user(name, "pw")
+    extra_env = {}
+    if args.group_commit_ms is not None:
+        extra_env["WATERBUDDY_GROUP_COMMIT_MS"] = str(args.group_commit_ms)
+    if args.metrics_file:
+        extra_env["WATERBUDDY_METRICS_FILE"] = os.path.abspath(args.metrics_file)
+    port = free_port()
+    log_path = os.path.join(workdir, "server.log")
+    server = start_server(db_path, port, log_path, extra_env)
+    try:
+        # warm-up: the first run imports the app's dependencies and builds the cached Store
+        fragments = not args.no_fragments
+        asyncio.run(run_level(port, usernames[:1], 1, 1, args.seed, fragments))
+        print(f"{args.rounds} rounds x (1 + {args.burst} quick-adds + 2 views) per user, after one login; group "
+              f"commit: {'off' if args.group_commit_ms is None else str(args.group_commit_ms) + ' ms'}; quick-adds "
+              f"as {'fragment' if fragments else 'full'} reruns; server log {log_path}\n")
+        print(f"{'sessions':>8} {'actions':>8} {'actions/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'max ms':>8} {'tap p50':>8} {'tap p95':>8} {'cpu ms':>7} {'locked':>7} {'errors':>7}")
+        for sessions in args.sessions:
+            cpu_before = server_cpu_seconds(server.pid)
+            results, seconds = asyncio.run(
+                run_level(port, usernames[:sessions], args.rounds, args.burst, args.seed, fragments)
+            )
+            cpu_after = server_cpu_seconds(server.pid)
+            lat, taps = results.latencies, results.tap_latencies
+            # server CPU per action, including the logins
+            cpu = f"{(cpu_after - cpu_before) * 1000 / len(lat):>7.1f}" if cpu_before is not None else f"{'-':>7}"
+            print(f"{sessions:>8} {len(lat):>8} {len(lat) / seconds:>10.1f} {statistics.median(lat):>8.1f} "
+                  f"{percentile(lat, 0.95):>8.1f} {percentile(lat, 0.99):>8.1f} {max(lat):>8.1f} "
+                  f"{statistics.median(taps):>8.1f} {percentile(taps, 0.95):>8.1f} {cpu} "
+                  f"{results.lock_errors:>7} {len(results.other_errors):>7}")
+            for error in sorted(set(results.other_errors))[:5]:
+                print(f"{'':>8} error: {error[:160]}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# log_water throughput as the number of shard files grows.
+#
+#   python benchmarks/bench_shards.py --shards 1 2 4 8 --processes 4 --threads 4 --logs 200
+#
+# Every level starts from a fresh scratch database split into that many shard files (1 = a plain Store)
+# with --users users. --processes worker processes (separate app servers, each with its own Store and
+# connection pools) each run --threads threads (concurrent sessions) that call log_water --logs times for
+# random users. With one file every commit queues for the same write lock; with N files only writers on
+# the same shard do. Timed from the moment all workers are ready until the last one finishes.
+#
+# On a machine with few cores and fast fsync the run is CPU-bound and the shard count barely matters.
+# --commit-delay-ms holds each write transaction open that much longer, as a slow disk or network
+# filesystem would: throughput is then bounded by write-lock hold time, which is what sharding divides.
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from time import perf_counter, sleep
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from waterbuddy import open_store  # noqa: E402
+
+
+def writer_pools(store):
+    return [shard.pool for shard in store.shards] if hasattr(store, "shards") else [store.pool]
+
+
+def slow_commits(store, delay_ms):
+    # wrap each Store's write_log so its transaction stays open delay_ms after the writes
+    for shard in getattr(store, "shards", [store]):
+        def write_log(*args, shard=shard, write_log=shard.write_log):
+            with shard.pool.writer():
+                write_log(*args)
+                sleep(delay_ms / 1000)
+        shard.write_log = write_log
+
+
+def worker(path, shards, user_ids, threads, logs, synchronous, delay_ms, seed, ready, go, done):
+    store = open_store(path, shards)
+    for pool in writer_pools(store):
+        pool._writer.execute(f"PRAGMA synchronous = {synchronous}")
+    if delay_ms:
+        slow_commits(store, delay_ms)
+
+    latencies = []
+
+    def session(i):
+        rng = random.Random(seed * 1000 + i)
+        for _ in range(logs):
+            start = perf_counter()
+            store.log_water(rng.choice(user_ids), 250, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            latencies.append((perf_counter() - start) * 1000)
+
+    sessions = [threading.Thread(target=session, args=(i,)) for i in range(threads)]
+    ready.release()
+    go.wait()
+    for s in sessions:
+        s.start()
+    for s in sessions:
+        s.join()
+    done.put((perf_counter(), latencies))
+
+
+def run_level(shards, args):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    store = open_store(path, shards)
+    store.init_db()
+    user_ids = [store.create_user(f"bench{i}", "x") for i in range(args.users)]
+    ctx = multiprocessing.get_context("spawn")
+    ready, go, done = ctx.Semaphore(0), ctx.Event(), ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(path, shards, user_ids, args.threads, args.logs, args.synchronous,
+                                           args.commit_delay_ms, p, ready, go, done))
+        for p in range(args.processes)
+    ]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        if not ready.acquire(timeout=60):
+            raise RuntimeError("a worker process failed to start")
+    start = perf_counter()
+    go.set()
+    results = [done.get() for _ in procs]
+    end = max(r[0] for r in results)
+    latencies = sorted(ms for r in results for ms in r[1])
+    for p in procs:
+        p.join()
+    total = args.processes * args.threads * args.logs
+    counts = store.counts()
+    assert counts["logs"] == total, counts
+    return total / (end - start), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="log_water throughput vs number of shard files")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4, help="concurrent writers per process")
+    parser.add_argument("--logs", type=int, default=200, help="log_water calls per thread")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--synchronous", default="NORMAL", help="PRAGMA synchronous for every writer (the app uses NORMAL)")
+    parser.add_argument("--commit-delay-ms", type=float, default=0, help="extra time each write transaction stays open")
+    args = parser.parse_args()
+
+    print(f"{args.processes} processes x {args.threads} threads x {args.logs} log_water calls, "
+          f"{args.users} users, synchronous={args.synchronous}, commit delay {args.commit_delay_ms:g} ms\n")
+    print(f"{'shards':>7} {'logs/s':>10} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    base = None
+    for shards in args.shards:
+        rate, lat = run_level(shards, args)
+        base = base or rate
+        p = [lat[min(len(lat) - 1, int(q * len(lat)))] for q in (0.5, 0.95, 0.99)]
+        print(f"{shards:>7} {rate:>10.0f} {rate / base:>7.2f}x {p[0]:>8.2f} {p[1]:>8.2f} {p[2]:>8.2f} {lat[-1]:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
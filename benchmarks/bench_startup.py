@@ -0,0 +1,83 @@
+# Cold-start budget for app.py: fails (exit 1) when a measurement exceeds its budget.
+#
+#   python benchmarks/bench_startup.py --import-budget-ms 1000 --render-budget-ms 1000 [--backend memory]
+#
+# import       fresh interpreter importing app.py in Streamlit bare mode (median of --runs)
+# first render first AppTest run of the script (login page) in a fresh interpreter
+# rerun        a second AppTest run in the same process (what every click pays)
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import sys
+from time import perf_counter
+sys.path.insert(0, {root!r})
+start = perf_counter()
+import app
+print(perf_counter() - start)
+"""
+
+RENDER_PROBE = """
+import json
+import sys
+from time import perf_counter
+from streamlit.testing.v1 import AppTest
+# streamlit run puts the script's directory on sys.path; AppTest does not
+sys.path.insert(0, {root!r})
+at = AppTest.from_file({app!r}, default_timeout=60)
+start = perf_counter()
+at.run()
+first = perf_counter() - start
+start = perf_counter()
+at.run()
+print(json.dumps({{"first": first, "rerun": perf_counter() - start}}))
+"""
+
+
+def probe(code, workdir, backend):
+    env = dict(os.environ, WATERBUDDY_DB=os.path.join(workdir, "startup.db"), WATERBUDDY_BACKEND=backend)
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return out.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app.py import and first-render time budget")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget-ms", type=float, default=1000)
+    parser.add_argument("--render-budget-ms", type=float, default=1000)
+    parser.add_argument("--rerun-budget-ms", type=float, default=300)
+    parser.add_argument("--backend", choices=["sqlite", "memory"], default="sqlite")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    imports, firsts, reruns = [], [], []
+    for _ in range(args.runs):
+        imports.append(float(probe(IMPORT_PROBE.format(root=ROOT), workdir, args.backend)) * 1000)
+        render = json.loads(probe(RENDER_PROBE.format(root=ROOT, app=os.path.join(ROOT, "app.py")), workdir, args.backend))
+        firsts.append(render["first"] * 1000)
+        reruns.append(render["rerun"] * 1000)
+
+    failed = False
+    for name, samples, budget in (
+        ("import", imports, args.import_budget_ms),
+        ("first render", firsts, args.render_budget_ms),
+        ("rerun", reruns, args.rerun_budget_ms),
+    ):
+        median = statistics.median(samples)
+        ok = median <= budget
+        failed |= not ok
+        print(f"{name:>13}: {median:8.1f} ms (budget {budget:.0f} ms) {'ok' if ok else 'OVER BUDGET'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
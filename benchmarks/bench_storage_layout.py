@@ -0,0 +1,135 @@
+# Before/after comparison of the water_logs layout: the old TEXT-timestamp rowid table with a
+# (user_id, timestamp) index vs the compact WITHOUT ROWID table clustered on (user_id, ts).
+#
+#   python benchmarks/bench_storage_layout.py --users 200 --logs-per-user 2000
+#
+# A synthetic database is generated, rewritten into the old layout, then copied and migrated by
+# Store.init_db (timed). Sizes are after VACUUM; latencies are medians over --repeat random users.
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from generate_data import generate  # noqa: E402
+from waterbuddy import Store, day_range, from_ts, to_ts  # noqa: E402
+
+LEGACY = [
+    "CREATE TABLE water_logs_legacy (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, "
+    "amount_ml INTEGER NOT NULL, timestamp TEXT NOT NULL, FOREIGN KEY(user_id) REFERENCES users(id))",
+    "INSERT INTO water_logs_legacy (user_id, amount_ml, timestamp) "
+    "SELECT user_id, amount_ml, datetime(ts, 'unixepoch') FROM water_logs ORDER BY ts, user_id",
+    "DROP TABLE water_logs",
+    "ALTER TABLE water_logs_legacy RENAME TO water_logs",
+    "CREATE INDEX idx_water_logs_user_ts ON water_logs (user_id, timestamp)",
+]
+
+# the read paths that touch water_logs, written the way each layout's helpers issue them
+QUERIES = {
+    "legacy": {
+        "sum_7_days": ("SELECT SUM(amount_ml) FROM water_logs WHERE user_id = ? AND timestamp >= ? AND timestamp < ?", str),
+        "day_entries": ("SELECT amount_ml, timestamp FROM water_logs WHERE user_id = ? AND timestamp >= ? AND timestamp < ? "
+                        "ORDER BY timestamp DESC", str),
+        "full_history": ("SELECT amount_ml, timestamp FROM water_logs WHERE user_id = ? AND timestamp >= ? AND timestamp < ? "
+                         "ORDER BY timestamp", str),
+    },
+    "compact": {
+        "sum_7_days": ("SELECT SUM(amount_ml) FROM water_logs WHERE user_id = ? AND ts >= ? AND ts < ?", to_ts),
+        "day_entries": ("SELECT amount_ml, ts FROM water_logs WHERE user_id = ? AND ts >= ? AND ts < ? "
+                        "ORDER BY ts DESC, seq DESC", to_ts),
+        "full_history": ("SELECT amount_ml, ts FROM water_logs WHERE user_id = ? AND ts >= ? AND ts < ? "
+                         "ORDER BY ts, seq", to_ts),
+    },
+}
+
+
+def display_times(layout, rows):
+    # what the Log Water page does with each entry: parse the text (legacy) or offset the integer
+    if layout == "legacy":
+        return [datetime.strptime(r[1], "%Y-%m-%d %H:%M:%S").strftime("%I:%M %p") for r in rows]
+    return [from_ts(r[1]).strftime("%I:%M %p") for r in rows]
+
+
+def sizes(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    # pages of the table and its indexes
+    table = conn.execute(
+        "SELECT SUM(s.pgsize) FROM dbstat s JOIN sqlite_master m ON m.name = s.name WHERE m.tbl_name = 'water_logs'"
+    ).fetchone()[0]
+    conn.close()
+    return os.path.getsize(path), table
+
+
+def latencies(path, layout, user_ids, repeat, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    today = date.today()
+    ranges = {
+        "sum_7_days": day_range((today - timedelta(days=6)).isoformat(), today.isoformat()),
+        "day_entries": None,
+        "full_history": day_range("1970-01-01", today.isoformat()),
+    }
+    results = {}
+    for name, (sql, convert) in QUERIES[layout].items():
+        samples = []
+        for _ in range(repeat):
+            uid = rng.choice(user_ids)
+            bounds = ranges[name] or day_range((today - timedelta(days=rng.randrange(30))).isoformat())
+            start = perf_counter()
+            rows = conn.execute(sql, (uid, convert(bounds[0]), convert(bounds[1]))).fetchall()
+            if name != "sum_7_days":
+                display_times(layout, rows)
+            samples.append((perf_counter() - start) * 1000)
+        results[name] = statistics.median(samples)
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="water_logs storage layout: size and latency before/after")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--logs-per-user", type=int, default=2000)
+    parser.add_argument("--span-days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    legacy_db = os.path.join(workdir, "legacy.db")
+    compact_db = os.path.join(workdir, "compact.db")
+    store = Store(legacy_db)
+    store.init_db()
+    user_ids = generate(store, args.users, args.logs_per_user, args.span_days, seed=args.seed)
+    with store.pool.writer() as conn:
+        for statement in LEGACY:
+            conn.execute(statement)
+    store.pool._writer.close()
+    sizes(legacy_db)
+    shutil.copy(legacy_db, compact_db)
+
+    start = perf_counter()
+    Store(compact_db).init_db()
+    migration_s = perf_counter() - start
+
+    print(f"{args.users} users x {args.logs_per_user} logs; migration took {migration_s:.2f} s\n")
+    before, after = sizes(legacy_db), sizes(compact_db)
+    print(f"{'':>22} {'legacy':>12} {'compact':>12} {'change':>8}")
+    for label, b, a in (("db file (KiB)", before[0], after[0]), ("water_logs + index", before[1], after[1])):
+        print(f"{label:>22} {b / 1024:>12.0f} {a / 1024:>12.0f} {a / b - 1:>+8.0%}")
+    lb = latencies(legacy_db, "legacy", user_ids, args.repeat, args.seed)
+    la = latencies(compact_db, "compact", user_ids, args.repeat, args.seed)
+    for name in QUERIES["legacy"]:
+        print(f"{name + ' (ms)':>22} {lb[name]:>12.3f} {la[name]:>12.3f} {la[name] / lb[name] - 1:>+8.0%}")
+
+
+if __name__ == "__main__":
+    main()
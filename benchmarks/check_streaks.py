@@ -0,0 +1,107 @@
+# Incremental streak state vs the original full-history compute_streaks, on randomized histories.
+#
+#   python benchmarks/check_streaks.py                     # 200 users on every backend
+#   python benchmarks/check_streaks.py --users 1000 --seed 7 --backends sqlite
+#
+# Every user gets a random mix of logs in order, backfilled logs on past days, clear_today_logs and
+# deletes of past day ranges. After each step the backend's compute_streaks must equal the original
+# algorithm run over the days the script itself knows to hold logs, and at the end so must the sqlite
+# Store's badge_metric_streaks() for every user at once. Exits 1 on the first mismatch.
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+from generate_data import scratch_store  # noqa: E402
+from waterbuddy import BACKENDS, day_range  # noqa: E402
+
+
+def original_streaks(days, today):
+    # the pre-rollup compute_streaks: one walk over every distinct logged day, oldest first
+    days = sorted(days)
+    if not days:
+        return {"current_streak": 0, "longest_streak": 0}
+    longest = streak = 1
+    for prev, d in zip(days, days[1:]):
+        streak = streak + 1 if (d - prev).days == 1 else 1
+        longest = max(longest, streak)
+    current = 0
+    if (today - days[-1]).days in (0, 1):
+        current = 1
+        for prev, d in zip(reversed(days), reversed(days[:-1])):
+            if (prev - d).days != 1:
+                break
+            current += 1
+    return {"current_streak": current, "longest_streak": longest}
+
+
+def random_steps(rng, today, span):
+    # (operation, day[, last day]) for one user: mostly logs in day order, with the other operations mixed in
+    day = today - timedelta(days=span)
+    while day <= today:
+        roll = rng.random()
+        if roll < 0.08:
+            yield "backfill", today - timedelta(days=rng.randint(0, span))
+        elif roll < 0.11:
+            yield "clear_today", today
+        elif roll < 0.15:
+            first = today - timedelta(days=rng.randint(1, span))
+            yield "delete", first, min(today, first + timedelta(days=rng.randint(0, 5)))
+        else:
+            yield "log", day
+            day += timedelta(days=rng.choice([1, 1, 1, 1, 2, 3]))
+
+
+def check_backend(backend, users, seed):
+    store = scratch_store(backend)
+    rng = random.Random(seed)
+    today = date.today()
+    expected = {}
+    steps = 0
+    for n in range(users):
+        user_id = store.create_user(f"streak{n}", "x")
+        logged = set()
+        for step in random_steps(rng, today, rng.choice([3, 10, 40, 120])):
+            op, day = step[0], step[1]
+            if op in ("log", "backfill"):
+                store.log_water(user_id, 250, f"{day} {rng.randint(6, 22):02d}:{rng.randint(0, 59):02d}:00")
+                logged.add(day)
+            elif op == "clear_today":
+                store.clear_today_logs(user_id)
+                logged.discard(today)
+            else:
+                store.delete_logs_between(user_id, day_range(day.isoformat())[0], day_range(step[2].isoformat())[1])
+                logged = {d for d in logged if not day <= d <= step[2]}
+            steps += 1
+            got, want = store.compute_streaks(user_id), original_streaks(logged, today)
+            if got != want:
+                sys.exit(f"{backend}: user {user_id} after {op} {step[1:]}: got {got}, expected {want}")
+        expected[user_id] = original_streaks(logged, today)
+    if not hasattr(store, "badge_metric_streaks"):
+        return steps
+    # every user in one pass, as backfill_badges reads them; users without logs have nothing to report
+    got = {uid: v for uid, v in store.badge_metric_streaks().items() if v["longest_streak"]}
+    want = {uid: v for uid, v in expected.items() if v["longest_streak"]}
+    if got != want:
+        bad = sorted(uid for uid in set(got) | set(want) if got.get(uid) != want.get(uid))
+        sys.exit(f"{backend}: badge_metric_streaks differs for users {bad[:10]}")
+    return steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="check incremental streaks against the original algorithm")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args()
+
+    for backend in args.backends:
+        steps = check_backend(backend, args.users, args.seed)
+        print(f"{backend}: {args.users} users, {steps} steps match the original compute_streaks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Fill a scratch WaterBuddy database with synthetic users, logs, badges and challenges.
+#
+#   python benchmarks/generate_data.py --db /tmp/waterbuddy-bench.db --users 100 --logs-per-user 1000
+#
+# Rows are bulk-inserted with executemany, then the daily_totals rollup and streak state are
+# rebuilt, so the database looks like one the app has been writing to all along. Other storage
+# backends get the same data for the same seed through their own helpers (see scratch_store).
+import argparse
+import functools
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from waterbuddy import BADGE_RULES, Store, format_ts, open_store  # noqa: E402
+from waterbuddy.store import EPOCH, INSERT_LOG  # noqa: E402
+
+
+def scratch_store(backend="sqlite", **kwargs):
+    # an initialized, empty store of the given backend; a SQLite one gets a fresh temporary directory
+    store = open_store(os.path.join(tempfile.mkdtemp(), "bench.db"), backend=backend, **kwargs)
+    store.init_db()
+    return store
+
+
+def uncached(store, name):
+    # the bound helper minus any read cache in front of it, i.e. what a cache miss costs
+    fn = getattr(type(store), name)
+    return functools.partial(getattr(fn, "__wrapped__", fn), store)
+
+
+def synthetic_users(rng, user_ids, logs_per_user, span_days, badges_per_user, challenges_per_user):
+    # per user: (user_id, [(user_id, ts, amount_ml)], [badge name], [(name, days, goal, start, done)])
+    today = date.today()
+    badge_names = [r["name"] for r in BADGE_RULES] + [f"✅ Completed: Challenge {i}" for i in range(10)]
+    for uid in user_ids:
+        logs = []
+        for _ in range(logs_per_user):
+            day = today - timedelta(days=rng.randrange(span_days))
+            ts = (day - EPOCH.date()).days * 86400 + rng.randrange(7 * 3600, 23 * 3600)
+            logs.append((uid, ts, rng.choice([100, 200, 250, 330, 500])))
+        badges = rng.sample(badge_names, min(badges_per_user, len(badge_names)))
+        challenges = [
+            (f"Challenge {i}", rng.choice([3, 7, 14, 30]), rng.choice([1.5, 2.0, 2.5]),
+             (today - timedelta(days=rng.randrange(span_days))).isoformat(), rng.randint(0, 1))
+            for i in range(challenges_per_user)
+        ]
+        yield uid, logs, badges, challenges
+
+
+def generate(store, users=100, logs_per_user=1000, span_days=365, badges_per_user=3, challenges_per_user=2, seed=0):
+    # store: an initialized storage backend; returns the new user ids
+    rng = random.Random(seed)
+    sqlite = isinstance(store, Store)
+    if sqlite:
+        with store.pool.reader() as conn:
+            first_id = (conn.execute("SELECT COALESCE(MAX(id), 0) FROM users").fetchone()[0]) + 1
+    else:
+        # a scratch backend nobody has deleted users from
+        first_id = store.counts()["users"] + 1
+    user_ids = list(range(first_id, first_id + users))
+    profiles = [(uid, f"user{uid}", "x", rng.randint(10, 80), rng.choice([2000, 2500, 3000])) for uid in user_ids]
+    rows = synthetic_users(rng, user_ids, logs_per_user, span_days, badges_per_user, challenges_per_user)
+    if sqlite:
+        with store.pool.writer() as conn:
+            conn.executemany("INSERT INTO users (id, username, password, age, daily_goal_ml) VALUES (?, ?, ?, ?, ?)", profiles)
+            conn.executemany("INSERT INTO settings (user_id) VALUES (?)", [(uid,) for uid in user_ids])
+            for uid, logs, badges, challenges in rows:
+                conn.executemany(INSERT_LOG, logs)
+                conn.executemany("INSERT OR IGNORE INTO badges (user_id, name) VALUES (?, ?)", [(uid, name) for name in badges])
+                conn.executemany(
+                    "INSERT INTO challenges (user_id, name, days, goal, start, done) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(uid,) + c for c in challenges]
+                )
+    else:
+        for uid, username, password, age, goal in profiles:
+            store.create_user(username, password, age, daily_goal_ml=goal, user_id=uid)
+        for uid, logs, badges, challenges in rows:
+            # write_log stores a log without the badge / challenge evaluation log_water adds; in time
+            # order, so each write extends the streak state instead of recomputing it
+            for _, ts, amount_ml in sorted(logs, key=lambda log: log[1]):
+                store.write_log(uid, amount_ml, format_ts(ts))
+            for name in badges:
+                store.award_badge(uid, name)
+            for name, days, goal, start, _ in challenges:
+                store.add_challenge(uid, name, days, goal, start)
+            for row, (*_, done) in zip(store.get_challenges(uid), challenges):
+                if done:
+                    store.mark_challenge_done(uid, row["id"])
+    store.rebuild_daily_totals()
+    for uid in user_ids:
+        store.recompute_streak_state(uid)
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="fill a scratch WaterBuddy database with synthetic data")
+    parser.add_argument("--db", required=True, help="path of the scratch database to create")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--logs-per-user", type=int, default=1000)
+    parser.add_argument("--span-days", type=int, default=365)
+    parser.add_argument("--badges-per-user", type=int, default=3)
+    parser.add_argument("--challenges-per-user", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--overwrite", action="store_true", help="replace the database if it exists")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.overwrite:
+            parser.error(f"{args.db} exists; pass --overwrite to replace it")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    store = Store(args.db)
+    store.init_db()
+    user_ids = generate(store, args.users, args.logs_per_user, args.span_days,
+                        args.badges_per_user, args.challenges_per_user, args.seed)
+    print(f"{args.db}: {len(user_ids)} users, {len(user_ids) * args.logs_per_user} logs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+# WaterBuddy data access without Streamlit: open a Store on a database file and call its helpers,
+# e.g. from batch jobs, benchmarks or worker processes.
+from .assets import AssetCache
+from .cache import ReadCache
+from .backend import StorageBackend
+from .db import ConnectionPool, GroupCommitWriter
+from .memory import MemoryStore
+from .metrics import Metrics
+from .shards import BACKENDS, ShardedStore, open_store
+from .store import (
+    BADGE_RULES,
+    HISTORY_BUCKETS,
+    LOG_QUERIES,
+    Store,
+    day_range,
+    format_ts,
+    from_ts,
+    streak_state_from_days,
+    to_ts,
+    today_str,
+)
+
+__all__ = [
+    "BACKENDS",
+    "BADGE_RULES",
+    "HISTORY_BUCKETS",
+    "LOG_QUERIES",
+    "AssetCache",
+    "ConnectionPool",
+    "GroupCommitWriter",
+    "MemoryStore",
+    "Metrics",
+    "ReadCache",
+    "ShardedStore",
+    "StorageBackend",
+    "Store",
+    "day_range",
+    "format_ts",
+    "from_ts",
+    "open_store",
+    "streak_state_from_days",
+    "to_ts",
+    "today_str",
+]
@@ -0,0 +1,93 @@
+# maintenance commands that run without the UI:
+#   python -m waterbuddy --db waterbuddy.db init
+#   python -m waterbuddy --db waterbuddy.db rebuild-rollup [--user ID]
+#   python -m waterbuddy --db waterbuddy.db backfill-badges
+#   python -m waterbuddy --db waterbuddy.db import-logs logs.csv        (or .ndjson / .jsonl)
+#   python -m waterbuddy --db waterbuddy.db export-logs out.ndjson [--user ID]   (- for stdout)
+#   python -m waterbuddy --db waterbuddy.db archive-logs [--horizon-days 365]
+#   python -m waterbuddy --db waterbuddy.db compact
+#   python -m waterbuddy --db waterbuddy.db sweep-challenges
+#   python -m waterbuddy --db waterbuddy.db stats
+#   python -m waterbuddy build-assets [--width 200] [--out image/sized] [image/*]
+# --shards N (or WATERBUDDY_SHARDS) runs any of them against a sharded database of N files
+import argparse
+import os
+import sys
+
+from .archive import ARCHIVE_HORIZON_DAYS
+from .assets import BUILD_DIR, MASCOT_WIDTH, build
+from .shards import open_store
+from .transfer import format_for, read_logs, write_logs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m waterbuddy")
+    parser.add_argument("--db", default=os.environ.get("WATERBUDDY_DB", "waterbuddy.db"))
+    parser.add_argument("--shards", type=int, default=os.environ.get("WATERBUDDY_SHARDS"),
+                        help="number of shard files (must match what the database was created with)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("init", help="create missing tables and indexes")
+    rebuild = sub.add_parser("rebuild-rollup", help="recompute daily_totals and streaks from water_logs")
+    rebuild.add_argument("--user", type=int, help="only this user id")
+    sub.add_parser("backfill-badges", help="award every badge rule to users who qualify")
+    imp = sub.add_parser("import-logs", help="bulk-load water logs from CSV or NDJSON")
+    imp.add_argument("path")
+    imp.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    imp.add_argument("--batch-size", type=int, default=5000)
+    exp = sub.add_parser("export-logs", help="stream water logs to CSV or NDJSON")
+    exp.add_argument("path")
+    exp.add_argument("--format", choices=["csv", "ndjson"], help="default: from the file extension")
+    exp.add_argument("--user", type=int, help="only this user id")
+    archive = sub.add_parser("archive-logs", help="move old water logs into per-year archive databases, then compact")
+    archive.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS, help="keep this many days in the hot database")
+    sub.add_parser("compact", help="return free pages to the filesystem (incremental vacuum)")
+    sub.add_parser("sweep-challenges", help="complete or fail every running challenge that has been decided")
+    sub.add_parser("stats", help="count users, logs, badges and running challenges")
+    assets = sub.add_parser("build-assets", help="write pre-sized mascot images for the app to load")
+    assets.add_argument("paths", nargs="*", help="default: every file in image/")
+    assets.add_argument("--width", type=int, default=MASCOT_WIDTH)
+    assets.add_argument("--out", default=BUILD_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == "build-assets":
+        paths = args.paths or [os.path.join("image", n) for n in sorted(os.listdir("image"))
+                               if os.path.isfile(os.path.join("image", n))]
+        for path, before, after in build(paths, args.width, args.out):
+            print(f"{path}: {before} -> {after} bytes")
+        return
+
+    store = open_store(args.db, args.shards)
+    store.init_db()
+    if args.command == "rebuild-rollup":
+        store.rebuild_daily_totals(args.user)
+        print(f"rebuilt daily totals for {'user ' + str(args.user) if args.user else 'all users'}")
+    elif args.command == "backfill-badges":
+        print(f"awarded {store.backfill_badges()} badges")
+    elif args.command == "import-logs":
+        with open(args.path, newline="", encoding="utf-8") as f:
+            stats = store.import_logs(read_logs(f, args.format or format_for(args.path)), args.batch_size)
+        print(f"imported {stats['rows']} logs for {stats['users']} users in {stats['seconds']} s ({stats['rows_per_sec']} rows/s)")
+    elif args.command == "export-logs":
+        fmt = args.format or format_for(args.path)
+        if args.path == "-":
+            count = write_logs(store.export_logs(args.user), sys.stdout, fmt)
+        else:
+            with open(args.path, "w", newline="", encoding="utf-8") as f:
+                count = write_logs(store.export_logs(args.user), f, fmt)
+        print(f"exported {count} logs", file=sys.stderr)
+    elif args.command == "archive-logs":
+        stats = store.archive_logs(args.horizon_days)
+        print(f"archived {stats['rows']} logs from {stats['years'] or 'no'} years in {stats['seconds']} s; "
+              f"freed {store.compact()} pages")
+    elif args.command == "compact":
+        print(f"freed {store.compact()} pages")
+    elif args.command == "sweep-challenges":
+        result = store.evaluate_challenges()
+        print(f"completed {len(result['completed'])}, failed {len(result['failed'])}, "
+              f"{len(result['progress']) - len(result['completed']) - len(result['failed'])} still running")
+    elif args.command == "stats":
+        print(", ".join(f"{name}: {value}" for name, value in store.counts().items()))
+    else:
+        print(f"schema ready in {args.db}")
+
+if __name__ == "__main__":
+    main()
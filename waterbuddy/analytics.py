@@ -0,0 +1,84 @@
+# long-term progress analytics over one user's whole history. Store.get_analytics fetches the daily
+# rollup and an hour-of-day histogram once; everything else is NumPy array arithmetic on the dense
+# day series, so a multi-year history costs about the same as a month.
+import numpy as np
+
+def dense_daily(days, totals, end):
+    # days: iso strings of active days (ascending), totals: ml per active day -> every day from the
+    # first active day through end, zero-filled
+    active = np.array(days, dtype="datetime64[D]")
+    span = np.arange(active[0], np.datetime64(end, "D") + 1, dtype="datetime64[D]")
+    daily = np.zeros(len(span), dtype=np.int64)
+    daily[(active - span[0]).astype(np.int64)] = totals
+    return span, daily
+
+def rolling_mean(values, window):
+    # trailing mean; the first window - 1 days average over the days available so far
+    csum = np.cumsum(values, dtype=np.float64)
+    shifted = np.concatenate((np.zeros(window), csum))[:len(values)]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return (csum - shifted) / counts
+
+def summarize(days, totals, hourly_ml, goal_ml, end, window=7):
+    # days/totals: the user's daily_totals rows; hourly_ml: 24 ml totals by hour of day
+    hourly = np.asarray(hourly_ml, dtype=np.int64)
+    if not days:
+        return {
+            "days": np.array([], dtype="datetime64[D]"), "daily_ml": np.array([], dtype=np.int64),
+            "rolling_avg_ml": np.array([]), "delta_ml": np.array([], dtype=np.int64),
+            "total_ml": 0, "active_days": 0, "tracked_days": 0, "avg_daily_ml": 0.0,
+            "goal_hits": 0, "goal_hit_rate": 0.0, "monthly": [], "hourly_ml": hourly, "insights": [],
+        }
+    span, daily = dense_daily(days, totals, end)
+    hits = daily >= goal_ml
+    rolling = rolling_mean(daily, window)
+    delta = np.diff(daily, prepend=daily[0])
+
+    # monthly buckets: month index of every day, then one bincount per measure
+    months = span.astype("datetime64[M]")
+    month_idx = (months - months[0]).astype(np.int64)
+    month_total = np.bincount(month_idx, weights=daily).astype(np.int64)
+    month_days = np.bincount(month_idx)
+    month_hits = np.bincount(month_idx, weights=hits)
+    month_labels = np.arange(months[0], months[-1] + 1, dtype="datetime64[M]").astype(str)
+    monthly = [
+        {"month": m, "total_ml": int(t), "avg_ml": round(t / n, 1), "goal_hit_rate": round(h / n, 3)}
+        for m, t, n, h in zip(month_labels, month_total, month_days, month_hits)
+    ]
+
+    return {
+        "days": span,
+        "daily_ml": daily,
+        "rolling_avg_ml": rolling,
+        "delta_ml": delta,
+        "total_ml": int(daily.sum()),
+        "active_days": int(np.count_nonzero(daily)),
+        "tracked_days": len(span),
+        "avg_daily_ml": round(float(daily.mean()), 1),
+        "goal_hits": int(hits.sum()),
+        "goal_hit_rate": round(float(hits.mean()), 3),
+        "monthly": monthly,
+        "hourly_ml": hourly,
+        "insights": insights(daily, rolling, hourly, monthly, goal_ml, window),
+    }
+
+def insights(daily, rolling, hourly, monthly, goal_ml, window):
+    notes = []
+    if len(daily) >= 2:
+        diff = int(daily[-1] - daily[-2])
+        if diff > 0:
+            notes.append(f"You drank {diff} ml more water than yesterday!")
+        elif diff < 0 and daily[-1] < goal_ml:
+            notes.append(f"{-diff} ml behind yesterday so far — a glass or two closes the gap.")
+    if len(daily) >= 2 * window:
+        now, before = rolling[-1], rolling[-1 - window]
+        if before and abs(now - before) / before >= 0.1:
+            trend = "up" if now > before else "down"
+            notes.append(f"Your {window}-day average is {trend} {abs(now - before) / before:.0%} on the week before.")
+    if hourly.any():
+        notes.append(f"You drink the most around {int(hourly.argmax()):02d}:00.")
+    if len(monthly) >= 2:
+        best = max(monthly, key=lambda m: m["goal_hit_rate"])
+        if best["goal_hit_rate"]:
+            notes.append(f"Best month for hitting your goal: {best['month']} ({best['goal_hit_rate']:.0%} of days).")
+    return notes
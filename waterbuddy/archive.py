@@ -0,0 +1,48 @@
+# per-year archive databases for old water logs. Raw logs older than the archive horizon move from the
+# hot database into <db>.archive-<year>.db; daily_totals (and everything derived from it: history,
+# streaks, leaderboards, badges) stays in the hot database for all time. An archive is ATTACHed only
+# for the queries that reach into its year. SQLite allows 10 attached databases per connection, so a
+# range query attaches at most MAX_ATTACHED_ARCHIVES years at once and a longer range is split at year
+# boundaries into parts that each fit; whole-history reads go one year at a time.
+import os
+from datetime import date
+
+# logs whose day is more than this many days before today are archived
+ARCHIVE_HORIZON_DAYS = 365
+
+# archives one statement may attach, leaving SQLite's tenth slot spare
+MAX_ATTACHED_ARCHIVES = 9
+
+# archive files keep the hot table's clustered layout; no foreign key, users live in the hot database
+ARCHIVE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {alias}.water_logs (
+        user_id INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        seq INTEGER NOT NULL DEFAULT 0,
+        amount_ml INTEGER NOT NULL,
+        PRIMARY KEY (user_id, ts, seq)
+    ) WITHOUT ROWID
+"""
+
+def archive_path(db_path, year):
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.archive-{year}{ext or '.db'}"
+
+def archive_alias(year):
+    return f"archive_{year}"
+
+def year_bounds(year):
+    # half-open [Jan 1, next Jan 1) in water_logs.ts seconds
+    return tuple((date(y, 1, 1) - date(1970, 1, 1)).days * 86400 for y in (year, year + 1))
+
+def year_of(ts):
+    return date.fromordinal(date(1970, 1, 1).toordinal() + ts // 86400).year
+
+def logs_source(aliases):
+    # FROM clause over the hot table plus the given attached archives; WHERE clauses written against
+    # it are pushed down into each arm, so every arm is still a primary-key range scan
+    if not aliases:
+        return "water_logs"
+    arms = ["SELECT user_id, ts, seq, amount_ml FROM water_logs"]
+    arms += [f"SELECT user_id, ts, seq, amount_ml FROM {alias}.water_logs" for alias in aliases]
+    return "(" + " UNION ALL ".join(arms) + ")"
@@ -0,0 +1,101 @@
+# Mascot images without Streamlit: each one is read and sized once per process instead of on every rerun.
+# Pillow is imported on first use so importing the package stays cheap.
+import os
+import threading
+from io import BytesIO
+
+MASCOT_WIDTH = 200
+# where `python -m waterbuddy build-assets` writes the pre-sized variants
+BUILD_DIR = os.path.join("image", "sized")
+
+def target_format(image):
+    # the format st.image converts an image to (GIF stays GIF, alpha -> PNG, else JPEG); bytes already
+    # in that format and no wider than the display width are passed through without re-encoding
+    if image.format == "GIF":
+        return "GIF"
+    return "PNG" if image.mode in ("RGBA", "LA", "P") else "JPEG"
+
+def variant_name(path, width):
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return f"{stem}.{width}w.{'gif' if ext.lower() == '.gif' else 'png'}"
+
+def fit(image, width):
+    from PIL import Image
+    if image.width <= width:
+        return image
+    return image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+
+def prepare(data, width=MASCOT_WIDTH):
+    # display-ready bytes: GIFs keep their animation, anything else becomes its first frame, which
+    # is what st.image showed for the animated WebP mascots anyway
+    from PIL import Image, ImageSequence
+    image = Image.open(BytesIO(data))
+    fmt = target_format(image)
+    if image.format == fmt and image.width <= width:
+        return data
+    out = BytesIO()
+    if fmt == "GIF":
+        frames, durations = [], []
+        for frame in ImageSequence.Iterator(image):
+            durations.append(frame.info.get("duration", 100))
+            frames.append(fit(frame.convert("RGBA"), width))
+        frames[0].save(out, "GIF", save_all=True, append_images=frames[1:], duration=durations,
+                       loop=image.info.get("loop", 0), disposal=2, optimize=True)
+    else:
+        image.seek(0)
+        still = fit(image.convert("RGBA" if fmt == "PNG" else "RGB"), width)
+        still.save(out, fmt, optimize=True, **({"quality": 90} if fmt == "JPEG" else {}))
+    return out.getvalue()
+
+def build(paths, width=MASCOT_WIDTH, build_dir=BUILD_DIR):
+    # writes the variant of every path into build_dir; returns [(path, source bytes, variant bytes)]
+    os.makedirs(build_dir, exist_ok=True)
+    sizes = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        variant = prepare(data, width)
+        with open(os.path.join(build_dir, variant_name(path, width)), "wb") as f:
+            f.write(variant)
+        sizes.append((path, len(data), len(variant)))
+    return sizes
+
+class AssetCache:
+    # process-wide path -> display-ready bytes. A variant in build_dir newer than its source is used
+    # as is; otherwise the source is sized on first use. Missing files map to None.
+    def __init__(self, width=MASCOT_WIDTH, build_dir=BUILD_DIR):
+        self.width = width
+        self.build_dir = build_dir
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        key = os.path.normpath(path)
+        try:
+            return self._entries[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = self._load(key)
+            return self._entries[key]
+
+    def preload(self, directory):
+        # a missing directory just means no mascots, as with the missing files get() maps to None
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                self.get(path)
+
+    def _load(self, path):
+        if not os.path.exists(path):
+            return None
+        if self.build_dir:
+            variant = os.path.join(self.build_dir, variant_name(path, self.width))
+            if os.path.exists(variant) and os.path.getmtime(variant) >= os.path.getmtime(path):
+                with open(variant, "rb") as f:
+                    return f.read()
+        with open(path, "rb") as f:
+            return prepare(f.read(), self.width)
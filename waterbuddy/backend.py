@@ -0,0 +1,219 @@
+# The storage interface the app, CLI and benchmarks program against. Store (SQLite), ShardedStore
+# (SQLite over N files) and MemoryStore (plain Python structures) implement it; open_store picks one.
+# Methods here that only call other interface methods are shared application logic, so every backend
+# runs the same code for them and a benchmark difference between backends is the engine's.
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from time import sleep
+
+from .archive import ARCHIVE_HORIZON_DAYS
+from .reminders import ReminderInbox, ReminderScheduler
+
+class StorageBackend(ABC):
+    # attributes every backend sets: cache (a ReadCache), metrics (a Metrics or None) and
+    # reminders (the ReminderScheduler once start_reminders() has run)
+    cache = None
+    metrics = None
+    reminders = None
+    # errors a background job shrugs off and retries on its next round (e.g. a held SQLite write lock)
+    transient_errors = ()
+
+    def start_reminders(self, sink=None):
+        # background reminder scheduler, loaded from the settings once; update_settings and
+        # delete_all_user_data keep it current. sink(user_id, due) defaults to a ReminderInbox.
+        if self.reminders is None:
+            scheduler = ReminderScheduler(sink or ReminderInbox())
+            scheduler.load(self.reminder_settings())
+            self.reminders = scheduler.start()
+        return self.reminders
+
+    def start_challenge_sweep(self):
+        # background thread settling every running challenge once at start and then just after each
+        # midnight, when the day that ended decides which challenges failed
+        if getattr(self, "_challenge_sweep", None) is None:
+            self._challenge_sweep = threading.Thread(target=self._run_challenge_sweep, name="challenge-sweep", daemon=True)
+            self._challenge_sweep.start()
+        return self._challenge_sweep
+
+    def _run_challenge_sweep(self):
+        while True:
+            try:
+                self.evaluate_challenges()
+            except self.transient_errors:
+                # the next log or page view re-evaluates that user, and the next midnight everyone
+                pass
+            now = datetime.now()
+            sleep((datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) - now).total_seconds() + 1)
+
+    # ---------- SCHEMA ----------
+    @abstractmethod
+    def init_db(self): ...
+
+    # ---------- USERS ----------
+    # user rows are mappings with id, username, password, age, weight, daily_goal_ml and created_at
+    # user_id: None lets the backend allocate the next id; a loader (e.g. the benchmark data
+    # generator) passes its own. Returns the new id, or None when the username or id is taken.
+    @abstractmethod
+    def create_user(self, username, password, age=None, weight=None, daily_goal_ml=2000, user_id=None): ...
+
+    @abstractmethod
+    def get_user_by_username(self, username): ...
+
+    @abstractmethod
+    def check_login(self, username, password): ...
+
+    @abstractmethod
+    def get_username(self, user_id): ...
+
+    @abstractmethod
+    def get_usernames(self, user_ids): ...
+
+    @abstractmethod
+    def update_user_profile(self, user_id, age=None, weight=None, daily_goal_ml=None): ...
+
+    @abstractmethod
+    def counts(self): ...
+
+    # ---------- WATER LOGS ----------
+    # timestamps are "YYYY-MM-DD HH:MM:SS" strings, ranges half-open; log rows are mappings with
+    # amount_ml and ts (seconds since 1970-01-01 local time), newest first
+    @abstractmethod
+    def log_water(self, user_id, amount_ml, timestamp=None): ...
+
+    # the log with its rollups and streak state, minus the badge / challenge evaluation log_water runs
+    @abstractmethod
+    def write_log(self, user_id, amount_ml, timestamp): ...
+
+    @abstractmethod
+    def sum_logs_between(self, user_id, start_ts, end_ts): ...
+
+    @abstractmethod
+    def get_logs_between(self, user_id, start_ts, end_ts): ...
+
+    @abstractmethod
+    def delete_logs_between(self, user_id, start_ts, end_ts): ...
+
+    @abstractmethod
+    def get_logs_for_date(self, user_id, date_iso): ...
+
+    @abstractmethod
+    def get_today_total(self, user_id): ...
+
+    @abstractmethod
+    def get_history(self, user_id, start, end, granularity="day", include_entries=False): ...
+
+    @abstractmethod
+    def get_analytics(self, user_id, goal_ml, window=7): ...
+
+    @abstractmethod
+    def clear_today_logs(self, user_id): ...
+
+    @abstractmethod
+    def rebuild_daily_totals(self, user_id=None): ...
+
+    def get_7day_history(self, user_id, include_entries=False):
+        today = date.today()
+        return self.get_history(user_id, today - timedelta(days=6), today, include_entries=include_entries)
+
+    # ---------- BULK IMPORT / EXPORT ----------
+    @abstractmethod
+    def import_logs(self, rows, batch_size=5000): ...
+
+    @abstractmethod
+    def export_logs(self, user_id=None, start_ts=None, end_ts=None, chunk_size=1000): ...
+
+    # ---------- ARCHIVE / COMPACTION ----------
+    # only meaningful for an engine with files; by default there is nothing to move or free
+    def archive_logs(self, horizon_days=ARCHIVE_HORIZON_DAYS, batch_users=1000):
+        return {"rows": 0, "years": [], "seconds": 0}
+
+    def compact(self, max_pages=None):
+        return 0
+
+    def start_compaction(self, every_seconds=3600, horizon_days=ARCHIVE_HORIZON_DAYS):
+        return None
+
+    # ---------- LEADERBOARDS ----------
+    @abstractmethod
+    def leaderboard(self, period="week", day=None): ...
+
+    @abstractmethod
+    def rebuild_leaderboards(self, user_id=None): ...
+
+    def get_top_hydrators(self, period="week", k=10, day=None):
+        top = self.leaderboard(period, day).top(k)
+        names = self.get_usernames(uid for uid, _ in top)
+        result = []
+        for i, (uid, total) in enumerate(top):
+            # competition ranking: ties share the better rank
+            rank = result[-1]["rank"] if result and result[-1]["total_ml"] == total else i + 1
+            result.append({"rank": rank, "user_id": uid, "username": names.get(uid), "total_ml": total})
+        return result
+
+    def get_my_rank(self, user_id, period="week", day=None):
+        # rank among users with logs this period; percentile = share of them ranked below the user
+        board = self.leaderboard(period, day)
+        rank = board.rank(user_id)
+        users = len(board)
+        if rank is None:
+            return {"rank": None, "users": users, "percentile": None, "total_ml": 0}
+        return {
+            "rank": rank,
+            "users": users,
+            "percentile": round(100 * (users - rank) / users, 1),
+            "total_ml": board.totals[user_id],
+        }
+
+    # ---------- BADGES ----------
+    @abstractmethod
+    def get_badges(self, user_id): ...
+
+    @abstractmethod
+    def get_earned_badges(self, user_id): ...
+
+    @abstractmethod
+    def award_badge(self, user_id, badge_name): ...
+
+    @abstractmethod
+    def evaluate_badges(self, user_id, event="log"): ...
+
+    @abstractmethod
+    def backfill_badges(self, rules=None): ...
+
+    def award_badges_for_user(self, user_id):
+        return self.evaluate_badges(user_id, "log")
+
+    # ---------- CHALLENGES ----------
+    @abstractmethod
+    def add_challenge(self, user_id, name, days, goal, start_iso): ...
+
+    @abstractmethod
+    def get_challenges(self, user_id): ...
+
+    @abstractmethod
+    def evaluate_challenges(self, user_id=None, today=None): ...
+
+    @abstractmethod
+    def mark_challenge_done(self, user_id, challenge_id): ...
+
+    # ---------- SETTINGS ----------
+    @abstractmethod
+    def get_settings(self, user_id): ...
+
+    @abstractmethod
+    def update_settings(self, user_id, reminder_enabled, reminder_minutes, reminder_start_time): ...
+
+    @abstractmethod
+    def reminder_settings(self): ...
+
+    # ---------- DELETION ----------
+    @abstractmethod
+    def delete_all_user_data(self, user_id): ...
+
+    # ---------- STREAKS ----------
+    @abstractmethod
+    def recompute_streak_state(self, user_id): ...
+
+    @abstractmethod
+    def compute_streaks(self, user_id): ...
@@ -0,0 +1,69 @@
+# Process-wide read cache for per-user queries.
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+class ReadCache:
+    # process-wide LRU + TTL cache of per-user reads. Entries are keyed (owner, query, args);
+    # write helpers drop exactly the (owner, query) pairs they change. The TTL only bounds
+    # staleness from writes made by other processes.
+    def __init__(self, max_entries=5000, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._keys = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.invalidations = 0
+
+    def get(self, owner, query, args, loader):
+        key = (owner, query, args)
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generations.get(owner, 0)
+        value = loader()
+        with self._lock:
+            # a write for this owner landed while we were loading: don't cache what may be stale
+            if self._generations.get(owner, 0) == generation:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                self._keys.setdefault(owner, set()).add(key)
+                while len(self._entries) > self.max_entries:
+                    old_key, _ = self._entries.popitem(last=False)
+                    self._keys.get(old_key[0], set()).discard(old_key)
+        return value
+
+    def invalidate(self, owner, *queries):
+        # drop the owner's entries for the given queries, or all of them when none are given
+        with self._lock:
+            self._generations[owner] = self._generations.get(owner, 0) + 1
+            for key in list(self._keys.get(owner, ())):
+                if not queries or key[1] in queries:
+                    self._entries.pop(key, None)
+                    self._keys[owner].discard(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            for owner in self._keys:
+                self._generations[owner] = self._generations.get(owner, 0) + 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
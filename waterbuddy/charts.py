@@ -0,0 +1,64 @@
+# history charts without Streamlit: a Matplotlib figure / PNG bytes and an Altair spec.
+# Matplotlib and Altair are imported on first use so importing the package stays cheap.
+from datetime import datetime, date
+from io import BytesIO
+
+def plot_7day_intake_from_history_dict(history, daily_goal_ml, title='Your Intake vs Daily Target (Past 7 Days)', granularity="day"):
+    # history: dict keyed by iso period start with total_ml (and days per period for week/month)
+    # a bare Figure (no pyplot state machine) is safe to build from several session threads at once
+    from matplotlib.figure import Figure
+    dates = []
+    actual_intake = []
+    target_intake = []
+    date_labels = []
+    label_fmt = "%b %Y" if granularity == "month" else "%m/%d"
+    for d_iso, v in history.items():
+        dd = datetime.strptime(d_iso, "%Y-%m-%d").date()
+        dates.append(dd)
+        actual_ml = v.get("total_ml", 0)
+        actual_intake.append(actual_ml / 1000)
+        target_intake.append(daily_goal_ml * v.get("days", 1) / 1000)
+        date_labels.append(dd.strftime(label_fmt))
+    fig = Figure(figsize=(10, 4))
+    ax = fig.subplots()
+    x = range(len(dates))
+    width = 0.35
+    bars1 = ax.bar([i - width/2 for i in x], actual_intake, width, label='Actual Intake')
+    bars2 = ax.bar([i + width/2 for i in x], target_intake, width, label='Daily Target', alpha=0.6)
+    ax.set_xlabel('Date', fontsize=10)
+    ax.set_ylabel('Litres', fontsize=10)
+    ax.set_title(title, fontsize=12)
+    ax.set_xticks(x)
+    ax.set_xticklabels(date_labels, fontsize=9, rotation=45 if len(dates) > 14 else 0)
+    ax.legend()
+    ax.grid(True, alpha=0.2)
+    for bars in (bars1, bars2) if len(dates) <= 14 else ():
+        for bar in bars:
+            height = bar.get_height()
+            if height > 0:
+                ax.text(bar.get_x() + bar.get_width()/2., height, f'{height:.1f}L', ha='center', va='bottom', fontsize=8)
+    fig.tight_layout()
+    return fig
+
+def render_png(history, daily_goal_ml, title, granularity="day"):
+    fig = plot_7day_intake_from_history_dict(history, daily_goal_ml, title=title, granularity=granularity)
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=100)
+    return buf.getvalue()
+
+def history_chart_altair(history, daily_goal_ml, title, granularity="day"):
+    # same bars as the Matplotlib chart, but only the data points are sent to the browser
+    import altair as alt
+    label_fmt = "%b %Y" if granularity == "month" else "%m/%d"
+    rows = []
+    for d_iso, v in history.items():
+        label = date.fromisoformat(d_iso).strftime(label_fmt)
+        rows.append({"date": label, "series": "Actual Intake", "litres": v.get("total_ml", 0) / 1000})
+        rows.append({"date": label, "series": "Daily Target", "litres": daily_goal_ml * v.get("days", 1) / 1000})
+    return alt.Chart(alt.Data(values=rows), title=title).mark_bar().encode(
+        x=alt.X("date:N", sort=None, title="Date"),
+        xOffset=alt.XOffset("series:N"),
+        y=alt.Y("litres:Q", title="Litres"),
+        color=alt.Color("series:N", title=None),
+        tooltip=["date:N", "series:N", alt.Tooltip("litres:Q", format=".2f")],
+    )
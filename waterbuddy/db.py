@@ -0,0 +1,239 @@
+# SQLite plumbing shared by the app, batch jobs and benchmarks: a WAL-mode connection pool
+# and an optional group-commit writer. Nothing here imports Streamlit.
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+from time import monotonic, perf_counter
+
+@contextmanager
+def attached(conn, databases):
+    # ATTACH {alias: path} for the duration of the block; both statements must run outside a transaction
+    for alias, path in databases.items():
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+    try:
+        yield conn
+    finally:
+        for alias in databases:
+            conn.execute(f"DETACH DATABASE {alias}")
+
+def first_parameters(seq_of_parameters):
+    # (first parameter set, the full sequence) without consuming a generator, so a slow executemany
+    # can be explained with real values; () when the sequence is empty
+    it = iter(seq_of_parameters)
+    first = next(it, None)
+    if first is None:
+        return (), ()
+    return first, chain((first,), it)
+
+class TracedCursor(sqlite3.Cursor):
+    # statements run through conn.cursor() are timed into the connection's metrics like conn.execute
+    def execute(self, sql, parameters=(), /):
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.metrics.record_query(self.connection, sql, parameters, perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        first, seq_of_parameters = first_parameters(seq_of_parameters)
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.metrics.record_query(self.connection, sql, first, perf_counter() - start)
+
+    def executescript(self, sql_script, /):
+        start = perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self.connection.metrics.record_query(self.connection, sql_script, (), perf_counter() - start)
+
+class TracedConnection(sqlite3.Connection):
+    # reports each statement's wall time to a metrics.Metrics. For a SELECT this is the time to its
+    # first row, which already includes any sort or aggregation SQLite does before returning rows.
+    metrics = None
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=(), /):
+        start = perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.metrics.record_query(self, sql, parameters, perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters, /):
+        first, seq_of_parameters = first_parameters(seq_of_parameters)
+        start = perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.metrics.record_query(self, sql, first, perf_counter() - start)
+
+    def executescript(self, sql_script, /):
+        start = perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self.metrics.record_query(self, sql_script, (), perf_counter() - start)
+
+class ConnectionPool:
+    # WAL-mode pool: read-only connections are checked out per query so every session thread
+    # gets its own, and a single writer connection serializes write transactions in-process.
+    # Under WAL, dashboard reads never wait for a log being written.
+    def __init__(self, path, max_readers=8, metrics=None):
+        # metrics: a metrics.Metrics that every statement on the pool's connections is timed into
+        self.path = path
+        self.metrics = metrics
+        self._readers = queue.LifoQueue(maxsize=max_readers)
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+        self._writer = self._connect()
+        # aliases attached to the writer by the outermost open writer()
+        self._writer_attached = {}
+
+    def _connect(self, read_only=False):
+        factory = TracedConnection if self.metrics is not None else sqlite3.Connection
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5.0, factory=factory)
+        if self.metrics is not None:
+            conn.metrics = self.metrics
+        conn.row_factory = sqlite3.Row
+        # only takes effect on a brand-new file, and must come before WAL mode writes its header. The
+        # writer is opened first, so readers skip it: on an existing file it waits for any open write
+        # transaction, and a reader opened mid-transaction (e.g. by refresh_daily_totals) would deadlock
+        if not read_only:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -8000")
+        if read_only:
+            conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    @contextmanager
+    def reader(self, attach=None):
+        # attach: {alias: path} of extra databases (log archives) this read needs
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self._connect(read_only=True)
+        try:
+            with attached(conn, attach) if attach else nullcontext():
+                yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    @contextmanager
+    def writer(self, attach=None):
+        # one transaction at a time; a nested writer() on the same thread joins the outer transaction.
+        # ATTACH cannot run inside a transaction, so only the outermost writer() attaches; a nested one
+        # may only ask for databases that are already attached.
+        with self._write_lock:
+            conn = self._writer
+            outer = self._write_depth == 0
+            if not outer:
+                missing = set(attach or ()) - set(self._writer_attached)
+                if missing:
+                    raise RuntimeError(f"writer() cannot attach {sorted(missing)} inside a write transaction")
+            with attached(conn, attach) if attach and outer else nullcontext():
+                if outer:
+                    self._writer_attached = dict(attach or {})
+                    conn.execute("BEGIN IMMEDIATE")
+                self._write_depth += 1
+                try:
+                    yield conn
+                except BaseException:
+                    if outer:
+                        conn.execute("ROLLBACK")
+                    raise
+                else:
+                    if outer:
+                        conn.execute("COMMIT")
+                finally:
+                    self._write_depth -= 1
+                    if outer:
+                        self._writer_attached = {}
+
+    @contextmanager
+    def maintenance(self):
+        # the writer connection outside any transaction, for VACUUM and similar statements that
+        # cannot run inside one; holds the write lock so no write transaction interleaves
+        with self._write_lock:
+            if self._write_depth:
+                raise RuntimeError("maintenance() cannot run inside a write transaction")
+            yield self._writer
+
+class GroupCommitWriter:
+    # background thread that runs queued write functions in shared transactions, so a burst of
+    # quick-add taps from many sessions pays for one commit instead of one each
+    def __init__(self, pool, interval_ms=0, max_batch=500):
+        self.pool = pool
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args):
+        # the future resolves only after the batch commits, so waiting on it gives read-your-writes
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def _run(self):
+        while True:
+            # take everything that queued up during the previous commit; only linger for
+            # more (up to interval) when that shows a burst, so a lone tap commits at once
+            batch = [self._queue.get()]
+            self._drain(batch)
+            if len(batch) > 1:
+                deadline = monotonic() + self.interval
+                while len(batch) < self.max_batch:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+            self._commit(batch)
+
+    def _drain(self, batch):
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with self.pool.writer() as conn:
+                for fn, args, future in batch:
+                    # a savepoint per item keeps one bad write from failing the whole batch
+                    conn.execute("SAVEPOINT batch_item")
+                    try:
+                        results.append((future, fn(*args), None))
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO batch_item")
+                        results.append((future, None, e))
+                    conn.execute("RELEASE batch_item")
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
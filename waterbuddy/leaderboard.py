@@ -0,0 +1,45 @@
+# in-memory ranking of one leaderboard period (e.g. this week). Entries are kept sorted as
+# (-total_ml, user_id), so top-K is a slice and a user's rank is one bisect; an update moves one
+# entry. Boards are loaded from the leaderboard table; Store drops a cached one whenever a write changes it.
+import threading
+from bisect import bisect_left, insort
+from time import monotonic
+
+class PeriodBoard:
+    def __init__(self, rows, ttl_seconds=60):
+        # rows: (user_id, total_ml)
+        self.totals = dict(rows)
+        self._sorted = sorted((-total, user_id) for user_id, total in self.totals.items())
+        self._lock = threading.Lock()
+        # other processes write too; past this the board is reloaded from the table
+        self.expires = monotonic() + ttl_seconds
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def add(self, user_id, amount_ml):
+        with self._lock:
+            old = self.totals.get(user_id)
+            if old is not None:
+                del self._sorted[bisect_left(self._sorted, (-old, user_id))]
+            new = (old or 0) + amount_ml
+            self.totals[user_id] = new
+            insort(self._sorted, (-new, user_id))
+
+    def remove(self, user_id):
+        with self._lock:
+            old = self.totals.pop(user_id, None)
+            if old is not None:
+                del self._sorted[bisect_left(self._sorted, (-old, user_id))]
+
+    def top(self, k):
+        with self._lock:
+            return [(user_id, -neg) for neg, user_id in self._sorted[:k]]
+
+    def rank(self, user_id):
+        # 1-based competition rank (ties share the better rank); None when the user has no logs this period
+        with self._lock:
+            total = self.totals.get(user_id)
+            if total is None:
+                return None
+            return bisect_left(self._sorted, (-total,)) + 1
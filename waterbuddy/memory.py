@@ -0,0 +1,589 @@
+# In-memory storage backend: the Store helpers over dicts and sorted arrays, with no database engine
+# underneath and nothing persisted. Results match a Store's for the same calls, so tests and benchmarks
+# can run the application logic without SQLite, and a benchmark run against both backends separates
+# the engine's cost from the app's. Every helper holds one lock, as sessions call in from many threads.
+import functools
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta, timezone
+from time import monotonic
+
+from .backend import StorageBackend
+from .cache import ReadCache
+from .leaderboard import PeriodBoard
+from .store import (
+    BADGE_RULES,
+    CHALLENGE_ACTIVE,
+    CHALLENGE_COMPLETED,
+    CHALLENGE_FAILED,
+    EPOCH,
+    HISTORY_BUCKETS,
+    LEADERBOARD_PERIODS,
+    day_range,
+    from_ts,
+    next_period,
+    period_start,
+    streak_metrics,
+    streak_state_from_days,
+    to_ts,
+    today_str,
+)
+
+DEFAULT_SETTINGS = {"reminder_enabled": False, "reminder_minutes": 120, "reminder_start_time": "09:00"}
+
+@functools.lru_cache(maxsize=4096)
+def day_of(day_number):
+    # iso day of a ts // 86400
+    return (EPOCH + timedelta(days=day_number)).date().isoformat()
+
+@functools.lru_cache(maxsize=4096)
+def board_keys(day_iso):
+    # the (period, period start iso) of every leaderboard the day counts towards
+    d = date.fromisoformat(day_iso)
+    return tuple((period, period_start(d, period).isoformat()) for period in LEADERBOARD_PERIODS)
+
+def days_between(start, end):
+    # iso days in [start, end)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days)]
+
+def period_key(day_iso, granularity):
+    # the history bucket a day falls in, as HISTORY_BUCKETS computes it in SQL
+    if granularity == "month":
+        return day_iso[:8] + "01"
+    if granularity == "week":
+        return period_start(date.fromisoformat(day_iso), "week").isoformat()
+    return day_iso
+
+def utc_now():
+    # what SQLite's CURRENT_TIMESTAMP stores
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+class MemoryStore(StorageBackend):
+    def __init__(self, path=None, group_commit_ms=None, cache=None, metrics=None):
+        # path and group_commit_ms are accepted so open_store can pass the same arguments to any
+        # backend; there is no file and every write is already a single step
+        self.path = path
+        self.metrics = metrics
+        # reads are dict lookups and skip the read cache; it is kept for the diagnostics panel
+        self.cache = cache if cache is not None else ReadCache()
+        self.reminders = None
+        self._challenge_sweep = None
+        self._lock = threading.RLock()
+        self._users = {}
+        self._user_ids = {}
+        self._next_user_id = 1
+        # user_id -> (array of ts, array of amount_ml), ordered by ts and then by insertion
+        self._logs = {}
+        # user_id -> {day iso: [total_ml, entry_count]}, the daily_totals rollup
+        self._daily = {}
+        # user_id -> (current run, longest streak, last active date or None)
+        self._streaks = {}
+        # user_id -> {badge name: earned_at}
+        self._badges = {}
+        self._challenges = {}
+        self._next_challenge_id = 1
+        self._settings = {}
+        # (period, period start iso) -> PeriodBoard, complete from the first log on
+        self._boards = {}
+
+    # ---------- SCHEMA ----------
+    def init_db(self):
+        pass
+
+    # ---------- USERS ----------
+    def get_username(self, user_id):
+        user = self._users.get(user_id)
+        return user["username"] if user else None
+
+    def get_usernames(self, user_ids):
+        with self._lock:
+            return {uid: self._users[uid]["username"] for uid in user_ids if uid in self._users}
+
+    def create_user(self, username, password, age=None, weight=None, daily_goal_ml=2000, user_id=None):
+        with self._lock:
+            if username in self._user_ids or user_id in self._users:
+                return None
+            if user_id is None:
+                user_id = self._next_user_id
+            self._next_user_id = max(self._next_user_id, user_id + 1)
+            self._users[user_id] = {
+                "id": user_id, "username": username, "password": password, "age": age, "weight": weight,
+                "daily_goal_ml": daily_goal_ml, "created_at": utc_now(),
+            }
+            self._user_ids[username] = user_id
+            self._settings.setdefault(user_id, dict(DEFAULT_SETTINGS))
+            return user_id
+
+    def get_user_by_username(self, username):
+        with self._lock:
+            user = self._users.get(self._user_ids.get(username))
+            return dict(user) if user else None
+
+    def update_user_profile(self, user_id, age=None, weight=None, daily_goal_ml=None):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return
+            for name, value in (("age", age), ("weight", weight), ("daily_goal_ml", daily_goal_ml)):
+                if value is not None:
+                    user[name] = value
+
+    def counts(self):
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "logs": sum(len(ts) for ts, _ in self._logs.values()),
+                "badges": sum(len(b) for b in self._badges.values()),
+                "active_challenges": sum(c["done"] == CHALLENGE_ACTIVE for c in self._challenges.values()),
+            }
+
+    def check_login(self, username, password):
+        user = self.get_user_by_username(username)
+        return user if user and user["password"] == password else None
+
+    # ---------- WATER LOGS ----------
+    def log_water(self, user_id, amount_ml, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.write_log(user_id, amount_ml, timestamp)
+        # after logging, try awarding badges and completing challenges if needed
+        self.award_badges_for_user(user_id)
+        self.evaluate_challenges(user_id)
+
+    def write_log(self, user_id, amount_ml, timestamp):
+        # the log, its rollup day, the boards and the streak state in one step, without evaluations
+        with self._lock:
+            self._insert(user_id, to_ts(timestamp), int(amount_ml))
+            self.advance_streak(user_id, timestamp[:10])
+
+    def _insert(self, user_id, ts, amount_ml):
+        self._append(user_id, ts, amount_ml)
+        self._add_totals(user_id, day_of(ts // 86400), amount_ml, 1)
+
+    def _append(self, user_id, ts, amount_ml):
+        stamps, amounts = self._logs.setdefault(user_id, (array("q"), array("q")))
+        if not stamps or stamps[-1] <= ts:
+            stamps.append(ts)
+            amounts.append(amount_ml)
+        else:
+            # backdated: after any logs in the same second, as seq would order it
+            i = bisect_right(stamps, ts)
+            stamps.insert(i, ts)
+            amounts.insert(i, amount_ml)
+
+    def _add_totals(self, user_id, day, total_ml, entries):
+        # the rollup day and the boards it counts towards
+        t = self._daily.setdefault(user_id, {}).setdefault(day, [0, 0])
+        t[0] += total_ml
+        t[1] += entries
+        for key in board_keys(day):
+            board = self._boards.get(key)
+            if board is None:
+                board = self._boards[key] = PeriodBoard(())
+            board.add(user_id, total_ml)
+
+    def _slice(self, user_id, start_ts, end_ts):
+        # (stamps, amounts, lo, hi) of the user's logs in [start_ts, end_ts)
+        stamps, amounts = self._logs.get(user_id, (array("q"), array("q")))
+        return stamps, amounts, bisect_left(stamps, to_ts(start_ts)), bisect_left(stamps, to_ts(end_ts))
+
+    def sum_logs_between(self, user_id, start_ts, end_ts):
+        with self._lock:
+            _, amounts, lo, hi = self._slice(user_id, start_ts, end_ts)
+            return sum(amounts[lo:hi])
+
+    def get_logs_between(self, user_id, start_ts, end_ts):
+        # mappings of amount_ml and ts, newest first
+        with self._lock:
+            stamps, amounts, lo, hi = self._slice(user_id, start_ts, end_ts)
+            return [{"amount_ml": amounts[i], "ts": stamps[i]} for i in range(hi - 1, lo - 1, -1)]
+
+    def delete_logs_between(self, user_id, start_ts, end_ts):
+        with self._lock:
+            stamps, amounts, lo, hi = self._slice(user_id, start_ts, end_ts)
+            if lo < hi:
+                del stamps[lo:hi]
+                del amounts[lo:hi]
+            self._refresh_days(user_id, start_ts[:10], end_ts[:10])
+            self.recompute_streak_state(user_id)
+
+    def _refresh_days(self, user_id, start_day, end_day):
+        # rollup days in [start_day, end_day] and the user's totals for every period overlapping them,
+        # recomputed from the logs, as Store.refresh_daily_totals does
+        daily = self._daily.setdefault(user_id, {})
+        for day in [day for day in daily if start_day <= day <= end_day]:
+            del daily[day]
+        stamps, amounts, lo, hi = self._slice(user_id, *day_range(start_day, end_day))
+        for i in range(lo, hi):
+            t = daily.setdefault(day_of(stamps[i] // 86400), [0, 0])
+            t[0] += amounts[i]
+            t[1] += 1
+        first, last = date.fromisoformat(start_day), date.fromisoformat(end_day)
+        for period in LEADERBOARD_PERIODS:
+            p = period_start(first, period)
+            while p <= last:
+                nxt = next_period(p, period)
+                board = self._boards.setdefault((period, p.isoformat()), PeriodBoard(()))
+                board.remove(user_id)
+                totals = [daily[d][0] for d in days_between(p, nxt) if d in daily]
+                if totals:
+                    board.add(user_id, sum(totals))
+                p = nxt
+
+    def get_logs_for_date(self, user_id, date_iso):
+        return self.get_logs_between(user_id, *day_range(date_iso))
+
+    def get_today_total(self, user_id):
+        with self._lock:
+            return self._daily.get(user_id, {}).get(today_str(), [0])[0]
+
+    def get_history(self, user_id, start, end, granularity="day", include_entries=False):
+        # start/end are inclusive dates (or iso strings); every period in range is present, zero-filled
+        if granularity not in HISTORY_BUCKETS:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if isinstance(start, str):
+            start = date.fromisoformat(start)
+        if isinstance(end, str):
+            end = date.fromisoformat(end)
+        history = {}
+        p = period_start(start, granularity)
+        while p <= end:
+            nxt = next_period(p, granularity)
+            days = (min(nxt, end + timedelta(days=1)) - max(p, start)).days
+            history[p.isoformat()] = {"total_ml": 0, "days": days}
+            if include_entries:
+                history[p.isoformat()]["entries"] = []
+            p = nxt
+        with self._lock:
+            daily = self._daily.get(user_id, {})
+            # walk whichever is shorter, the range or the user's active days
+            if (end - start).days < len(daily):
+                days = [d for d in days_between(start, end + timedelta(days=1)) if d in daily]
+            else:
+                start_iso, end_iso = start.isoformat(), end.isoformat()
+                days = [d for d in daily if start_iso <= d <= end_iso]
+            totals = [(d, daily[d][0]) for d in days]
+        for day, total in totals:
+            history[period_key(day, granularity)]["total_ml"] += total
+        if include_entries:
+            for row in self.get_logs_between(user_id, *day_range(start.isoformat(), end.isoformat())):
+                d = from_ts(row["ts"]).date()
+                history[period_start(d, granularity).isoformat()]["entries"].append(row)
+        return history
+
+    def get_analytics(self, user_id, goal_ml, window=7):
+        # see analytics.summarize for the result's keys
+        from .analytics import summarize
+        with self._lock:
+            daily = self._daily.get(user_id, {})
+            days = sorted(daily)
+            totals = [daily[d][0] for d in days]
+            stamps, amounts = self._logs.get(user_id, ((), ()))
+            hourly = [0] * 24
+            for ts, amount_ml in zip(stamps, amounts):
+                hourly[ts % 86400 // 3600] += amount_ml
+        end = max(today_str(), days[-1]) if days else today_str()
+        return summarize(days, totals, hourly, goal_ml, end, window)
+
+    def clear_today_logs(self, user_id):
+        self.delete_logs_between(user_id, *day_range(today_str()))
+
+    def rebuild_daily_totals(self, user_id=None):
+        # one-shot repair of the rollup from the logs; streak state is dropped and rebuilt lazily, and
+        # the boards are rebuilt with it, as Store.rebuild_daily_totals does
+        with self._lock:
+            if user_id is None:
+                self._daily.clear()
+                self._streaks.clear()
+            else:
+                self._streaks.pop(user_id, None)
+            for uid in list(self._logs) if user_id is None else [user_id]:
+                by_day = {}
+                stamps, amounts = self._logs.get(uid, ((), ()))
+                for ts, amount_ml in zip(stamps, amounts):
+                    t = by_day.setdefault(ts // 86400, [0, 0])
+                    t[0] += amount_ml
+                    t[1] += 1
+                self._daily[uid] = {day_of(n): t for n, t in by_day.items()}
+            self.rebuild_leaderboards(user_id)
+
+    # ---------- BULK IMPORT / EXPORT ----------
+    def import_logs(self, rows, batch_size=5000):
+        # rows: iterable of dicts from transfer.read_logs; badges, challenges and streak state are
+        # settled once per touched user at the end, as Store.import_logs does
+        start = monotonic()
+        user_ids = {}
+        touched = set()
+        count = 0
+        batch = []
+        for row in rows:
+            user_id = row.get("user_id") or self._import_user_id(row.get("username"), user_ids)
+            batch.append((user_id, to_ts(row["timestamp"]), int(row["amount_ml"])))
+            if len(batch) >= batch_size:
+                count += self._import_batch(batch, touched)
+                batch = []
+        if batch:
+            count += self._import_batch(batch, touched)
+        for user_id in touched:
+            self.recompute_streak_state(user_id)
+            self.evaluate_badges(user_id)
+            self.evaluate_challenges(user_id)
+        seconds = monotonic() - start
+        return {
+            "rows": count,
+            "users": len(touched),
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(count / seconds) if seconds else count,
+        }
+
+    def _import_user_id(self, username, user_ids):
+        if username not in user_ids:
+            row = self.get_user_by_username(username) if username else None
+            if row is None:
+                raise ValueError(f"Unknown user: {username!r}")
+            user_ids[username] = row["id"]
+        return user_ids[username]
+
+    def _import_batch(self, batch, touched):
+        # one lock hold per batch, so sessions are not starved during a long import; the rollup and
+        # boards take one update per (user, day) of the batch, as Store._import_batch's upserts do
+        totals = {}
+        for user_id, ts, amount_ml in batch:
+            t = totals.setdefault((user_id, ts // 86400), [0, 0])
+            t[0] += amount_ml
+            t[1] += 1
+        with self._lock:
+            missing = sorted({user_id for user_id, _ in totals} - self._users.keys())
+            if missing:
+                raise ValueError(f"Unknown user: {missing[0]!r}")
+            for user_id, ts, amount_ml in batch:
+                self._append(user_id, ts, amount_ml)
+            for (user_id, day_number), (total, n) in totals.items():
+                self._add_totals(user_id, day_of(day_number), total, n)
+        touched.update(user_id for user_id, _ in totals)
+        return len(batch)
+
+    def export_logs(self, user_id=None, start_ts=None, end_ts=None, chunk_size=1000):
+        # generator in (user_id, ts) order; each chunk is copied under the lock, so writes may land
+        # between chunks, as they may between a Store export's fetches
+        start = to_ts(start_ts) if start_ts is not None else None
+        end = to_ts(end_ts) if end_ts is not None else None
+        with self._lock:
+            user_ids = sorted(self._logs) if user_id is None else [user_id]
+        for uid in user_ids:
+            i = None
+            while True:
+                with self._lock:
+                    stamps, amounts = self._logs.get(uid, ((), ()))
+                    if i is None:
+                        i = bisect_left(stamps, start) if start is not None else 0
+                    hi = bisect_left(stamps, end) if end is not None else len(stamps)
+                    chunk = [(stamps[j], amounts[j]) for j in range(i, min(i + chunk_size, hi))]
+                if not chunk:
+                    break
+                i += len(chunk)
+                for ts, amount_ml in chunk:
+                    # format_ts without a datetime per row
+                    hours, seconds = divmod(ts % 86400, 3600)
+                    timestamp = "%s %02d:%02d:%02d" % (day_of(ts // 86400), hours, seconds // 60, seconds % 60)
+                    yield {"user_id": uid, "amount_ml": amount_ml, "timestamp": timestamp}
+
+    # ---------- LEADERBOARDS ----------
+    def leaderboard(self, period="week", day=None):
+        if period not in LEADERBOARD_PERIODS:
+            raise ValueError(f"Unknown leaderboard period: {period}")
+        key = (period, period_start(day or date.today(), period).isoformat())
+        with self._lock:
+            board = self._boards.get(key)
+            if board is None:
+                board = self._boards[key] = PeriodBoard(())
+            return board
+
+    def rebuild_leaderboards(self, user_id=None):
+        # one pass over the rollup, summed per (period, user) before any board is built
+        with self._lock:
+            if user_id is None:
+                self._boards.clear()
+            else:
+                for board in self._boards.values():
+                    board.remove(user_id)
+            sums = {}
+            for uid in list(self._daily) if user_id is None else [user_id]:
+                for day, (total, _) in self._daily.get(uid, {}).items():
+                    for key in board_keys(day):
+                        per_user = sums.setdefault(key, {})
+                        per_user[uid] = per_user.get(uid, 0) + total
+            for key, totals in sums.items():
+                board = self._boards.get(key)
+                if board is None:
+                    self._boards[key] = PeriodBoard(totals.items())
+                else:
+                    for uid, total in totals.items():
+                        board.add(uid, total)
+
+    # ---------- BADGES ----------
+    def get_badges(self, user_id):
+        # in name order, as a Store reads them off the badges' (user_id, name) key
+        with self._lock:
+            return [{"name": name, "earned_at": at} for name, at in sorted(self._badges.get(user_id, {}).items())]
+
+    def get_earned_badges(self, user_id):
+        with self._lock:
+            return set(self._badges.get(user_id, ()))
+
+    def award_badge(self, user_id, badge_name):
+        with self._lock:
+            earned = self._badges.setdefault(user_id, {})
+            if badge_name in earned:
+                return False
+            earned[badge_name] = utc_now()
+            return True
+
+    def _badge_values(self, user_id):
+        # every BADGE_RULES metric for one user
+        with self._lock:
+            stamps, _ = self._logs.get(user_id, ((), ()))
+            return {"total_drinks": len(stamps), **self.compute_streaks(user_id)}
+
+    def evaluate_badges(self, user_id, event="log"):
+        # only rules listening to this event and not yet earned are evaluated
+        earned = self.get_earned_badges(user_id)
+        pending = [r for r in BADGE_RULES if event in r["events"] and r["name"] not in earned]
+        if not pending:
+            return []
+        values = self._badge_values(user_id)
+        return [
+            r["name"] for r in pending
+            if values.get(r["metric"], 0) >= r["threshold"] and self.award_badge(user_id, r["name"])
+        ]
+
+    def backfill_badges(self, rules=None):
+        rules = rules or BADGE_RULES
+        with self._lock:
+            user_ids = sorted(set(self._users) | set(self._logs))
+        awarded = 0
+        for uid in user_ids:
+            values = self._badge_values(uid)
+            awarded += sum(
+                values.get(r["metric"], 0) >= r["threshold"] and self.award_badge(uid, r["name"]) for r in rules
+            )
+        return awarded
+
+    # ---------- CHALLENGES ----------
+    def add_challenge(self, user_id, name, days, goal, start_iso):
+        with self._lock:
+            cid = self._next_challenge_id
+            self._next_challenge_id += 1
+            self._challenges[cid] = {
+                "id": cid, "user_id": user_id, "name": name, "days": days, "goal": goal, "start": start_iso,
+                "done": CHALLENGE_ACTIVE,
+            }
+
+    def get_challenges(self, user_id):
+        with self._lock:
+            return [dict(c) for c in self._challenges.values() if c["user_id"] == user_id]
+
+    def mark_challenge_done(self, user_id, challenge_id):
+        with self._lock:
+            if self._challenges.get(challenge_id, {}).get("user_id") == user_id:
+                self._challenges[challenge_id]["done"] = CHALLENGE_COMPLETED
+
+    def evaluate_challenges(self, user_id=None, today=None):
+        # same settling rules and result as Store.evaluate_challenges, counted straight off the rollup
+        today = today or date.today()
+        completed, failed, progress = [], [], {}
+        with self._lock:
+            for c in self._challenges.values():
+                if c["done"] != CHALLENGE_ACTIVE or (user_id is not None and c["user_id"] != user_id):
+                    continue
+                daily = self._daily.get(c["user_id"], {})
+                first = date.fromisoformat(c["start"])
+                met = met_before_today = 0
+                for i in range(c["days"]):
+                    d = first + timedelta(days=i)
+                    t = daily.get(d.isoformat())
+                    if t and t[0] >= c["goal"] * 1000:
+                        met += 1
+                        met_before_today += d < today
+                progress[c["id"]] = met
+                elapsed = min(c["days"], max(0, (today - first).days))
+                if met >= c["days"]:
+                    c["done"] = CHALLENGE_COMPLETED
+                    completed.append(c)
+                elif met_before_today < elapsed:
+                    c["done"] = CHALLENGE_FAILED
+                    failed.append(c)
+        for c in completed:
+            self.award_badge(c["user_id"], f"✅ Completed: {c['name']}")
+        return {
+            "completed": [(c["user_id"], c["name"]) for c in completed],
+            "failed": [(c["user_id"], c["name"]) for c in failed],
+            "progress": progress,
+        }
+
+    # ---------- SETTINGS ----------
+    def get_settings(self, user_id):
+        with self._lock:
+            return dict(self._settings.setdefault(user_id, dict(DEFAULT_SETTINGS)))
+
+    def update_settings(self, user_id, reminder_enabled, reminder_minutes, reminder_start_time):
+        with self._lock:
+            self._settings[user_id] = {
+                "reminder_enabled": bool(reminder_enabled),
+                "reminder_minutes": int(reminder_minutes),
+                "reminder_start_time": reminder_start_time,
+            }
+        if self.reminders is not None:
+            self.reminders.update(user_id, bool(reminder_enabled), int(reminder_minutes), reminder_start_time)
+
+    def reminder_settings(self):
+        with self._lock:
+            return [
+                (uid, s["reminder_minutes"], s["reminder_start_time"])
+                for uid, s in self._settings.items() if s["reminder_enabled"]
+            ]
+
+    # ---------- DELETION ----------
+    def delete_all_user_data(self, user_id):
+        with self._lock:
+            user = self._users.pop(user_id, None)
+            if user is not None:
+                self._user_ids.pop(user["username"], None)
+            self._logs.pop(user_id, None)
+            self._daily.pop(user_id, None)
+            self._streaks.pop(user_id, None)
+            self._badges.pop(user_id, None)
+            self._settings.pop(user_id, None)
+            for cid in [cid for cid, c in self._challenges.items() if c["user_id"] == user_id]:
+                del self._challenges[cid]
+            for board in self._boards.values():
+                board.remove(user_id)
+        if self.reminders is not None:
+            self.reminders.remove(user_id)
+
+    # ---------- STREAKS ----------
+    def recompute_streak_state(self, user_id):
+        with self._lock:
+            days = sorted(day for day, (_, n) in self._daily.get(user_id, {}).items() if n > 0)
+            state = self._streaks[user_id] = streak_state_from_days(date.fromisoformat(d) for d in days)
+            return state
+
+    def advance_streak(self, user_id, day_iso):
+        with self._lock:
+            state = self._streaks.get(user_id)
+            day = date.fromisoformat(day_iso)
+            if state is None or state[2] is None or day < state[2]:
+                self.recompute_streak_state(user_id)
+                return
+            run, longest, last = state
+            if day == last:
+                return
+            run = run + 1 if (day - last).days == 1 else 1
+            self._streaks[user_id] = (run, max(run, longest), day)
+
+    def compute_streaks(self, user_id):
+        with self._lock:
+            state = self._streaks.get(user_id)
+        run, longest, last = state if state is not None else self.recompute_streak_state(user_id)
+        return streak_metrics(run, longest, last, datetime.now().date())
@@ -0,0 +1,171 @@
+# opt-in instrumentation: per-query and per-page latency histograms, queries per script run, and a
+# slow-query log carrying each offender's EXPLAIN QUERY PLAN. A Store built with metrics=Metrics()
+# times every statement its pool's connections run; the app times each page branch. Everything is
+# kept in memory and can be rendered as Prometheus-style text (to_text / dump).
+import functools
+import os
+import re
+import sqlite3
+import threading
+from collections import deque
+from datetime import datetime
+from time import monotonic, perf_counter
+
+# histogram bucket upper bounds in ms; the last bucket is +Inf
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# bounds for families whose observations are counts rather than milliseconds
+BUCKETS_COUNT = (1, 2, 5, 10, 20, 50, 100)
+FAMILY_BUCKETS = {"queries_per_run": BUCKETS_COUNT}
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    # one label per statement shape: whitespace collapsed, IN (?, ?, ...) lists and archive aliases folded
+    sql = " ".join(sql.split())
+    sql = re.sub(r"\?(?:\s*,\s*\?)+", "?, ...", sql)
+    return re.sub(r"\barchive_\d{4}\b", "archive_YYYY", sql)
+
+class Histogram:
+    def __init__(self, bounds=BUCKETS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # upper bound of the bucket holding the q-th observation (max for the +Inf bucket)
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds + (self.max,), self.counts):
+            seen += n
+            if seen >= rank and n:
+                return round(min(bound, self.max), 3)
+        return round(self.max, 3)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "total": round(self.sum, 2),
+            "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 3),
+        }
+
+class PageRun:
+    # one script run of one page; finish() is idempotent so an early st.rerun() and the end of the
+    # script can both call it
+    def __init__(self, metrics, page):
+        self.metrics = metrics
+        self.page = page
+        self.start = perf_counter()
+        self.done = False
+
+    def finish(self):
+        if not self.done:
+            self.done = True
+            self.metrics.finish_run(self)
+
+class Metrics:
+    # families: "query" (label: normalized SQL), "page" (label: page name), "queries_per_run" (label:
+    # page name; observations are counts, not ms). Queries are counted per thread, which is per
+    # session while Streamlit runs its script; writes made by the group-commit thread are not counted.
+    def __init__(self, slow_query_ms=50, slow_log_size=100, dump_path=None, dump_every_seconds=10):
+        self.slow_query_ms = slow_query_ms
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self.dump_path = dump_path
+        self.dump_every = dump_every_seconds
+        self._next_dump = 0.0
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, family, label, value):
+        with self._lock:
+            hist = self._histograms.get((family, label))
+            if hist is None:
+                hist = self._histograms[(family, label)] = Histogram(FAMILY_BUCKETS.get(family, BUCKETS_MS))
+            hist.observe(value)
+
+    def record_query(self, conn, sql, parameters, seconds):
+        # called by db.TracedConnection after every statement, failed ones included
+        ms = seconds * 1000
+        self.observe("query", normalize_sql(sql), ms)
+        self._local.queries = getattr(self._local, "queries", 0) + 1
+        if ms >= self.slow_query_ms:
+            self.slow_queries.append({
+                "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "ms": round(ms, 2),
+                "sql": " ".join(sql.split()),
+                "plan": self.explain(conn, sql, parameters),
+            })
+
+    def explain(self, conn, sql, parameters):
+        # bypasses the traced execute so the EXPLAIN is neither timed nor counted
+        try:
+            rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+        except sqlite3.Error as e:
+            return f"(no plan: {e})"
+        return "\n".join(f"{r[0]} {r[1]} {r[3]}" for r in rows) or "(no plan)"
+
+    def page_run(self, page):
+        self._local.queries = 0
+        return PageRun(self, page)
+
+    def finish_run(self, run):
+        self.observe("page", run.page, (perf_counter() - run.start) * 1000)
+        self.observe("queries_per_run", run.page, getattr(self._local, "queries", 0))
+        if self.dump_path and monotonic() >= self._next_dump:
+            self._next_dump = monotonic() + self.dump_every
+            self.dump(self.dump_path)
+
+    def summaries(self, family):
+        # {label: histogram summary}, largest total first
+        with self._lock:
+            items = [(label, h.summary()) for (f, label), h in self._histograms.items() if f == family]
+        return dict(sorted(items, key=lambda item: -item[1]["total"]))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self.slow_queries.clear()
+
+    def to_text(self):
+        # Prometheus text exposition; the slow-query log follows as comment lines
+        lines = []
+        with self._lock:
+            families = sorted({f for f, _ in self._histograms})
+            for family in families:
+                name = f"waterbuddy_{family}" + ("" if family == "queries_per_run" else "_ms")
+                label_name = "query" if family == "query" else "page"
+                lines.append(f"# TYPE {name} histogram")
+                for (f, label), h in sorted(self._histograms.items()):
+                    if f != family:
+                        continue
+                    label = label.replace("\\", "\\\\").replace('"', '\\"')
+                    cumulative = 0
+                    for bound, n in zip(h.bounds + ("+Inf",), h.counts):
+                        cumulative += n
+                        lines.append(f'{name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{{label_name}="{label}"}} {round(h.sum, 3)}')
+                    lines.append(f'{name}_count{{{label_name}="{label}"}} {h.count}')
+        for entry in list(self.slow_queries):
+            lines.append(f"# slow query {entry['at']} {entry['ms']} ms: {entry['sql']}")
+            lines.extend(f"#   {line}" for line in entry["plan"].splitlines())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        # write-then-rename so a scraper never reads a half-written file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.to_text())
+        os.replace(tmp, path)
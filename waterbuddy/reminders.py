@@ -0,0 +1,137 @@
+# background hydration reminders. Each enabled user has one entry in a min-heap keyed on their next
+# due time, so firing or rescheduling a reminder is O(log n) however many users there are; settings
+# changes push a fresh entry and stale ones are skipped when they surface (lazy deletion).
+import heapq
+import threading
+from datetime import datetime, time, timedelta
+
+# reminders run from each user's start time until this cutoff (the Settings page promises 10 PM)
+CUTOFF = time(22, 0)
+
+def next_due(after, minutes, start_hhmm, cutoff=CUTOFF):
+    # first slot start, start + minutes, ... (up to cutoff, inclusive) strictly after `after`;
+    # None when the window is empty
+    start = time.fromisoformat(start_hhmm)
+    if start > cutoff or minutes <= 0:
+        return None
+    day = after.date()
+    while True:
+        first = datetime.combine(day, start)
+        if after < first:
+            return first
+        slot = first + timedelta(minutes=minutes) * ((after - first) // timedelta(minutes=minutes) + 1)
+        if slot <= datetime.combine(day, cutoff):
+            return slot
+        day += timedelta(days=1)
+
+class ReminderInbox:
+    # local delivery sink: keeps each user's latest undelivered reminder until their session takes it
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.delivered = 0
+
+    def __call__(self, user_id, due):
+        with self._lock:
+            self._pending[user_id] = due
+            self.delivered += 1
+
+    def take(self, user_id):
+        with self._lock:
+            return self._pending.pop(user_id, None)
+
+class ReminderScheduler:
+    def __init__(self, sink, clock=datetime.now):
+        self.sink = sink
+        self.clock = clock
+        self._heap = []
+        # user_id -> (version, minutes, start_hhmm); a heap entry is live only if its version matches
+        self._users = {}
+        self._version = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._users)
+
+    def load(self, rows):
+        # rows: (user_id, minutes, start_hhmm) for every enabled user; one heapify instead of n pushes
+        now = self.clock()
+        with self._cond:
+            self._users.clear()
+            self._heap = []
+            for user_id, minutes, start_hhmm in rows:
+                due = next_due(now, minutes, start_hhmm)
+                if due is not None:
+                    self._version += 1
+                    self._users[user_id] = (self._version, minutes, start_hhmm)
+                    self._heap.append((due, self._version, user_id))
+            heapq.heapify(self._heap)
+            self._cond.notify()
+
+    def update(self, user_id, enabled, minutes, start_hhmm):
+        with self._cond:
+            due = next_due(self.clock(), minutes, start_hhmm) if enabled else None
+            if due is None:
+                self._users.pop(user_id, None)
+            else:
+                self._version += 1
+                self._users[user_id] = (self._version, minutes, start_hhmm)
+                heapq.heappush(self._heap, (due, self._version, user_id))
+            self._compact()
+            self._cond.notify()
+
+    def remove(self, user_id):
+        self.update(user_id, False, 0, "00:00")
+
+    def next_fire(self):
+        with self._cond:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self, now=None):
+        # deliver every reminder due by now and schedule each user's next one; a user whose reminders
+        # were missed (process asleep) gets one delivery, not a burst
+        now = now or self.clock()
+        fired = []
+        with self._cond:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due, version, user_id = self._heap[0]
+                _, minutes, start_hhmm = self._users[user_id]
+                nxt = next_due(now, minutes, start_hhmm)
+                heapq.heapreplace(self._heap, (nxt, version, user_id))
+                fired.append((user_id, due))
+        for user_id, due in fired:
+            self.sink(user_id, due)
+        return len(fired)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._drop_stale()
+                wait = (self._heap[0][0] - self.clock()).total_seconds() if self._heap else None
+                if wait is None or wait > 0:
+                    # woken early by update()/load() when the head may have changed
+                    self._cond.wait(timeout=wait)
+                    continue
+            self.run_pending()
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._users.get(heap[0][2], (None,))[0] != heap[0][1]:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        # settings churn leaves stale entries behind; rebuild once they outnumber live ones
+        if len(self._heap) > 2 * len(self._users) + 64:
+            self._heap = [e for e in self._heap if self._users.get(e[2], (None,))[0] == e[1]]
+            heapq.heapify(self._heap)
@@ -0,0 +1,392 @@
+# Sharded storage: users hash-partitioned across N database files, each a full Store with its own
+# single-writer lock, so log writes for users on different shards commit in parallel. The base path
+# holds only the directory (username -> user id, and the shard count); shard i is <root>.shard-i<ext>.
+# ShardedStore routes every per-user helper to the user's shard and fans cross-shard work (admin counts,
+# leaderboards, bulk import / export, batch jobs) out to all shards at once.
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from itertools import chain, islice
+from time import monotonic
+
+from .archive import ARCHIVE_HORIZON_DAYS
+from .backend import StorageBackend
+from .cache import ReadCache
+from .db import ConnectionPool
+from .leaderboard import PeriodBoard
+from .memory import MemoryStore
+from .reminders import ReminderInbox, ReminderScheduler
+from .store import LEADERBOARD_PERIODS, Store, period_start
+
+DIRECTORY_SCHEMA = [
+    # ids are allocated here so they are unique across shards; the full user row lives on the shard
+    "CREATE TABLE IF NOT EXISTS shard_users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT UNIQUE NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS shard_config (name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+]
+
+def shard_path(db_path, index):
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.shard-{index}{ext or '.db'}"
+
+def shard_index(user_id, shards):
+    # sequential ids spread evenly; changing the shard count would move users, so init_db pins it
+    return user_id % shards
+
+def routed(name):
+    # a Store method whose first argument is a user id, run on that user's shard
+    def method(self, user_id, *args, **kwargs):
+        return getattr(self.shard_for(user_id), name)(user_id, *args, **kwargs)
+    method.__name__ = name
+    return method
+
+class ShardedStore(StorageBackend):
+    def __init__(self, path, shards, group_commit_ms=None, cache=None, metrics=None):
+        # one read cache for every shard: keys are user ids and usernames, both unique across shards
+        self.path = path
+        self.metrics = metrics
+        self.cache = cache if cache is not None else ReadCache()
+        self.directory = ConnectionPool(path, metrics=metrics)
+        self.shards = [
+            Store(shard_path(path, i), group_commit_ms=group_commit_ms, cache=self.cache, metrics=metrics)
+            for i in range(shards)
+        ]
+        self.group_commit_ms = group_commit_ms
+        self._fan_out_pool = ThreadPoolExecutor(max_workers=shards, thread_name_prefix="shard-fan-out")
+        # username -> user id; ids never change, so entries only go away when the user is deleted
+        self._user_ids = {}
+        self._user_ids_lock = threading.Lock()
+        # (period, period start iso) -> PeriodBoard merged from every shard's board; dropped by writes
+        # and versioned like a Store's
+        self._boards = {}
+        self._boards_lock = threading.Lock()
+        self._boards_version = 0
+        self.reminders = None
+
+    def shard_for(self, user_id):
+        return self.shards[shard_index(user_id, len(self.shards))]
+
+    def fan_out(self, name, *args, **kwargs):
+        # run the same Store method on every shard in parallel; results in shard order
+        return list(self._fan_out_pool.map(lambda shard: getattr(shard, name)(*args, **kwargs), self.shards))
+
+    def init_db(self):
+        with self.directory.writer() as conn:
+            # a single-file database: sharding it would hide every existing user behind an empty directory
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone():
+                raise ValueError(f"{self.path} is a single-file database; open it without sharding")
+            for statement in DIRECTORY_SCHEMA:
+                conn.execute(statement)
+            conn.execute("INSERT OR IGNORE INTO shard_config (name, value) VALUES ('shards', ?)", (len(self.shards),))
+            created = conn.execute("SELECT value FROM shard_config WHERE name = 'shards'").fetchone()[0]
+        if created != len(self.shards):
+            raise ValueError(f"{self.path} was created with {created} shards, not {len(self.shards)}")
+        self.fan_out("init_db")
+
+    def start_reminders(self, sink=None):
+        # one scheduler for every shard, loaded from all of them; each shard's update_settings and
+        # delete_all_user_data keep it current as they would their own
+        if self.reminders is None:
+            scheduler = ReminderScheduler(sink or ReminderInbox())
+            scheduler.load(self.reminder_settings())
+            self.reminders = scheduler.start()
+            for shard in self.shards:
+                shard.reminders = self.reminders
+        return self.reminders
+
+    def start_compaction(self, every_seconds=3600, horizon_days=ARCHIVE_HORIZON_DAYS):
+        return [shard.start_compaction(every_seconds, horizon_days) for shard in self.shards]
+
+    def start_challenge_sweep(self):
+        return [shard.start_challenge_sweep() for shard in self.shards]
+
+    # ---------- USERS ----------
+    def user_id_for(self, username):
+        # directory lookup, remembered per process; None for an unknown username
+        user_id = self._user_ids.get(username)
+        if user_id is None:
+            with self.directory.reader() as conn:
+                r = conn.execute("SELECT id FROM shard_users WHERE username = ?", (username,)).fetchone()
+            if r is None:
+                return None
+            with self._user_ids_lock:
+                user_id = self._user_ids[username] = r["id"]
+        return user_id
+
+    def create_user(self, username, password, age=None, weight=None, daily_goal_ml=2000, user_id=None):
+        # reserve the name and id in the directory, then create the user on its shard
+        try:
+            with self.directory.writer() as conn:
+                user_id = conn.execute("INSERT INTO shard_users (id, username) VALUES (?, ?)", (user_id, username)).lastrowid
+        except sqlite3.IntegrityError:
+            return None
+        if self.shard_for(user_id).create_user(username, password, age, weight, daily_goal_ml, user_id=user_id) is None:
+            with self.directory.writer() as conn:
+                conn.execute("DELETE FROM shard_users WHERE id = ?", (user_id,))
+            return None
+        return user_id
+
+    def get_user_by_username(self, username):
+        user_id = self.user_id_for(username)
+        return None if user_id is None else self.shard_for(user_id).get_user_by_username(username)
+
+    def check_login(self, username, password):
+        user_id = self.user_id_for(username)
+        return None if user_id is None else self.shard_for(user_id).check_login(username, password)
+
+    def get_usernames(self, user_ids):
+        by_shard = {}
+        for user_id in user_ids:
+            by_shard.setdefault(shard_index(user_id, len(self.shards)), []).append(user_id)
+        names = {}
+        for part in self._fan_out_pool.map(lambda item: self.shards[item[0]].get_usernames(item[1]), by_shard.items()):
+            names.update(part)
+        return names
+
+    def counts(self):
+        totals = {}
+        for counts in self.fan_out("counts"):
+            for name, value in counts.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    get_username = routed("get_username")
+    update_user_profile = routed("update_user_profile")
+
+    # ---------- WATER LOGS ----------
+    def log_water(self, user_id, amount_ml, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.shard_for(user_id).log_water(user_id, amount_ml, timestamp)
+        self._drop_boards(date.fromisoformat(timestamp[:10]))
+
+    def write_log(self, user_id, amount_ml, timestamp):
+        self.shard_for(user_id).write_log(user_id, amount_ml, timestamp)
+        self._drop_boards(date.fromisoformat(timestamp[:10]))
+
+    def delete_logs_between(self, user_id, start_ts, end_ts):
+        self.shard_for(user_id).delete_logs_between(user_id, start_ts, end_ts)
+        self._drop_boards()
+
+    sum_logs_between = routed("sum_logs_between")
+    get_logs_between = routed("get_logs_between")
+    get_logs_for_date = routed("get_logs_for_date")
+    get_today_total = routed("get_today_total")
+    get_history = routed("get_history")
+    get_analytics = routed("get_analytics")
+    get_7day_history = routed("get_7day_history")
+    clear_today_logs = Store.clear_today_logs
+    refresh_daily_totals = routed("refresh_daily_totals")
+
+    def rebuild_daily_totals(self, user_id=None):
+        if user_id is None:
+            self.fan_out("rebuild_daily_totals")
+        else:
+            self.shard_for(user_id).rebuild_daily_totals(user_id)
+        self._drop_boards()
+
+    def rebuild_leaderboards(self, user_id=None):
+        if user_id is None:
+            self.fan_out("rebuild_leaderboards")
+        else:
+            self.shard_for(user_id).rebuild_leaderboards(user_id)
+        self._drop_boards()
+
+    # ---------- BULK IMPORT / EXPORT ----------
+    def import_logs(self, rows, batch_size=5000):
+        # rows are routed to their shard as they are read and every shard imports its share at the same
+        # time, each through Store.import_logs; usernames are resolved here, against the directory.
+        # The importers get their own threads so a long import leaves the fan-out pool free.
+        start = monotonic()
+        feeds = [queue.Queue(maxsize=4) for _ in self.shards]
+        importers = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard-import")
+        futures = [
+            importers.submit(shard.import_logs, chain.from_iterable(iter(feed.get, None)), batch_size)
+            for shard, feed in zip(self.shards, feeds)
+        ]
+        pending = [[] for _ in self.shards]
+        try:
+            for row in rows:
+                user_id = row.get("user_id") or self.user_id_for(row.get("username"))
+                if user_id is None:
+                    raise ValueError(f"Unknown user: {row.get('username')!r}")
+                i = shard_index(user_id, len(self.shards))
+                pending[i].append(dict(row, user_id=user_id))
+                if len(pending[i]) >= batch_size:
+                    self._feed(feeds[i], futures[i], pending[i])
+                    pending[i] = []
+            for i, feed in enumerate(feeds):
+                if pending[i]:
+                    self._feed(feed, futures[i], pending[i])
+        finally:
+            # end every shard's input, even after an error, so no import is left waiting
+            for feed, future in zip(feeds, futures):
+                self._feed(feed, future, None)
+            importers.shutdown()
+            self._drop_boards()
+        stats = [future.result() for future in futures]
+        seconds = monotonic() - start
+        count = sum(s["rows"] for s in stats)
+        return {
+            "rows": count,
+            "users": sum(s["users"] for s in stats),
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(count / seconds) if seconds else count,
+        }
+
+    def _feed(self, feed, future, item):
+        # put, unless the shard's import has already stopped (it raised; result() reports why)
+        while not future.done():
+            try:
+                feed.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def export_logs(self, user_id=None, start_ts=None, end_ts=None, chunk_size=1000):
+        # one user's logs come from their shard alone. Everyone's are read from all shards at once, each
+        # in its own thread, and yielded chunk by chunk as they arrive: rows stay in (user_id, ts) order
+        # within a shard's table, but shards interleave.
+        if user_id is not None:
+            yield from self.shard_for(user_id).export_logs(user_id, start_ts, end_ts, chunk_size)
+            return
+        chunks = queue.Queue(maxsize=2 * len(self.shards))
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def read(shard):
+            # dedicated threads rather than the fan-out pool: a reader blocked on a full queue must not
+            # hold a worker that another fan-out, run while this export is consumed, is waiting for
+            try:
+                rows = shard.export_logs(None, start_ts, end_ts, chunk_size)
+                try:
+                    for chunk in iter(lambda: list(islice(rows, chunk_size)), []):
+                        if not put(chunk):
+                            return
+                finally:
+                    rows.close()
+                put(None)
+            except Exception as e:
+                put(e)
+
+        readers = [threading.Thread(target=read, args=(shard,), name="shard-export", daemon=True) for shard in self.shards]
+        for reader in readers:
+            reader.start()
+        try:
+            remaining = len(readers)
+            while remaining:
+                chunk = chunks.get()
+                if chunk is None:
+                    remaining -= 1
+                elif isinstance(chunk, Exception):
+                    raise chunk
+                else:
+                    yield from chunk
+        finally:
+            stop.set()
+
+    # ---------- ARCHIVE / COMPACTION ----------
+    def archive_logs(self, horizon_days=ARCHIVE_HORIZON_DAYS, batch_users=1000):
+        start = monotonic()
+        stats = self.fan_out("archive_logs", horizon_days, batch_users)
+        return {
+            "rows": sum(s["rows"] for s in stats),
+            "years": sorted({year for s in stats for year in s["years"]}),
+            "seconds": round(monotonic() - start, 3),
+        }
+
+    def compact(self, max_pages=None):
+        return sum(self.fan_out("compact", max_pages))
+
+    # ---------- LEADERBOARDS ----------
+    def leaderboard(self, period="week", day=None):
+        # every shard's board for the period, merged into one and cached like a Store's
+        if period not in LEADERBOARD_PERIODS:
+            raise ValueError(f"Unknown leaderboard period: {period}")
+        key = (period, period_start(day or date.today(), period).isoformat())
+        board = self._boards.get(key)
+        if board is None or board.expires < monotonic():
+            version = self._boards_version
+            boards = self.fan_out("leaderboard", period, day)
+            board = PeriodBoard(chain.from_iterable(b.top(len(b)) for b in boards))
+            with self._boards_lock:
+                if self._boards_version == version:
+                    self._boards[key] = board
+        return board
+
+    _drop_boards = Store._drop_boards
+
+    # ---------- BADGES ----------
+    get_badges = routed("get_badges")
+    get_earned_badges = routed("get_earned_badges")
+    award_badge = routed("award_badge")
+    evaluate_badges = routed("evaluate_badges")
+    award_badges_for_user = routed("award_badges_for_user")
+
+    def backfill_badges(self, rules=None):
+        return sum(self.fan_out("backfill_badges", rules))
+
+    # ---------- CHALLENGES ----------
+    add_challenge = routed("add_challenge")
+    get_challenges = routed("get_challenges")
+    mark_challenge_done = routed("mark_challenge_done")
+
+    def evaluate_challenges(self, user_id=None, today=None):
+        # challenge ids are per shard, so everyone's progress is keyed (shard index, challenge id)
+        if user_id is not None:
+            return self.shard_for(user_id).evaluate_challenges(user_id, today)
+        results = self.fan_out("evaluate_challenges", None, today)
+        return {
+            "completed": [c for r in results for c in r["completed"]],
+            "failed": [c for r in results for c in r["failed"]],
+            "progress": {(i, cid): met for i, r in enumerate(results) for cid, met in r["progress"].items()},
+        }
+
+    # ---------- SETTINGS ----------
+    get_settings = routed("get_settings")
+    update_settings = routed("update_settings")
+
+    def reminder_settings(self):
+        return list(chain.from_iterable(self.fan_out("reminder_settings")))
+
+    # ---------- DELETION ----------
+    def delete_all_user_data(self, user_id):
+        username = self.get_username(user_id)
+        self.shard_for(user_id).delete_all_user_data(user_id)
+        with self.directory.writer() as conn:
+            conn.execute("DELETE FROM shard_users WHERE id = ?", (user_id,))
+        with self._user_ids_lock:
+            self._user_ids.pop(username, None)
+        self._drop_boards()
+
+    # ---------- STREAKS ----------
+    recompute_streak_state = routed("recompute_streak_state")
+    advance_streak = routed("advance_streak")
+    compute_streaks = routed("compute_streaks")
+
+# storage backends open_store can build; every one implements backend.StorageBackend
+BACKENDS = ("sqlite", "memory")
+
+def open_store(path, shards=None, backend=None, **kwargs):
+    # a Store on one file, with shards > 1 a ShardedStore over that many, or for backend "memory" a
+    # MemoryStore that keeps everything in this process (path is unused); kwargs go to any of them
+    backend = backend or "sqlite"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    if backend == "memory":
+        if shards and int(shards) > 1:
+            raise ValueError("sharding needs the sqlite backend")
+        return MemoryStore(path, **kwargs)
+    if shards and int(shards) > 1:
+        return ShardedStore(path, int(shards), **kwargs)
+    return Store(path, **kwargs)
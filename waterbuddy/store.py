@@ -0,0 +1,1128 @@
+# WaterBuddy storage layer: schema, users, logs, history, streaks, badges, challenges and
+# settings. A Store owns its connection pool, read cache and badge cache, so the Streamlit app,
+# batch jobs, benchmarks and worker processes can each open one without importing the UI.
+import functools
+import sqlite3
+import threading
+from contextlib import nullcontext
+from datetime import datetime, timedelta, date
+from itertools import groupby
+from time import monotonic, sleep
+
+from .archive import (
+    ARCHIVE_HORIZON_DAYS,
+    ARCHIVE_SCHEMA,
+    MAX_ATTACHED_ARCHIVES,
+    archive_alias,
+    archive_path,
+    logs_source,
+    year_bounds,
+    year_of,
+)
+from .backend import StorageBackend
+from .cache import ReadCache
+from .db import ConnectionPool, GroupCommitWriter, attached
+from .leaderboard import PeriodBoard
+
+# ---------- UTILITY ----------
+def today_str():
+    return date.today().isoformat()
+
+def day_range(start_iso, end_iso=None):
+    # half-open [start 00:00:00, day after end 00:00:00) timestamp bounds
+    end_iso = end_iso or start_iso
+    end_next = date.fromisoformat(end_iso) + timedelta(days=1)
+    return f"{start_iso} 00:00:00", f"{end_next.isoformat()} 00:00:00"
+
+# water_logs.ts is local wall-clock time as whole seconds since 1970-01-01 00:00:00 with no timezone
+# shift, so ts // 86400 is the local day number and SQLite's date(ts, 'unixepoch') is the same day.
+# Helpers take and return "YYYY-MM-DD HH:MM:SS" strings; conversion happens only here, at the edge.
+EPOCH = datetime(1970, 1, 1)
+
+def to_ts(timestamp):
+    return int((datetime.fromisoformat(timestamp) - EPOCH).total_seconds())
+
+def from_ts(ts):
+    return EPOCH + timedelta(seconds=ts)
+
+def format_ts(ts):
+    return from_ts(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+# history: one GROUP BY over daily_totals per call, bucketed by day / week (Monday start) / month
+HISTORY_BUCKETS = {
+    "day": "day",
+    "week": "date(day, 'weekday 0', '-6 days')",
+    "month": "substr(day, 1, 7) || '-01'",
+}
+
+def period_start(d, granularity="day"):
+    if granularity == "week":
+        return d - timedelta(days=d.weekday())
+    if granularity == "month":
+        return d.replace(day=1)
+    return d
+
+def next_period(d, granularity="day"):
+    if granularity == "week":
+        return d + timedelta(days=7)
+    if granularity == "month":
+        return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return d + timedelta(days=1)
+
+def streak_state_from_days(days):
+    # days: ascending distinct active dates -> (run ending at last day, longest run, last day)
+    run = longest = 0
+    prev = None
+    for d in days:
+        run = run + 1 if prev is not None and (d - prev).days == 1 else 1
+        longest = max(longest, run)
+        prev = d
+    return run, longest, prev
+
+def streak_metrics(run, longest, last, today):
+    # the run only counts as current if it reaches today or yesterday
+    if last is None:
+        return {"current_streak": 0, "longest_streak": 0}
+    return {"current_streak": run if (today - last).days in (0, 1) else 0, "longest_streak": longest}
+
+# daily_totals is a rollup of water_logs per (user, day); the write helpers keep it in sync.
+# source is water_logs, an attached archive's table, or archive.logs_source() over both.
+ROLLUP_SELECT = """
+    SELECT user_id, date(ts, 'unixepoch') as day, SUM(amount_ml), COUNT(*)
+    FROM {source} WHERE {where} GROUP BY user_id, day
+"""
+ROLLUP_UPSERT = (
+    "INSERT INTO daily_totals (user_id, day, total_ml, entry_count) {select} "
+    "ON CONFLICT(user_id, day) DO UPDATE SET total_ml = total_ml + excluded.total_ml, "
+    "entry_count = entry_count + excluded.entry_count"
+)
+
+# seq numbers logs that share a second, keeping (user_id, ts, seq) unique for the clustered key
+INSERT_LOG = """
+    INSERT INTO water_logs (user_id, ts, seq, amount_ml) VALUES (?1, ?2,
+        (SELECT COALESCE(MAX(seq) + 1, 0) FROM water_logs WHERE user_id = ?1 AND ts = ?2), ?3)
+"""
+
+# leaderboards rank users by total intake per calendar week / month; the leaderboard table holds one
+# row per (period, period start, user), kept in step with daily_totals by the write helpers
+LEADERBOARD_PERIODS = ("week", "month")
+LEADERBOARD_SELECT = """
+    SELECT '{period}', {bucket} as period_start, user_id, SUM(total_ml)
+    FROM daily_totals WHERE {where} GROUP BY period_start, user_id
+"""
+LEADERBOARD_UPSERT = (
+    "INSERT INTO leaderboard (period, period_start, user_id, total_ml) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(period, period_start, user_id) DO UPDATE SET total_ml = total_ml + excluded.total_ml"
+)
+
+# cached reads that change whenever the user's logs do
+LOG_QUERIES = ("today_total", "history", "logs", "streaks", "analytics")
+
+# badge rules: each badge declares the events that can change it, the metric it reads and its threshold
+BADGE_RULES = [
+    {"name": "💧 First Sip!", "events": ("log",), "metric": "total_drinks", "threshold": 1},
+    {"name": "🌱 3-Day Streak", "events": ("log",), "metric": "current_streak", "threshold": 3},
+    {"name": "🌈 Hydration Hero (1 Week)", "events": ("log",), "metric": "current_streak", "threshold": 7},
+    {"name": "🏆 Aqua Master (1 Month)", "events": ("log",), "metric": "current_streak", "threshold": 30},
+    {"name": "👑 Consistency King", "events": ("log",), "metric": "longest_streak", "threshold": 7},
+]
+
+# metric name -> Store method returning {user_id: {metric: value}}
+BADGE_METRIC_SOURCES = {
+    "total_drinks": "badge_metric_total_drinks",
+    "current_streak": "badge_metric_streaks",
+    "longest_streak": "badge_metric_streaks",
+}
+
+# challenges.done: 0 while running, then settled by evaluate_challenges (or the manual mark_challenge_done)
+CHALLENGE_ACTIVE, CHALLENGE_COMPLETED, CHALLENGE_FAILED = 0, 1, -1
+
+# per active challenge: days in its window whose total met the goal, overall and before today. Each
+# challenge is one seek plus a scan of at most `days` rows of daily_totals' (user_id, day) key, so the
+# cost follows the number of active challenges, not the number of logs. INDEXED BY keeps the sweep over
+# everyone on the partial index of running challenges instead of a scan of every challenge ever made.
+CHALLENGE_PROGRESS = """
+    SELECT c.id, c.user_id, c.name, c.days, c.start,
+        COUNT(d.day) as met, COALESCE(SUM(d.day < :today), 0) as met_before_today
+    FROM challenges c INDEXED BY idx_challenges_active
+    LEFT JOIN daily_totals d ON d.user_id = c.user_id AND d.day >= c.start
+        AND d.day <= date(c.start, '+' || (c.days - 1) || ' days') AND d.total_ml >= c.goal * 1000
+    WHERE c.done = 0 AND {where}
+    GROUP BY c.id
+"""
+
+def cached_read(query, per_day=False):
+    # cache a Store read whose first argument is its owner (user id or username);
+    # per_day adds today's date to the key for results that depend on it
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(self, owner, *args, **kwargs):
+            key_args = args + tuple(sorted(kwargs.items())) + ((today_str(),) if per_day else ())
+            return self.cache.get(owner, query, key_args, lambda: fn(self, owner, *args, **kwargs))
+        return wrapper
+    return decorate
+
+class Store(StorageBackend):
+    # e.g. another process held the write lock past busy_timeout
+    transient_errors = (sqlite3.OperationalError,)
+
+    def __init__(self, path, group_commit_ms=None, cache=None, metrics=None):
+        # group_commit_ms: None writes each log in its own transaction; a number routes
+        # log_water through a GroupCommitWriter lingering up to that many ms per burst.
+        # metrics: a metrics.Metrics to time every SQL statement into (None: no instrumentation)
+        self.path = path
+        self.pool = ConnectionPool(path, metrics=metrics)
+        self.metrics = metrics
+        self.cache = cache if cache is not None else ReadCache()
+        self.group_commit_ms = group_commit_ms
+        self._group_writer = None
+        # user_id -> set of earned badge names
+        self._earned = {}
+        # ReminderScheduler once start_reminders() has run
+        self.reminders = None
+        # (period, period start iso) -> PeriodBoard, loaded on first query and dropped by any write that
+        # changes it; the version lets a load that raced such a write skip caching what it read
+        self._boards = {}
+        self._boards_lock = threading.Lock()
+        self._boards_version = 0
+        # archive / incremental-vacuum thread once start_compaction() has run
+        self._compaction = None
+        # day-rollover challenge sweep thread once start_challenge_sweep() has run
+        self._challenge_sweep = None
+
+    @property
+    def group_writer(self):
+        if self._group_writer is None:
+            self._group_writer = GroupCommitWriter(self.pool, int(self.group_commit_ms or 0))
+        return self._group_writer
+
+    def reminder_settings(self):
+        # (user_id, minutes, start time) of every user with reminders on, as ReminderScheduler.load takes them
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                "SELECT user_id, reminder_minutes, reminder_start_time FROM settings WHERE reminder_enabled = 1"
+            ).fetchall()
+        return [tuple(r) for r in rows]
+
+    # ---------- SCHEMA ----------
+    def init_db(self):
+        # new files get auto_vacuum = INCREMENTAL from the pool; a file created before that needs one
+        # full VACUUM to switch over, after which compact() can hand free pages back incrementally
+        with self.pool.maintenance() as conn:
+            convert = conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2
+            # a sharded store's directory file: its users live on the shard files, so creating the
+            # single-file schema here would quietly start an empty second database
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'shard_config'").fetchone():
+                raise ValueError(f"{self.path} is the directory of a sharded database; open it with its shard count")
+        with self.pool.writer() as conn:
+            cur = conn.cursor()
+            # users
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT UNIQUE NOT NULL,
+                password TEXT NOT NULL,
+                age INTEGER,
+                weight REAL,
+                daily_goal_ml INTEGER DEFAULT 2000,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+            # water logs, clustered on (user_id, ts): a user's range scan reads adjacent pages and
+            # needs no separate index
+            legacy = any(c["name"] == "timestamp" for c in cur.execute("PRAGMA table_info(water_logs)").fetchall())
+            cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {'water_logs_compact' if legacy else 'water_logs'} (
+                user_id INTEGER NOT NULL,
+                ts INTEGER NOT NULL,
+                seq INTEGER NOT NULL DEFAULT 0,
+                amount_ml INTEGER NOT NULL,
+                PRIMARY KEY (user_id, ts, seq),
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            ) WITHOUT ROWID;
+            """)
+            if legacy:
+                # one-time migration from the TEXT-timestamp rowid table
+                cur.execute("""
+                INSERT INTO water_logs_compact (user_id, ts, seq, amount_ml)
+                SELECT user_id, ts, ROW_NUMBER() OVER (PARTITION BY user_id, ts ORDER BY id) - 1, amount_ml
+                FROM (SELECT id, user_id, amount_ml, CAST(strftime('%s', timestamp) AS INTEGER) as ts FROM water_logs)
+                """)
+                cur.execute("DROP TABLE water_logs")
+                cur.execute("ALTER TABLE water_logs_compact RENAME TO water_logs")
+            # daily rollup; backfilled from water_logs the first time it is created
+            has_rollup = cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_totals'").fetchone()
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS daily_totals (
+                user_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                total_ml INTEGER NOT NULL DEFAULT 0,
+                entry_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (user_id, day),
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            );
+            """)
+            # per-user streak state: current_run is the run of active days ending at last_day
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS streaks (
+                user_id INTEGER PRIMARY KEY,
+                current_run INTEGER NOT NULL DEFAULT 0,
+                longest_streak INTEGER NOT NULL DEFAULT 0,
+                last_day TEXT,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            );
+            """)
+            # badges
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS badges (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                earned_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, name),
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            );
+            """)
+            # challenges
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS challenges (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                name TEXT,
+                days INTEGER,
+                goal REAL,
+                start TEXT,
+                done INTEGER DEFAULT 0,
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            );
+            """)
+            # only running challenges are ever evaluated; settled ones drop out of this index
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_challenges_active ON challenges (user_id) WHERE done = 0")
+            # get_challenges lists settled ones too, which the partial index cannot serve
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_challenges_user ON challenges (user_id)")
+            # per-period totals behind the leaderboards; backfilled from the rollup when first created
+            has_leaderboard = cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard'").fetchone()
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS leaderboard (
+                period TEXT NOT NULL,
+                period_start TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                total_ml INTEGER NOT NULL,
+                PRIMARY KEY (period, period_start, user_id),
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            ) WITHOUT ROWID;
+            """)
+            # settings
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                user_id INTEGER PRIMARY KEY,
+                reminder_enabled INTEGER DEFAULT 0,
+                reminder_minutes INTEGER DEFAULT 120,
+                reminder_start_time TEXT DEFAULT '09:00',
+                FOREIGN KEY(user_id) REFERENCES users(id)
+            );
+            """)
+            # years whose old logs have been moved to an archive file (see archive.py)
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS archives (
+                year INTEGER PRIMARY KEY,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+        if legacy or convert:
+            # hand the old table's pages back to the filesystem / switch on incremental auto-vacuum
+            with self.pool.maintenance() as conn:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.execute("VACUUM")
+        if not has_rollup:
+            self.rebuild_daily_totals()
+        elif not has_leaderboard:
+            self.rebuild_leaderboards()
+
+    def refresh_daily_totals(self, user_id, start_day, end_day):
+        # recompute rollup rows for [start_day, end_day] from raw logs, archived ones included; joins the
+        # caller's transaction, which must then already have those archives attached
+        start_ts, end_ts = map(to_ts, day_range(start_day, end_day))
+        archives = self._archives(start_ts, end_ts)
+        with self.pool.writer(archives) as conn:
+            conn.execute("DELETE FROM daily_totals WHERE user_id = ? AND day >= ? AND day <= ?", (user_id, start_day, end_day))
+            conn.execute(
+                "INSERT INTO daily_totals (user_id, day, total_ml, entry_count) "
+                + ROLLUP_SELECT.format(source=logs_source(archives), where="user_id = ? AND ts >= ? AND ts < ?"),
+                (user_id, start_ts, end_ts)
+            )
+            self.refresh_leaderboard(user_id, start_day, end_day)
+
+    def rebuild_daily_totals(self, user_id=None):
+        # one-shot backfill / repair of the rollup for one user or the whole database
+        # streak state is derived from the rollup, so drop it and let compute_streaks rebuild lazily
+        # leaderboards are derived from the rollup too and are rebuilt with it
+        where, args = ("1", ()) if user_id is None else ("user_id = ?", (user_id,))
+        with self.pool.writer() as conn:
+            if user_id is None:
+                conn.execute("DELETE FROM daily_totals")
+                conn.execute("DELETE FROM streaks")
+            else:
+                self._delete_leaderboard_rows(conn, user_id)
+                conn.execute("DELETE FROM daily_totals WHERE user_id = ?", (user_id,))
+                conn.execute("DELETE FROM streaks WHERE user_id = ?", (user_id,))
+            conn.execute(
+                "INSERT INTO daily_totals (user_id, day, total_ml, entry_count) " + ROLLUP_SELECT.format(source="water_logs", where=where),
+                args
+            )
+        # then each archived year, one transaction apiece since each must be attached outside one
+        for table, attach in self._log_tables()[:-1]:
+            with self.pool.writer(attach) as conn:
+                conn.execute(ROLLUP_UPSERT.format(select=ROLLUP_SELECT.format(source=table, where=where)), args)
+        self.rebuild_leaderboards(user_id)
+        if user_id is None:
+            self.cache.clear()
+        else:
+            self.cache.invalidate(user_id, *LOG_QUERIES)
+
+    def rebuild_leaderboards(self, user_id=None):
+        # one GROUP BY pass over daily_totals per period; joins the caller's transaction
+        with self.pool.writer() as conn:
+            if user_id is None:
+                conn.execute("DELETE FROM leaderboard")
+            else:
+                self._delete_leaderboard_rows(conn, user_id)
+            for period in LEADERBOARD_PERIODS:
+                select = LEADERBOARD_SELECT.format(
+                    period=period, bucket=HISTORY_BUCKETS[period], where="1" if user_id is None else "user_id = ?"
+                )
+                conn.execute(
+                    "INSERT INTO leaderboard (period, period_start, user_id, total_ml) " + select,
+                    () if user_id is None else (user_id,)
+                )
+        self._drop_boards()
+
+    def refresh_leaderboard(self, user_id, start_day, end_day):
+        # recompute the user's rows for every period overlapping [start_day, end_day]; joins the caller's transaction
+        with self.pool.writer() as conn:
+            for period in LEADERBOARD_PERIODS:
+                first = period_start(date.fromisoformat(start_day), period)
+                last = next_period(period_start(date.fromisoformat(end_day), period), period)
+                starts = []
+                p = first
+                while p < last:
+                    starts.append((period, p.isoformat(), user_id))
+                    p = next_period(p, period)
+                conn.executemany("DELETE FROM leaderboard WHERE period = ? AND period_start = ? AND user_id = ?", starts)
+                conn.execute(
+                    "INSERT INTO leaderboard (period, period_start, user_id, total_ml) "
+                    + LEADERBOARD_SELECT.format(period=period, bucket=HISTORY_BUCKETS[period], where="user_id = ? AND day >= ? AND day < ?"),
+                    (user_id, first.isoformat(), last.isoformat())
+                )
+
+    def _delete_leaderboard_rows(self, conn, user_id):
+        # point deletes for the periods the user's rollup covers (the table's key leads with period, not user)
+        for period in LEADERBOARD_PERIODS:
+            conn.execute(
+                f"DELETE FROM leaderboard WHERE period = ? AND user_id = ? AND period_start IN "
+                f"(SELECT DISTINCT {HISTORY_BUCKETS[period]} FROM daily_totals WHERE user_id = ?)",
+                (period, user_id, user_id)
+            )
+
+    # ---------- USERS ----------
+    def get_username(self, user_id):
+        with self.pool.reader() as conn:
+            r = conn.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+        return r["username"] if r else None
+
+    def get_usernames(self, user_ids):
+        # {user_id: username} for the ids that exist, in one query
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        with self.pool.reader() as conn:
+            return dict(conn.execute(
+                f"SELECT id, username FROM users WHERE id IN ({','.join('?' * len(user_ids))})", user_ids
+            ).fetchall())
+
+    def create_user(self, username, password, age=None, weight=None, daily_goal_ml=2000, user_id=None):
+        # user_id: None lets the users table pick the next id (a ShardedStore passes the one it allocated)
+        try:
+            with self.pool.writer() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    "INSERT INTO users (id, username, password, age, weight, daily_goal_ml) VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, username, password, age, weight, daily_goal_ml)
+                )
+                user_id = cur.lastrowid
+                # ensure default settings row
+                cur.execute("INSERT OR IGNORE INTO settings (user_id) VALUES (?)", (user_id,))
+            self.cache.invalidate(username, "user")
+            return user_id
+        except sqlite3.IntegrityError:
+            return None
+
+    @cached_read("user")
+    def get_user_by_username(self, username):
+        with self.pool.reader() as conn:
+            cur = conn.execute("SELECT * FROM users WHERE username = ?", (username,))
+            row = cur.fetchone()
+        return row
+
+    def update_user_profile(self, user_id, age=None, weight=None, daily_goal_ml=None):
+        with self.pool.writer() as conn:
+            cur = conn.cursor()
+            if age is not None:
+                cur.execute("UPDATE users SET age = ? WHERE id = ?", (age, user_id))
+            if weight is not None:
+                cur.execute("UPDATE users SET weight = ? WHERE id = ?", (weight, user_id))
+            if daily_goal_ml is not None:
+                cur.execute("UPDATE users SET daily_goal_ml = ? WHERE id = ?", (daily_goal_ml, user_id))
+        self.cache.invalidate(self.get_username(user_id), "user")
+
+    def counts(self):
+        # admin totals: users, logs (from the rollup, so archived ones count), badges, running challenges
+        with self.pool.reader() as conn:
+            return dict(conn.execute(
+                "SELECT (SELECT COUNT(*) FROM users) as users, "
+                "(SELECT COALESCE(SUM(entry_count), 0) FROM daily_totals) as logs, "
+                "(SELECT COUNT(*) FROM badges) as badges, "
+                "(SELECT COUNT(*) FROM challenges WHERE done = 0) as active_challenges"
+            ).fetchone())
+
+    def check_login(self, username, password):
+        with self.pool.reader() as conn:
+            cur = conn.execute("SELECT * FROM users WHERE username = ? AND password = ?", (username, password))
+            return cur.fetchone()
+
+    # ---------- WATER LOGS ----------
+    def log_water(self, user_id, amount_ml, timestamp=None):
+        if timestamp is None:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        if self.group_commit_ms is not None:
+            self.group_writer.submit(self.write_log, user_id, amount_ml, timestamp).result()
+        else:
+            self.write_log(user_id, amount_ml, timestamp)
+        self.cache.invalidate(user_id, *LOG_QUERIES)
+        self._drop_boards(date.fromisoformat(timestamp[:10]))
+        # after logging, try awarding badges and completing challenges if needed
+        self.award_badges_for_user(user_id)
+        self.evaluate_challenges(user_id)
+
+    def write_log(self, user_id, amount_ml, timestamp):
+        # the insert, its rollup row and the streak state commit together (or join a group commit)
+        with self.pool.writer() as conn:
+            conn.execute(INSERT_LOG, (user_id, to_ts(timestamp), int(amount_ml)))
+            conn.execute(
+                "INSERT INTO daily_totals (user_id, day, total_ml, entry_count) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT(user_id, day) DO UPDATE SET total_ml = total_ml + excluded.total_ml, entry_count = entry_count + 1",
+                (user_id, timestamp[:10], int(amount_ml))
+            )
+            day = date.fromisoformat(timestamp[:10])
+            conn.executemany(
+                LEADERBOARD_UPSERT,
+                [(period, period_start(day, period).isoformat(), user_id, int(amount_ml)) for period in LEADERBOARD_PERIODS]
+            )
+            self.advance_streak(user_id, timestamp[:10])
+
+    # range queries over water_logs: half-open [start_ts, end_ts) timestamp strings, so each is one
+    # seek plus a contiguous scan of the (user_id, ts) primary key, in the hot table and in any
+    # archived year the range reaches (a part at a time past MAX_ATTACHED_ARCHIVES years)
+    def sum_logs_between(self, user_id, start_ts, end_ts):
+        total = 0
+        with self.pool.reader() as conn:
+            for start, end, archives in self._archive_spans(to_ts(start_ts), to_ts(end_ts), conn):
+                with attached(conn, archives):
+                    cur = conn.execute(
+                        f"SELECT SUM(amount_ml) as total FROM {logs_source(archives)} WHERE user_id = ? AND ts >= ? AND ts < ?",
+                        (user_id, start, end)
+                    )
+                    total += cur.fetchone()["total"] or 0
+        return int(total)
+
+    def get_logs_between(self, user_id, start_ts, end_ts):
+        # rows of (amount_ml, ts), newest first; format with from_ts / format_ts where shown
+        rows = []
+        with self.pool.reader() as conn:
+            # parts do not overlap in time, so newest part first keeps the whole list newest first
+            for start, end, archives in reversed(self._archive_spans(to_ts(start_ts), to_ts(end_ts), conn)):
+                with attached(conn, archives):
+                    cur = conn.execute(
+                        f"SELECT amount_ml, ts FROM {logs_source(archives)} WHERE user_id = ? AND ts >= ? AND ts < ? ORDER BY ts DESC, seq DESC",
+                        (user_id, start, end)
+                    )
+                    rows += cur.fetchall()
+        return rows
+
+    def delete_logs_between(self, user_id, start_ts, end_ts):
+        # attach what the rollup refresh below reads, which covers the whole days of [start_ts, end_ts).
+        # The archive set is resolved under the write lock, which archive_logs holds while it adds a year,
+        # so it cannot go stale. Each part (one unless the range spans more than MAX_ATTACHED_ARCHIVES
+        # archived years) deletes and refreshes its own days in one transaction.
+        start, end = to_ts(start_ts), to_ts(end_ts)
+        with self.pool.maintenance() as conn:
+            for lo, hi, archives in self._archive_spans(*map(to_ts, day_range(start_ts[:10], end_ts[:10])), conn):
+                with self.pool.writer(archives) as conn:
+                    for table in ["water_logs"] + [f"{alias}.water_logs" for alias in archives]:
+                        conn.execute(
+                            f"DELETE FROM {table} WHERE user_id = ? AND ts >= ? AND ts < ?",
+                            (user_id, max(start, lo), min(end, hi))
+                        )
+                    self.refresh_daily_totals(user_id, from_ts(lo).date().isoformat(), from_ts(hi - 1).date().isoformat())
+            self.recompute_streak_state(user_id)
+        self.cache.invalidate(user_id, *LOG_QUERIES)
+        self._drop_boards()
+
+    @cached_read("logs")
+    def get_logs_for_date(self, user_id, date_iso):
+        return self.get_logs_between(user_id, *day_range(date_iso))
+
+    @cached_read("today_total", per_day=True)
+    def get_today_total(self, user_id):
+        with self.pool.reader() as conn:
+            cur = conn.execute("SELECT total_ml FROM daily_totals WHERE user_id = ? AND day = ?", (user_id, today_str()))
+            r = cur.fetchone()
+        return int(r["total_ml"]) if r else 0
+
+    @cached_read("history")
+    def get_history(self, user_id, start, end, granularity="day", include_entries=False):
+        # start/end are inclusive dates (or iso strings); every period in range is present, zero-filled
+        if granularity not in HISTORY_BUCKETS:
+            raise ValueError(f"Unknown granularity: {granularity}")
+        if isinstance(start, str):
+            start = date.fromisoformat(start)
+        if isinstance(end, str):
+            end = date.fromisoformat(end)
+        history = {}
+        p = period_start(start, granularity)
+        while p <= end:
+            nxt = next_period(p, granularity)
+            days = (min(nxt, end + timedelta(days=1)) - max(p, start)).days
+            history[p.isoformat()] = {"total_ml": 0, "days": days}
+            if include_entries:
+                history[p.isoformat()]["entries"] = []
+            p = nxt
+        bucket = HISTORY_BUCKETS[granularity]
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                f"SELECT {bucket} as period, SUM(total_ml) as total FROM daily_totals "
+                "WHERE user_id = ? AND day >= ? AND day <= ? GROUP BY period",
+                (user_id, start.isoformat(), end.isoformat())
+            ).fetchall()
+        for r in rows:
+            if r["period"] in history:
+                history[r["period"]]["total_ml"] = int(r["total"] or 0)
+        if include_entries:
+            start_ts, end_ts = day_range(start.isoformat(), end.isoformat())
+            for row in self.get_logs_between(user_id, start_ts, end_ts):
+                d = from_ts(row["ts"]).date()
+                history[period_start(d, granularity).isoformat()]["entries"].append(dict(row))
+        return history
+
+    @cached_read("analytics", per_day=True)
+    def get_analytics(self, user_id, goal_ml, window=7):
+        # lifetime totals, goal-hit rate, monthly totals, hour-of-day distribution, rolling averages and
+        # day-over-day deltas in one call; see analytics.summarize for the result's keys
+        from .analytics import summarize
+        with self.pool.reader() as conn:
+            rows = conn.execute("SELECT day, total_ml FROM daily_totals WHERE user_id = ? ORDER BY day", (user_id,)).fetchall()
+        hourly = [0] * 24
+        for table, attach in self._log_tables():
+            with self.pool.reader(attach) as conn:
+                hours = conn.execute(
+                    f"SELECT (ts % 86400) / 3600 as hour, SUM(amount_ml) as total FROM {table} WHERE user_id = ? GROUP BY hour",
+                    (user_id,)
+                ).fetchall()
+            for r in hours:
+                hourly[r["hour"]] += r["total"]
+        days = [r["day"] for r in rows]
+        end = max(today_str(), days[-1]) if days else today_str()
+        return summarize(days, [r["total_ml"] for r in rows], hourly, goal_ml, end, window)
+
+    def clear_today_logs(self, user_id):
+        self.delete_logs_between(user_id, *day_range(today_str()))
+
+    # ---------- BULK IMPORT / EXPORT ----------
+    def import_logs(self, rows, batch_size=5000):
+        # rows: iterable of dicts from transfer.read_logs (or anything shaped like them), consumed lazily.
+        # Each batch is one executemany insert plus one rollup upsert per (user, day) in a single
+        # transaction; streak state and badges are recomputed once per touched user at the end.
+        start = monotonic()
+        user_ids = {}
+        touched = set()
+        count = 0
+        batch = []
+        for row in rows:
+            user_id = row.get("user_id") or self._import_user_id(row.get("username"), user_ids)
+            batch.append((user_id, int(row["amount_ml"]), row["timestamp"]))
+            if len(batch) >= batch_size:
+                count += self._import_batch(batch, touched)
+                batch = []
+        if batch:
+            count += self._import_batch(batch, touched)
+        self._drop_boards()
+        for user_id in touched:
+            self.recompute_streak_state(user_id)
+            self.cache.invalidate(user_id, *LOG_QUERIES)
+            self.evaluate_badges(user_id)
+            self.evaluate_challenges(user_id)
+        seconds = monotonic() - start
+        return {
+            "rows": count,
+            "users": len(touched),
+            "seconds": round(seconds, 3),
+            "rows_per_sec": round(count / seconds) if seconds else count,
+        }
+
+    def _import_user_id(self, username, user_ids):
+        if username not in user_ids:
+            row = self.get_user_by_username(username) if username else None
+            if row is None:
+                raise ValueError(f"Unknown user: {username!r}")
+            user_ids[username] = row["id"]
+        return user_ids[username]
+
+    def _import_batch(self, batch, touched):
+        totals = {}
+        for user_id, amount_ml, timestamp in batch:
+            t = totals.setdefault((user_id, timestamp[:10]), [0, 0])
+            t[0] += amount_ml
+            t[1] += 1
+        user_ids = sorted({user_id for user_id, _ in totals})
+        with self.pool.writer() as conn:
+            # explicit user ids are not looked up like usernames, and foreign keys are not enforced
+            known = {r["id"] for r in conn.execute(
+                f"SELECT id FROM users WHERE id IN ({','.join('?' * len(user_ids))})", user_ids
+            ).fetchall()}
+            missing = [user_id for user_id in user_ids if user_id not in known]
+            if missing:
+                raise ValueError(f"Unknown user: {missing[0]!r}")
+            conn.executemany(INSERT_LOG, [(user_id, to_ts(timestamp), amount_ml) for user_id, amount_ml, timestamp in batch])
+            conn.executemany(
+                "INSERT INTO daily_totals (user_id, day, total_ml, entry_count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, day) DO UPDATE SET total_ml = total_ml + excluded.total_ml, "
+                "entry_count = entry_count + excluded.entry_count",
+                [(user_id, day, total, n) for (user_id, day), (total, n) in totals.items()]
+            )
+            periods = {}
+            for (user_id, day), (total, _) in totals.items():
+                d = date.fromisoformat(day)
+                for period in LEADERBOARD_PERIODS:
+                    key = (period, period_start(d, period).isoformat(), user_id)
+                    periods[key] = periods.get(key, 0) + total
+            conn.executemany(LEADERBOARD_UPSERT, [key + (total,) for key, total in periods.items()])
+        touched.update(user_id for user_id, _ in totals)
+        return len(batch)
+
+    def export_logs(self, user_id=None, start_ts=None, end_ts=None, chunk_size=1000):
+        # generator over water_logs in (user_id, ts) order, walked along the primary key and fetched
+        # chunk_size rows at a time; the read connection is held until it is exhausted or closed.
+        # Archived years come first, oldest first, each in the same order, then the hot table.
+        where, args = [], []
+        if user_id is not None:
+            where.append("user_id = ?")
+            args.append(user_id)
+        if start_ts is not None:
+            where.append("ts >= ?")
+            args.append(to_ts(start_ts))
+        if end_ts is not None:
+            where.append("ts < ?")
+            args.append(to_ts(end_ts))
+        sql = "SELECT user_id, amount_ml, datetime(ts, 'unixepoch') as timestamp FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        start = to_ts(start_ts) if start_ts is not None else None
+        end = to_ts(end_ts) if end_ts is not None else None
+        for table, attach in self._log_tables(start, end):
+            with self.pool.reader(attach) as conn:
+                cur = conn.execute(sql.format(table=table) + " ORDER BY user_id, ts, seq", args)
+                try:
+                    while True:
+                        chunk = cur.fetchmany(chunk_size)
+                        if not chunk:
+                            break
+                        for r in chunk:
+                            yield dict(r)
+                finally:
+                    # an unfinished statement would keep the archive from detaching
+                    cur.close()
+
+    # ---------- ARCHIVE / COMPACTION ----------
+    def _archive_years(self, start_ts=None, end_ts=None, conn=None):
+        # archived years overlapping [start_ts, end_ts) (ints; None = open-ended), oldest first; pass the
+        # connection about to run the query to save a second checkout
+        lo = year_of(start_ts) if start_ts is not None else 0
+        hi = year_of(end_ts - 1) if end_ts is not None else 9999
+        with self.pool.reader() if conn is None else nullcontext(conn) as conn:
+            rows = conn.execute("SELECT year FROM archives WHERE year >= ? AND year <= ? ORDER BY year", (lo, hi)).fetchall()
+        return [r["year"] for r in rows]
+
+    def _archives(self, start_ts=None, end_ts=None, conn=None):
+        # {alias: path} of those years, to attach
+        return {archive_alias(year): archive_path(self.path, year) for year in self._archive_years(start_ts, end_ts, conn)}
+
+    def _archive_spans(self, start_ts, end_ts, conn=None):
+        # [(start, end, {alias: path})] oldest first: [start_ts, end_ts) cut at year boundaries into parts
+        # that each need at most MAX_ATTACHED_ARCHIVES archives, so one part unless the range is that long
+        years = self._archive_years(start_ts, end_ts, conn)
+        groups = [years[i:i + MAX_ATTACHED_ARCHIVES] for i in range(0, len(years), MAX_ATTACHED_ARCHIVES)] or [[]]
+        cuts = [start_ts] + [year_bounds(group[0])[0] for group in groups[1:]] + [end_ts]
+        return [
+            (cuts[i], cuts[i + 1], {archive_alias(year): archive_path(self.path, year) for year in group})
+            for i, group in enumerate(groups)
+        ]
+
+    def _log_tables(self, start_ts=None, end_ts=None):
+        # [(table, attach)] for reads that walk a user's whole history one database at a time:
+        # each archived year overlapping the range, then the hot table last
+        tables = [(f"{alias}.water_logs", {alias: path}) for alias, path in self._archives(start_ts, end_ts).items()]
+        return tables + [("water_logs", {})]
+
+    def archive_logs(self, horizon_days=ARCHIVE_HORIZON_DAYS, batch_users=1000):
+        # move raw logs for days more than horizon_days before today into their year's archive file.
+        # daily_totals stays put, so history, streaks, leaderboards and badges are unchanged. Each batch
+        # of users is copied in one transaction and removed from the hot table in a second: a crash in
+        # between leaves rows in both places until the next run, never in neither. A row whose key is
+        # already taken in the archive (a backdated log) stays in the hot table, where reads still see it.
+        start = monotonic()
+        cutoff = to_ts(f"{date.today() - timedelta(days=horizon_days)} 00:00:00")
+        with self.pool.reader() as conn:
+            user_ids = [r["id"] for r in conn.execute("SELECT id FROM users ORDER BY id").fetchall()]
+            # per-user MIN(ts) is a primary-key seek; a MIN over the whole table would scan it
+            oldest = conn.execute("SELECT MIN((SELECT MIN(ts) FROM water_logs WHERE user_id = users.id)) FROM users").fetchone()[0]
+        moved = 0
+        years = []
+        if oldest is not None and oldest < cutoff:
+            for year in range(year_of(oldest), year_of(cutoff - 1) + 1):
+                attach = {archive_alias(year): archive_path(self.path, year)}
+                self._create_archive(attach)
+                lo, hi = year_bounds(year)
+                for i in range(0, len(user_ids), batch_users):
+                    batch = user_ids[i:i + batch_users]
+                    moved += self._archive_batch(year, attach, (batch[0], batch[-1], lo, min(hi, cutoff)))
+                    for user_id in batch:
+                        self.cache.invalidate(user_id, "logs", "analytics")
+                years.append(year)
+        seconds = monotonic() - start
+        return {"rows": moved, "years": years, "seconds": round(seconds, 3)}
+
+    def _create_archive(self, attach):
+        ((alias, path),) = attach.items()
+        with self.pool.maintenance() as conn, attached(conn, attach):
+            # both only take effect while the file is still empty
+            conn.execute(f"PRAGMA {alias}.auto_vacuum = INCREMENTAL")
+            conn.execute(f"PRAGMA {alias}.journal_mode = WAL")
+            conn.execute(ARCHIVE_SCHEMA.format(alias=alias))
+
+    def _archive_batch(self, year, attach, args):
+        # args: (first user id, last user id, start ts, end ts); returns the rows moved
+        (alias,) = attach
+        where = "user_id >= ? AND user_id <= ? AND ts >= ? AND ts < ?"
+        # hold the write lock across both transactions so no rollup refresh sees a row twice
+        with self.pool.maintenance():
+            with self.pool.writer(attach) as conn:
+                conn.execute(f"INSERT OR IGNORE INTO {alias}.water_logs SELECT user_id, ts, seq, amount_ml FROM water_logs WHERE {where}", args)
+            with self.pool.writer(attach) as conn:
+                moved = conn.execute(
+                    f"DELETE FROM water_logs WHERE {where} AND EXISTS (SELECT 1 FROM {alias}.water_logs a "
+                    "WHERE a.user_id = water_logs.user_id AND a.ts = water_logs.ts AND a.seq = water_logs.seq "
+                    "AND a.amount_ml = water_logs.amount_ml)",
+                    args
+                ).rowcount
+                # from here on, reads of this year attach the archive
+                if moved:
+                    conn.execute("INSERT OR IGNORE INTO archives (year) VALUES (?)", (year,))
+        return moved
+
+    def compact(self, max_pages=None):
+        # incremental vacuum: truncate up to max_pages free pages (default all) off the hot file and each
+        # archive, so deletes and archiving actually shrink them; returns the number of pages freed
+        freed = 0
+        for _, attach in self._log_tables():
+            schema = next(iter(attach), "main")
+            with self.pool.maintenance() as conn, attached(conn, attach):
+                before = conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+                # executescript steps the pragma to completion; execute() would free a single page
+                conn.executescript(f"PRAGMA {schema}.incremental_vacuum({int(max_pages or 0)});")
+                freed += before - conn.execute(f"PRAGMA {schema}.freelist_count").fetchone()[0]
+        return freed
+
+    def start_compaction(self, every_seconds=3600, horizon_days=ARCHIVE_HORIZON_DAYS):
+        # background thread running archive_logs (skipped when horizon_days is None) and compact once at
+        # start and then every every_seconds, so the hot file stays small however long the app runs
+        if self._compaction is None:
+            self._compaction = threading.Thread(
+                target=self._run_compaction, args=(every_seconds, horizon_days), name="log-compaction", daemon=True
+            )
+            self._compaction.start()
+        return self._compaction
+
+    def _run_compaction(self, every_seconds, horizon_days):
+        while True:
+            try:
+                if horizon_days is not None:
+                    self.archive_logs(horizon_days)
+                self.compact()
+            except self.transient_errors:
+                # try again next round
+                pass
+            sleep(every_seconds)
+
+    # ---------- LEADERBOARDS ----------
+    def leaderboard(self, period="week", day=None):
+        # the PeriodBoard for the period containing day (default today), loaded with one query
+        if period not in LEADERBOARD_PERIODS:
+            raise ValueError(f"Unknown leaderboard period: {period}")
+        key = (period, period_start(day or date.today(), period).isoformat())
+        board = self._boards.get(key)
+        if board is None or board.expires < monotonic():
+            version = self._boards_version
+            with self.pool.reader() as conn:
+                rows = conn.execute("SELECT user_id, total_ml FROM leaderboard WHERE period = ? AND period_start = ?", key).fetchall()
+            board = PeriodBoard((r["user_id"], r["total_ml"]) for r in rows)
+            with self._boards_lock:
+                if self._boards_version == version:
+                    self._boards[key] = board
+        return board
+
+    def _drop_boards(self, day=None):
+        # after a committed write: forget the boards of the periods containing day (default all), so the
+        # next view reloads them. Patching a cached board instead would count the write twice whenever
+        # a load read the table between the commit and the patch.
+        with self._boards_lock:
+            self._boards_version += 1
+            if day is None:
+                self._boards.clear()
+            else:
+                for period in LEADERBOARD_PERIODS:
+                    self._boards.pop((period, period_start(day, period).isoformat()), None)
+
+    # ---------- BADGES ----------
+    @cached_read("badges")
+    def get_badges(self, user_id):
+        with self.pool.reader() as conn:
+            cur = conn.execute("SELECT name, earned_at FROM badges WHERE user_id = ?", (user_id,))
+            return [dict(r) for r in cur.fetchall()]
+
+    def get_earned_badges(self, user_id):
+        if user_id not in self._earned:
+            with self.pool.reader() as conn:
+                cur = conn.execute("SELECT name FROM badges WHERE user_id = ?", (user_id,))
+                self._earned[user_id] = {r["name"] for r in cur.fetchall()}
+        return self._earned[user_id]
+
+    def award_badge(self, user_id, badge_name):
+        try:
+            with self.pool.writer() as conn:
+                conn.execute("INSERT INTO badges (user_id, name) VALUES (?, ?)", (user_id, badge_name))
+            awarded = True
+            self.cache.invalidate(user_id, "badges")
+        except sqlite3.IntegrityError:
+            awarded = False
+        self.get_earned_badges(user_id).add(badge_name)
+        return awarded
+
+    # metric sources return {user_id: {metric: value}} for one user, or for every user when user_id is None
+    def badge_metric_total_drinks(self, user_id=None):
+        with self.pool.reader() as conn:
+            if user_id is None:
+                cur = conn.execute("SELECT user_id, SUM(entry_count) as n FROM daily_totals GROUP BY user_id")
+            else:
+                cur = conn.execute("SELECT user_id, SUM(entry_count) as n FROM daily_totals WHERE user_id = ? GROUP BY user_id", (user_id,))
+            return {r["user_id"]: {"total_drinks": r["n"] or 0} for r in cur.fetchall()}
+
+    def badge_metric_streaks(self, user_id=None):
+        if user_id is not None:
+            return {user_id: self.compute_streaks(user_id)}
+        # the stored state of every user, plus one ordered rollup scan for users with logs but no state
+        # yet (e.g. straight after rebuild_daily_totals); that state is left for their next write to store
+        today = datetime.now().date()
+        with self.pool.reader() as conn:
+            rows = conn.execute("SELECT user_id, current_run, longest_streak, last_day FROM streaks").fetchall()
+            unstored = conn.execute(
+                "SELECT user_id, day FROM daily_totals WHERE entry_count > 0 "
+                "AND user_id NOT IN (SELECT user_id FROM streaks) ORDER BY user_id, day"
+            ).fetchall()
+        values = {
+            r["user_id"]: streak_metrics(
+                r["current_run"], r["longest_streak"], date.fromisoformat(r["last_day"]) if r["last_day"] else None, today
+            )
+            for r in rows
+        }
+        for uid, days in groupby(unstored, key=lambda r: r["user_id"]):
+            values[uid] = streak_metrics(*streak_state_from_days(date.fromisoformat(r["day"]) for r in days), today)
+        return values
+
+    def badge_metrics(self, metric_names, user_id=None):
+        # each source is queried once even if several requested metrics come from it
+        values = {}
+        for source in {BADGE_METRIC_SOURCES[m] for m in metric_names}:
+            for uid, vals in getattr(self, source)(user_id).items():
+                values.setdefault(uid, {}).update(vals)
+        return values
+
+    def evaluate_badges(self, user_id, event="log"):
+        # only rules listening to this event and not yet earned are evaluated
+        earned = self.get_earned_badges(user_id)
+        pending = [r for r in BADGE_RULES if event in r["events"] and r["name"] not in earned]
+        if not pending:
+            return []
+        values = self.badge_metrics({r["metric"] for r in pending}, user_id).get(user_id, {})
+        return [
+            r["name"] for r in pending
+            if values.get(r["metric"], 0) >= r["threshold"] and self.award_badge(user_id, r["name"])
+        ]
+
+    def backfill_badges(self, rules=None):
+        # re-evaluate rules (default: all) for every user in one pass, e.g. after adding a new rule
+        rules = rules or BADGE_RULES
+        values = self.badge_metrics({r["metric"] for r in rules})
+        earned = {}
+        with self.pool.reader() as conn:
+            rows = conn.execute("SELECT user_id, name FROM badges").fetchall()
+        for r in rows:
+            earned.setdefault(r["user_id"], set()).add(r["name"])
+        new_badges = [
+            (uid, r["name"])
+            for uid, vals in values.items()
+            for r in rules
+            if r["name"] not in earned.get(uid, ()) and vals.get(r["metric"], 0) >= r["threshold"]
+        ]
+        with self.pool.writer() as conn:
+            conn.executemany("INSERT OR IGNORE INTO badges (user_id, name) VALUES (?, ?)", new_badges)
+        for uid, name in new_badges:
+            if uid in self._earned:
+                self._earned[uid].add(name)
+            self.cache.invalidate(uid, "badges")
+        return len(new_badges)
+
+    # ---------- CHALLENGES ----------
+    def add_challenge(self, user_id, name, days, goal, start_iso):
+        with self.pool.writer() as conn:
+            conn.execute(
+                "INSERT INTO challenges (user_id, name, days, goal, start) VALUES (?, ?, ?, ?, ?)",
+                (user_id, name, days, goal, start_iso)
+            )
+        self.cache.invalidate(user_id, "challenges")
+
+    @cached_read("challenges")
+    def get_challenges(self, user_id):
+        with self.pool.reader() as conn:
+            cur = conn.execute("SELECT * FROM challenges WHERE user_id = ?", (user_id,))
+            return [dict(r) for r in cur.fetchall()]
+
+    def mark_challenge_done(self, user_id, challenge_id):
+        with self.pool.writer() as conn:
+            conn.execute("UPDATE challenges SET done = 1 WHERE id = ? AND user_id = ?", (challenge_id, user_id))
+        self.cache.invalidate(user_id, "challenges")
+
+    def evaluate_challenges(self, user_id=None, today=None):
+        # settle running challenges, one user's or (user_id None) everyone's: completed once every day of
+        # the window met the goal, failed once a day before today did not. Completing one awards its
+        # badge. Returns {"completed": [(user_id, name)], "failed": [...], "progress": {id: days met}}
+        today = today or date.today()
+        with self.pool.reader() as conn:
+            rows = conn.execute(
+                CHALLENGE_PROGRESS.format(where="1" if user_id is None else "c.user_id = :user_id"),
+                {"today": today.isoformat(), "user_id": user_id}
+            ).fetchall()
+        completed, failed, progress = [], [], {}
+        for r in rows:
+            progress[r["id"]] = r["met"]
+            elapsed = min(r["days"], max(0, (today - date.fromisoformat(r["start"])).days))
+            if r["met"] >= r["days"]:
+                completed.append(r)
+            elif r["met_before_today"] < elapsed:
+                failed.append(r)
+        if completed or failed:
+            with self.pool.writer() as conn:
+                conn.executemany(
+                    "UPDATE challenges SET done = ? WHERE id = ? AND done = 0",
+                    [(CHALLENGE_COMPLETED, r["id"]) for r in completed] + [(CHALLENGE_FAILED, r["id"]) for r in failed]
+                )
+            for r in completed:
+                self.award_badge(r["user_id"], f"✅ Completed: {r['name']}")
+            for uid in {r["user_id"] for r in completed + failed}:
+                self.cache.invalidate(uid, "challenges")
+        return {
+            "completed": [(r["user_id"], r["name"]) for r in completed],
+            "failed": [(r["user_id"], r["name"]) for r in failed],
+            "progress": progress,
+        }
+
+    # ---------- SETTINGS ----------
+    @cached_read("settings")
+    def get_settings(self, user_id):
+        with self.pool.reader() as conn:
+            cur = conn.execute("SELECT reminder_enabled, reminder_minutes, reminder_start_time FROM settings WHERE user_id = ?", (user_id,))
+            r = cur.fetchone()
+        if not r:
+            # initialize
+            with self.pool.writer() as conn:
+                conn.execute("INSERT OR IGNORE INTO settings (user_id) VALUES (?)", (user_id,))
+            return {"reminder_enabled": False, "reminder_minutes": 120, "reminder_start_time": "09:00"}
+        return {"reminder_enabled": bool(r["reminder_enabled"]), "reminder_minutes": r["reminder_minutes"], "reminder_start_time": r["reminder_start_time"]}
+
+    def update_settings(self, user_id, reminder_enabled, reminder_minutes, reminder_start_time):
+        with self.pool.writer() as conn:
+            conn.execute("INSERT OR REPLACE INTO settings (user_id, reminder_enabled, reminder_minutes, reminder_start_time) VALUES (?, ?, ?, ?)",
+                         (user_id, int(reminder_enabled), int(reminder_minutes), reminder_start_time))
+        self.cache.invalidate(user_id, "settings")
+        if self.reminders is not None:
+            self.reminders.update(user_id, bool(reminder_enabled), int(reminder_minutes), reminder_start_time)
+
+    # ---------- DELETION ----------
+    def delete_all_user_data(self, user_id):
+        username = self.get_username(user_id)
+        for table, attach in self._log_tables()[:-1]:
+            with self.pool.writer(attach) as conn:
+                conn.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+        with self.pool.writer() as conn:
+            conn.execute("DELETE FROM water_logs WHERE user_id = ?", (user_id,))
+            self._delete_leaderboard_rows(conn, user_id)
+            conn.execute("DELETE FROM daily_totals WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM streaks WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM badges WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM challenges WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM settings WHERE user_id = ?", (user_id,))
+            conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+        self._earned.pop(user_id, None)
+        self._drop_boards()
+        if self.reminders is not None:
+            self.reminders.remove(user_id)
+        self.cache.invalidate(user_id)
+        self.cache.invalidate(username)
+
+    # ---------- STREAKS ----------
+    def recompute_streak_state(self, user_id):
+        # full walk over the rollup; only needed on first access, after deletes and for backdated logs
+        with self.pool.writer() as conn:
+            cur = conn.execute("SELECT day FROM daily_totals WHERE user_id = ? AND entry_count > 0 ORDER BY day ASC", (user_id,))
+            run, longest, last = streak_state_from_days(date.fromisoformat(r["day"]) for r in cur.fetchall())
+            conn.execute(
+                "INSERT OR REPLACE INTO streaks (user_id, current_run, longest_streak, last_day) VALUES (?, ?, ?, ?)",
+                (user_id, run, longest, last.isoformat() if last else None)
+            )
+        return run, longest, last
+
+    def advance_streak(self, user_id, day_iso):
+        # O(1) update for a new log on day_iso; joins the caller's transaction
+        with self.pool.writer() as conn:
+            r = conn.execute("SELECT current_run, longest_streak, last_day FROM streaks WHERE user_id = ?", (user_id,)).fetchone()
+            if r is None or r["last_day"] is None or day_iso < r["last_day"]:
+                self.recompute_streak_state(user_id)
+                return
+            if day_iso == r["last_day"]:
+                return
+            gap = (date.fromisoformat(day_iso) - date.fromisoformat(r["last_day"])).days
+            run = r["current_run"] + 1 if gap == 1 else 1
+            conn.execute(
+                "UPDATE streaks SET current_run = ?, longest_streak = ?, last_day = ? WHERE user_id = ?",
+                (run, max(run, r["longest_streak"]), day_iso, user_id)
+            )
+
+    @cached_read("streaks", per_day=True)
+    def compute_streaks(self, user_id):
+        with self.pool.reader() as conn:
+            r = conn.execute("SELECT current_run, longest_streak, last_day FROM streaks WHERE user_id = ?", (user_id,)).fetchone()
+        if r is None:
+            run, longest, last = self.recompute_streak_state(user_id)
+        else:
+            run, longest = r["current_run"], r["longest_streak"]
+            last = date.fromisoformat(r["last_day"]) if r["last_day"] else None
+        return streak_metrics(run, longest, last, datetime.now().date())
@@ -0,0 +1,53 @@
+# streaming CSV / NDJSON readers and writers for water logs. Rows are dicts with user_id (or
+# username, for imports from other trackers), amount_ml and timestamp; nothing is buffered
+# beyond the current line, so files of any size go through in constant memory.
+import csv
+import json
+from datetime import datetime
+
+LOG_FIELDS = ("user_id", "amount_ml", "timestamp")
+
+def format_for(path):
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+def normalize_timestamp(value):
+    # accepts the app's "YYYY-MM-DD HH:MM:SS" and ISO 8601 ("T" separator, fractional seconds, "Z" or
+    # "+05:30" offsets). Stored as local wall-clock time, like log_water: a value with an offset is
+    # converted to this machine's time zone first, so it lands on the right day; naive values are kept
+    ts = datetime.fromisoformat(str(value).strip())
+    if ts.tzinfo is not None:
+        ts = ts.astimezone().replace(tzinfo=None)
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+def read_logs(f, fmt="csv"):
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unknown format: {fmt}")
+    rows = csv.DictReader(f) if fmt == "csv" else (json.loads(line) for line in f if line.strip())
+    for n, row in enumerate(rows, 1):
+        try:
+            user_id = row.get("user_id")
+            yield {
+                "user_id": int(user_id) if user_id not in (None, "") else None,
+                "username": row.get("username") or None,
+                "amount_ml": int(float(row["amount_ml"])),
+                "timestamp": normalize_timestamp(row["timestamp"]),
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"row {n}: {e!r}") from e
+
+def write_logs(rows, f, fmt="csv"):
+    # returns the number of rows written
+    if fmt not in ("csv", "ndjson"):
+        raise ValueError(f"Unknown format: {fmt}")
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(f, fieldnames=LOG_FIELDS, extrasaction="ignore", lineterminator="\n")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            f.write(json.dumps({k: row[k] for k in LOG_FIELDS}) + "\n")
+            count += 1
+    return count